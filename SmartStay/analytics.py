@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import threading
+
+from models import day_date, day_number
+from stats import stats_version
+
+# Revenue and occupancy analytics
+# Occupied room-nights and revenue per day and room type are read from the
+# daily_room_stats rollup (see rollup.py), so a report reads one row per day and room
+# type however many stays it covers. Days are bucketed as day numbers and only turned
+# into ISO labels per bucket; weeks and months are summed from those days.
+# Cancelled bookings are left out. Available room-nights come from the current rooms.
+#
+#   occupancy = occupied room-nights / available room-nights
+#   ADR       = revenue / occupied room-nights
+#   RevPAR    = revenue / available room-nights
+
+ANALYTICS_GRAINS = ['day', 'week', 'month']
+ANALYTICS_CACHE_SIZE = 64
+
+def _bucket(day: int, grain: str) -> int:
+    # Buckets are keyed by their first day: the 1st of the month, or the Monday of the week
+    if grain == 'month':
+        return day - int(day_date(day)[8:]) + 1
+    if grain == 'week':
+        # Day 0, 1970-01-01, was a Thursday
+        return day - (day + 3) % 7
+    return day
+
+def _label(bucket: int, grain: str) -> str:
+    return day_date(bucket)[:7] if grain == 'month' else day_date(bucket)
+
+def _metrics(occupied: int, available: int, revenue: float) -> dict:
+    return {
+        'occupied_room_nights': occupied,
+        'available_room_nights': available,
+        'revenue': round(revenue, 2),
+        'occupancy_rate': round(occupied / available, 4) if available else 0.0,
+        'adr': round(revenue / occupied, 2) if occupied else 0.0,
+        'revpar': round(revenue / available, 2) if available else 0.0
+    }
+
+def revenue_report(conn, start: str, end: str, grain: str = 'day', by_room_type: bool = False) -> List[dict]:
+    # Covers the nights from start up to, but not including, end (ISO dates)
+    first, last = day_number(start), day_number(end)
+    cursor = conn.cursor()
+    cursor.execute('SELECT room_type, COUNT(*) FROM rooms GROUP BY room_type')
+    rooms_by_type = dict(cursor.fetchall())
+    cursor.execute('''
+        SELECT day, room_type, room_nights, revenue FROM daily_room_stats
+        WHERE day >= ? AND day < ? AND room_nights > 0
+    ''', (first, last))
+    nightly = cursor.fetchall()
+
+    # Available room-nights per bucket, from the number of days each bucket covers
+    days_in_bucket: Dict[int, int] = {}
+    for day in range(first, last):
+        bucket = _bucket(day, grain)
+        days_in_bucket[bucket] = days_in_bucket.get(bucket, 0) + 1
+
+    room_types = sorted(rooms_by_type) if by_room_type else [None]
+    totals: Dict[Tuple[int, str], List[int]] = {
+        (bucket, room_type): [0, 0] for bucket in days_in_bucket for room_type in room_types
+    }
+    for night, room_type, occupied, revenue in nightly:
+        total = totals[(_bucket(night, grain), room_type if by_room_type else None)]
+        total[0] += occupied
+        total[1] += revenue
+
+    report = []
+    for (bucket, room_type), (occupied, revenue) in totals.items():
+        rooms = rooms_by_type.get(room_type, 0) if by_room_type else sum(rooms_by_type.values())
+        row = {'period': _label(bucket, grain)}
+        if by_room_type:
+            row['room_type'] = room_type
+        row.update(_metrics(occupied, rooms * days_in_bucket[bucket], revenue))
+        report.append(row)
+    return report
+
+# Reports cached per period and grain until a booking or room change bumps the stats version
+class RevenueAnalytics:
+    def __init__(self, db_manager, max_size: int = ANALYTICS_CACHE_SIZE):
+        self._db_manager = db_manager
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._reports: 'OrderedDict[tuple, Tuple[int, List[dict]]]' = OrderedDict()
+
+    def report(self, start: str, end: str, grain: str = 'day', by_room_type: bool = False) -> List[dict]:
+        key = (start, end, grain, by_room_type)
+        conn = self._db_manager.get_connection()
+        version = stats_version(conn)
+        with self._lock:
+            cached = self._reports.get(key)
+            if cached is not None and cached[0] == version:
+                self._reports.move_to_end(key)
+                conn.close()
+                return cached[1]
+
+        report = revenue_report(conn, start, end, grain, by_room_type)
+        conn.close()
+        with self._lock:
+            self._reports[key] = (version, report)
+            self._reports.move_to_end(key)
+            while len(self._reports) > self._max_size:
+                self._reports.popitem(last=False)
+        return report
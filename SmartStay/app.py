@@ -1,49 +1,132 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, stream_template, request, redirect, url_for, session, flash, jsonify, g, stream_with_context, before_render_template, template_rendered
+from markupsafe import Markup
 from datetime import datetime, timedelta
+import hmac
+import os
+import random
+import re
+import shutil
 import sqlite3
-from models import DatabaseManager, Room, Booking, Admin, Receptionist, Guest, Staff, demonstrate_polymorphism
+import tempfile
+import time
+import click
+from models import DatabaseManager, Booking, Admin, Receptionist, Guest, Staff, demonstrate_polymorphism, column_positions, row_builder, day_date, day_number, today_number, ROLE_KEYS, BOOKING_STATUSES, PAYMENT_STATUSES
+from analytics import ANALYTICS_GRAINS, RevenueAnalytics
+from availability import AvailabilityIndex
+from booking_service import BookingService
+from catalog import RoomCatalog
+from exports import EXPORT_FORMATS, booking_records, gzip_chunks
+from importer import IMPORT_BATCH_SIZE, IMPORT_TABLES, bulk_import, open_records
+from instrumentation import RequestMetrics
+from jobs import JobQueue
+from night_audit import AUDIT_CHUNK_SIZE, run_night_audit
+from pricing import BASE_FACTOR, PricingEngine, add_rate_rule, delete_rate_rule, list_rate_rules, rebuild_rates, stay_total
+from repositories import SQLiteStorage
+from rollup import rebuild_rollup
+from search import booking_condition, booking_facets, match_guests, search_guests, search_truncated
+from stats import admin_stats, receptionist_stats, guest_stats, stats_version
+from user_cache import UserCache
 
 app = Flask(__name__)
 app.secret_key = 'smartstay_secret_key_2024'
+# Booking dates are stored as day numbers; templates print them with |day_date
+app.add_template_filter(day_date)
 
-# Initialize database
-db_manager = DatabaseManager()
-db_manager.add_sample_data()
+# Seconds another worker's room writes can take to show up in this worker's catalog
+ROOM_CATALOG_MAX_AGE = 5.0
+# Seconds another process's bookings and cancellations can take to show up in date search
+AVAILABILITY_MAX_AGE = 5.0
+# Users kept hydrated in memory, and how long another worker's user writes can go unseen
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 300.0
+# Background job threads per web process; `flask run-jobs` runs more in a separate process
+JOB_WORKERS = 2
+# One loyalty point per this many RWF paid
+LOYALTY_RWF_PER_POINT = 1000
+# Most rooms one group booking may take
+GROUP_BOOKING_MAX_ROOMS = 100
+# Simulated payment gateway round trip
+PAYMENT_SETTLEMENT_SECONDS = 0.5
+# Read-only replica files serving read routes (0 serves everything from the primary), how
+# often they are refreshed, and the oldest snapshot a read may be served from. Off by
+# default: bench_replicas.py measures no read throughput gain over the primary
+READ_REPLICAS = 0
+READ_REPLICA_SYNC_INTERVAL = 1.0
+READ_REPLICA_MAX_LAG = 5.0
+# Fraction of requests run under cProfile (0 turns profiling off); sampled requests slower
+# than PROFILE_SLOW_SECONDS keep their profile for /api/profiles
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_SLOW_SECONDS = 0.5
+# Scrapers without an admin session send 'Authorization: Bearer <METRICS_TOKEN>' (None
+# turns token scraping off). Trusting METRICS_ALLOWED_ADDRESSES instead is opt-in: behind
+# a reverse proxy on the same host every request arrives from loopback
+METRICS_TOKEN = None
+METRICS_TRUST_LOOPBACK = False
+METRICS_ALLOWED_ADDRESSES = {'127.0.0.1', '::1'}
+
+# Connects lazily on first use; `flask init-db` creates the schema and sample data
+db_manager = DatabaseManager(replicas=READ_REPLICAS, replica_interval=READ_REPLICA_SYNC_INTERVAL,
+                             replica_max_lag=READ_REPLICA_MAX_LAG)
+request_metrics = RequestMetrics(profile_rate=PROFILE_SAMPLE_RATE, profile_slow=PROFILE_SLOW_SECONDS)
+db_manager.set_statement_observer(request_metrics.record_statement)
+catalog = RoomCatalog(db_manager, max_age=ROOM_CATALOG_MAX_AGE)
+availability = AvailabilityIndex(db_manager, catalog, max_age=AVAILABILITY_MAX_AGE)
+pricing_engine = PricingEngine(db_manager)
+booking_service = BookingService(db_manager)
+storage = SQLiteStorage(db_manager, booking_service)
+job_queue = JobQueue(db_manager)
+revenue_analytics = RevenueAnalytics(db_manager)
 
 # Helper functions
 def get_db_connection():
+    # Pin one pooled connection for the whole request; teardown hands it back
+    if 'db' not in g:
+        g.db = db_manager.get_connection()
     return db_manager.get_connection()
 
+@app.teardown_appcontext
+def release_db_connection(exception):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+def load_user(user_id):
+    # Rows come back as the Admin / Receptionist / Guest / Staff object for their role,
+    # always from the primary since they stay cached
+    with db_manager.primary():
+        return storage.users.get(user_id)
+
+user_cache = UserCache(load_user, max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
 def get_user_by_id(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-    user_data = cursor.fetchone()
-    conn.close()
-    
-    if user_data:
-        user_dict = {
-            'user_id': user_data[0],
-            'username': user_data[1],
-            'email': user_data[2],
-            'password': user_data[3],
-            'role': user_data[4],
-            'phone': user_data[5],
-            'position': user_data[6],
-            'salary': user_data[7],
-            'hire_date': user_data[8],
-            'loyalty_points': user_data[9]
-        }
-        
-        if user_data[4] == 'admin':
-            return Admin(user_data[0], user_data[1], user_data[2], user_data[3])
-        elif user_data[4] == 'receptionist':
-            return Receptionist(user_data[0], user_data[1], user_data[2], user_data[3])
-        elif user_data[4] == 'guest':
-            return Guest(user_data[0], user_data[1], user_data[2], user_data[3], user_data[5])
-        elif user_data[4] == 'staff':
-            return Staff(user_data[0], user_data[1], user_data[2], user_data[3], user_data[6])
-    return None
+    return user_cache.get(user_id)
+
+@app.before_request
+def start_job_workers():
+    # Started on the first request so CLI commands don't spawn workers
+    job_queue.start(JOB_WORKERS)
+
+@app.before_request
+def start_replica_sync():
+    if db_manager.replicas:
+        db_manager.replicas.start()
+
+@app.before_request
+def begin_request_metrics():
+    request_metrics.begin()
+
+@app.after_request
+def end_request_metrics(response):
+    request_metrics.end(request.endpoint, request.method, response.status_code)
+    return response
+
+@before_render_template.connect_via(app)
+def time_render_started(sender, template, context, **extra):
+    request_metrics.render_started(template.name)
+
+@template_rendered.connect_via(app)
+def time_render_finished(sender, template, context, **extra):
+    request_metrics.render_finished(template.name)
 
 def login_required(f):
     from functools import wraps
@@ -54,6 +137,32 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Read routes are served from a replica when one is fresh enough, and never from one
+# older than this session's last write, so a guest always sees the booking they just made
+def read_route(f):
+    from functools import wraps
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with db_manager.reading(session.get('wrote_at', 0.0)):
+            return f(*args, **kwargs)
+    return decorated_function
+
+# Only requests that can write are stamped, so viewing a form leaves this session's reads
+# on the replicas; on_get is for the older links that cancel or pay with a GET
+def write_route(f=None, *, on_get: bool = False):
+    from functools import wraps
+    if f is None:
+        return lambda view: write_route(view, on_get=on_get)
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        finally:
+            # Stamped after the write commits, so a replica synced later includes it
+            if on_get or request.method not in ('GET', 'HEAD'):
+                session['wrote_at'] = time.time()
+    return decorated_function
+
 # Routes
 @app.route('/')
 def index():
@@ -65,24 +174,21 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
-        user_data = cursor.fetchone()
-        conn.close()
+        user = storage.users.authenticate(username, password)
         
-        if user_data:
-            session['user_id'] = user_data[0]
-            session['username'] = user_data[1]
-            session['role'] = user_data[4]
+        if user:
+            role = ROLE_KEYS[type(user)]
+            session['user_id'] = user.get_user_id()
+            session['username'] = user.get_username()
+            session['role'] = role
             
-            if user_data[4] == 'admin':
+            if role == 'admin':
                 return redirect(url_for('admin_dashboard'))
-            elif user_data[4] == 'receptionist':
+            elif role == 'receptionist':
                 return redirect(url_for('receptionist_dashboard'))
-            elif user_data[4] == 'guest':
+            elif role == 'guest':
                 return redirect(url_for('guest_dashboard'))
-            elif user_data[4] == 'staff':
+            elif role == 'staff':
                 return redirect(url_for('staff_dashboard'))
         else:
             flash('Invalid username or password')
@@ -96,177 +202,309 @@ def logout():
 
 @app.route('/rooms')
 @login_required
+@read_route
 def rooms():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM rooms ORDER BY room_number')
-    rooms_data = cursor.fetchall()
-    conn.close()
+    check_in_date = request.args.get('check_in_date', '')
+    check_out_date = request.args.get('check_out_date', '')
+    room_type = request.args.get('room_type', '')
+    capacity = request.args.get('capacity', 0, type=int)
+    is_guest = session.get('role') == 'guest'
     
-    rooms = []
-    for room_data in rooms_data:
-        room = Room(room_data[0], room_data[1], room_data[2], room_data[3], room_data[4])
-        room.set_availability(bool(room_data[5]))
-        rooms.append(room)
+    # Date-range search goes through the availability engine
+    if check_in_date and check_out_date:
+        try:
+            check_in, check_out = day_number(check_in_date), day_number(check_out_date)
+        except ValueError:
+            flash('Invalid dates')
+            return redirect(url_for('rooms'))
+        if check_out <= check_in:
+            flash('Check-out date must be after check-in date')
+            return redirect(url_for('rooms'))
+        rooms = availability.find_available_rooms(check_in, check_out, room_type, capacity)
+        room_cards = render_template('room_cards.html', rooms=rooms, is_guest=is_guest, search=request.args)
+    else:
+        # Plain browsing is served from the catalog's pre-rendered cards without touching SQLite
+        room_cards = catalog.fragment(('rooms', is_guest), lambda rooms: render_template(
+            'room_cards.html', rooms=rooms, is_guest=is_guest, search={}))
     
-    return render_template('rooms.html', rooms=rooms)
+    return render_template('rooms.html', room_cards=Markup(room_cards), search=request.args)
 
 @app.route('/book_room/<int:room_id>', methods=['GET', 'POST'])
 @login_required
+@write_route
 def book_room(room_id):
     if session.get('role') != 'guest':
         flash('Only guests can book rooms')
         return redirect(url_for('rooms'))
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM rooms WHERE room_id = ?', (room_id,))
-    room_data = cursor.fetchone()
-    
-    if not room_data or not room_data[5]:  # Room doesn't exist or not available
+    room = catalog.get(room_id)
+    if not room:  # Room doesn't exist
         flash('Room not available')
         return redirect(url_for('rooms'))
     
     if request.method == 'POST':
-        check_in_date = request.form['check_in_date']
-        check_out_date = request.form['check_out_date']
+        # Form dates are parsed once here; everything below works on day numbers
+        check_in = day_number(request.form['check_in_date'])
+        check_out = day_number(request.form['check_out_date'])
         
-        # Calculate total amount
-        check_in = datetime.strptime(check_in_date, '%Y-%m-%d')
-        check_out = datetime.strptime(check_out_date, '%Y-%m-%d')
-        nights = (check_out - check_in).days
-        total_amount = nights * room_data[3]
+        if check_out <= check_in:
+            flash('Check-out date must be after check-in date')
+            return redirect(url_for('book_room', room_id=room_id))
         
-        # Create booking
-        cursor.execute('''
-            INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (room_id, session['user_id'], check_in_date, check_out_date, total_amount))
+        # Priced from the rate calendar: seasons, weekends and occupancy surcharges
+        today = today_number()
+        total_amount = pricing_engine.quote(room, check_in, check_out, today)
         
-        # Update room availability
-        cursor.execute('UPDATE rooms SET is_available = 0 WHERE room_id = ?', (room_id,))
+        booking_id = storage.bookings.book(room_id, session['user_id'], check_in, check_out, total_amount, today)
+        if booking_id is None:
+            flash('Room is already booked for those dates')
+            return redirect(url_for('rooms'))
         
-        conn.commit()
-        conn.close()
+        availability.add(booking_id, room_id, check_in, check_out)
+        if check_in <= today < check_out:
+            catalog.invalidate()
+        job_queue.enqueue('booking_confirmation', {'booking_id': booking_id, 'guest_id': session['user_id']})
         
         flash('Room booked successfully!')
         return redirect(url_for('my_bookings'))
     
-    conn.close()
-    room = Room(room_data[0], room_data[1], room_data[2], room_data[3], room_data[4])
-    return render_template('book_room.html', room=room)
+    # Dates carried over from the room search are quoted up front
+    quote = None
+    try:
+        check_in = day_number(request.args['check_in_date'])
+        check_out = day_number(request.args['check_out_date'])
+        if check_out > check_in:
+            quote = {'nights': check_out - check_in,
+                     'total_amount': pricing_engine.quote(room, check_in, check_out, today_number())}
+    except (KeyError, ValueError):
+        pass
+    
+    return render_template('book_room.html', room=room, quote=quote)
+
+@app.route('/api/group_bookings', methods=['POST'])
+@login_required
+@write_route
+def group_booking():
+    # Guests book for themselves; reception and admins book on behalf of a guest_id
+    role = session.get('role')
+    if role not in ['guest', 'admin', 'receptionist']:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        check_in = day_number(data['check_in_date'])
+        check_out = day_number(data['check_out_date'])
+        count = int(data['rooms'])
+        capacity = int(data.get('capacity') or 1)
+        if check_out <= check_in:
+            raise ValueError('check_out_date must be after check_in_date')
+        if not 1 <= count <= GROUP_BOOKING_MAX_ROOMS:
+            raise ValueError(f'rooms must be between 1 and {GROUP_BOOKING_MAX_ROOMS}')
+        guest_id = session['user_id'] if role == 'guest' else int(data['guest_id'])
+        guest = get_user_by_id(guest_id)
+        if not isinstance(guest, Guest):
+            raise ValueError('guest_id must be a guest')
+        
+        # Rates are summed once per room type, so the transaction only multiplies them out
+        today = today_number()
+        factors = {room_type: pricing_engine.factor_sum(room_type, check_in, check_out, today)
+                   for room_type in {room.get_room_type() for room in catalog.all()}}
+    except (KeyError, TypeError, ValueError) as error:
+        return jsonify({'error': f'invalid group booking: {error}'}), 400
+    
+    nights = check_out - check_in
+    bookings = storage.bookings.book_block(
+        guest_id, check_in, check_out, count, data.get('room_type') or None, capacity,
+        lambda room_type, price: stay_total(price, factors.get(room_type, BASE_FACTOR * nights)), today)
+    if bookings is None:
+        return jsonify({'error': f'fewer than {count} matching rooms are free for those dates'}), 409
+    
+    for booking_id, room_id, _ in bookings:
+        availability.add(booking_id, room_id, check_in, check_out)
+    if check_in <= today < check_out:
+        catalog.invalidate()
+    job_queue.enqueue('group_booking_confirmation', {'booking_ids': [booking[0] for booking in bookings],
+                                                     'guest_id': guest_id})
+    
+    return jsonify({
+        'guest_id': guest_id,
+        'check_in_date': day_date(check_in),
+        'check_out_date': day_date(check_out),
+        'total_amount': sum(booking[2] for booking in bookings),
+        'bookings': [{'booking_id': booking_id, 'room_id': room_id, 'total_amount': total_amount}
+                     for booking_id, room_id, total_amount in bookings]
+    }), 201
 
 @app.route('/my_bookings')
 @login_required
+@read_route
 def my_bookings():
     if session.get('role') != 'guest':
         flash('Only guests can view their bookings')
         return redirect(url_for('index'))
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT b.*, r.room_number, r.room_type 
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.room_id
-        WHERE b.guest_id = ?
-        ORDER BY b.booking_id DESC
-    ''', (session['user_id'],))
-    bookings_data = cursor.fetchall()
-    conn.close()
-    
-    bookings = []
-    for booking_data in bookings_data:
-        booking = Booking(booking_data[0], booking_data[1], booking_data[2], 
-                         booking_data[3], booking_data[4], booking_data[5])
-        booking.set_status(booking_data[6])
-        booking.set_payment_status(booking_data[7])
-        bookings.append({
-            'booking': booking,
-            'room_number': booking_data[8],
-            'room_type': booking_data[9]
-        })
+    bookings = storage.bookings.for_guest(session['user_id'])
     
     return render_template('my_bookings.html', bookings=bookings)
 
 @app.route('/cancel_booking/<int:booking_id>')
 @login_required
+@write_route(on_get=True)
 def cancel_booking(booking_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    cancelled = storage.bookings.cancel(booking_id, session['user_id'], today_number())
     
-    # Get booking details
-    cursor.execute('SELECT * FROM bookings WHERE booking_id = ?', (booking_id,))
-    booking_data = cursor.fetchone()
-    
-    if booking_data and booking_data[2] == session['user_id']:  # User owns this booking
-        # Update booking status
-        cursor.execute('UPDATE bookings SET status = ? WHERE booking_id = ?', 
-                      ('cancelled', booking_id))
-        
-        # Make room available again
-        cursor.execute('UPDATE rooms SET is_available = 1 WHERE room_id = ?', 
-                      (booking_data[1],))
-        
-        conn.commit()
+    if cancelled:
+        room_id, check_in = cancelled
+        availability.remove(booking_id, room_id, check_in)
+        catalog.invalidate()
         flash('Booking cancelled successfully')
     
-    conn.close()
     return redirect(url_for('my_bookings'))
 
 @app.route('/admin_dashboard')
 @login_required
+@read_route
 def admin_dashboard():
     if session.get('role') != 'admin':
         return redirect(url_for('index'))
     
+    # All counters come from one lookup in stats_counters
     conn = get_db_connection()
-    cursor = conn.cursor()
+    stats = admin_stats(conn)
+    conn.close()
     
-    # Get statistics
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
+    return render_template('admin_dashboard.html', stats=stats)
+
+ANALYTICS_MAX_DAYS = 1096
+
+def analytics_params():
+    # Defaults to the current month; ranges are capped so one request can't expand decades of stays
+    today = datetime.now().date()
+    month_start = today.replace(day=1)
+    start = request.args.get('start') or month_start.isoformat()
+    end = request.args.get('end') or (month_start + timedelta(days=32)).replace(day=1).isoformat()
+    grain = request.args.get('grain', 'day')
+    by_room_type = bool(request.args.get('by_room_type'))
+    
+    if grain not in ANALYTICS_GRAINS or not 0 < day_number(end) - day_number(start) <= ANALYTICS_MAX_DAYS:
+        raise ValueError('invalid analytics period')
+    return start, end, grain, by_room_type
+
+@app.route('/analytics')
+@login_required
+@read_route
+def analytics():
+    if session.get('role') != 'admin':
+        return redirect(url_for('index'))
     
-    cursor.execute('SELECT COUNT(*) FROM rooms')
-    total_rooms = cursor.fetchone()[0]
+    try:
+        start, end, grain, by_room_type = analytics_params()
+    except ValueError:
+        flash(f'Choose a period of 1 to {ANALYTICS_MAX_DAYS} days')
+        return redirect(url_for('analytics'))
     
-    cursor.execute('SELECT COUNT(*) FROM rooms WHERE is_available = 1')
-    available_rooms = cursor.fetchone()[0]
+    report = revenue_analytics.report(start, end, grain, by_room_type)
+    return render_template('analytics.html', report=report, start=start, end=end, grain=grain,
+                           by_room_type=by_room_type, grains=ANALYTICS_GRAINS)
+
+@app.route('/api/analytics')
+@login_required
+@read_route
+def api_analytics():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    
+    try:
+        start, end, grain, by_room_type = analytics_params()
+    except ValueError:
+        return jsonify({'error': f'choose a period of 1 to {ANALYTICS_MAX_DAYS} days and a grain of '
+                                 f'{", ".join(ANALYTICS_GRAINS)}'}), 400
+    
+    return jsonify({'start': start, 'end': end, 'grain': grain,
+                    'report': revenue_analytics.report(start, end, grain, by_room_type)})
+
+def rate_rule_json(rule: dict) -> dict:
+    start_day, end_day = rule.pop('start_day'), rule.pop('end_day')
+    rule['start_date'] = day_date(start_day) if start_day is not None else None
+    rule['end_date'] = day_date(end_day) if end_day is not None else None
+    return rule
+
+@app.route('/api/rate_rules', methods=['GET', 'POST'])
+@login_required
+@write_route
+def rate_rules():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
     
-    cursor.execute('SELECT COUNT(*) FROM bookings')
-    total_bookings = cursor.fetchone()[0]
+    conn = get_db_connection()
+    if request.method == 'POST':
+        # Dates bound the nights the rule applies to; end_date is exclusive
+        data = request.get_json(silent=True) or {}
+        try:
+            start_day = day_number(data['start_date']) if data.get('start_date') else None
+            end_day = day_number(data['end_date']) if data.get('end_date') else None
+            min_occupancy = int(data['min_occupancy']) if data.get('min_occupancy') is not None else None
+            rule_id = add_rate_rule(conn, str(data['name']), data['kind'], int(data['percent']),
+                                    data.get('room_type') or None, start_day, end_day, min_occupancy)
+        except (KeyError, TypeError, ValueError) as error:
+            conn.close()
+            return jsonify({'error': f'invalid rate rule: {error}'}), 400
+        conn.close()
+        return jsonify({'rule_id': rule_id}), 201
     
-    cursor.execute('SELECT COUNT(*) FROM bookings WHERE status = "confirmed"')
-    active_bookings = cursor.fetchone()[0]
+    rules = [rate_rule_json(rule) for rule in list_rate_rules(conn.cursor())]
+    conn.close()
+    return jsonify(rules)
+
+@app.route('/api/rate_rules/<int:rule_id>', methods=['DELETE'])
+@login_required
+@write_route
+def remove_rate_rule(rule_id):
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
     
+    conn = get_db_connection()
+    deleted = delete_rate_rule(conn, rule_id)
     conn.close()
+    if not deleted:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify({'rule_id': rule_id, 'deleted': True})
+
+@app.route('/api/quote/<int:room_id>')
+@login_required
+def quote_room(room_id):
+    room = catalog.get(room_id)
+    if not room:
+        return jsonify({'error': 'not found'}), 404
     
-    stats = {
-        'total_users': total_users,
-        'total_rooms': total_rooms,
-        'available_rooms': available_rooms,
-        'total_bookings': total_bookings,
-        'active_bookings': active_bookings
-    }
+    try:
+        check_in = day_number(request.args['check_in_date'])
+        check_out = day_number(request.args['check_out_date'])
+        if check_out <= check_in:
+            raise ValueError('check_out_date must be after check_in_date')
+        total_amount = pricing_engine.quote(room, check_in, check_out, today_number())
+    except (KeyError, ValueError) as error:
+        return jsonify({'error': f'invalid stay: {error}'}), 400
     
-    return render_template('admin_dashboard.html', stats=stats)
+    nights = check_out - check_in
+    return jsonify({'room_id': room_id, 'check_in_date': day_date(check_in), 'check_out_date': day_date(check_out),
+                    'nights': nights, 'base_amount': nights * room.get_price_per_night(),
+                    'total_amount': total_amount})
 
 @app.route('/manage_staff')
 @login_required
+@read_route
 def manage_staff():
     if session.get('role') != 'admin':
         return redirect(url_for('index'))
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE role IN ("staff", "receptionist")')
-    staff_data = cursor.fetchall()
-    conn.close()
+    staff_data = storage.users.list_staff()
     
     return render_template('manage_staff.html', staff=staff_data)
 
 @app.route('/add_staff', methods=['GET', 'POST'])
 @login_required
+@write_route
 def add_staff():
     if session.get('role') != 'admin':
         return redirect(url_for('index'))
@@ -279,14 +517,9 @@ def add_staff():
         position = request.form.get('position', '')
         salary = float(request.form.get('salary', 0))
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO users (username, email, password, role, position, salary, hire_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (username, email, password, role, position, salary, datetime.now().strftime('%Y-%m-%d')))
-        conn.commit()
-        conn.close()
+        user_id = storage.users.add_staff(username, email, password, role, position, salary,
+                                          datetime.now().strftime('%Y-%m-%d'))
+        user_cache.invalidate(user_id)
         
         flash('Staff member added successfully')
         return redirect(url_for('manage_staff'))
@@ -295,123 +528,419 @@ def add_staff():
 
 @app.route('/delete_staff/<int:user_id>')
 @login_required
+@write_route(on_get=True)
 def delete_staff(user_id):
     if session.get('role') != 'admin':
         return redirect(url_for('index'))
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM users WHERE user_id = ? AND role IN ("staff", "receptionist")', (user_id,))
-    conn.commit()
-    conn.close()
+    storage.users.delete_staff(user_id)
+    user_cache.invalidate(user_id)
     
     flash('Staff member deleted successfully')
     return redirect(url_for('manage_staff'))
 
 @app.route('/receptionist_dashboard')
 @login_required
+@read_route
 def receptionist_dashboard():
     if session.get('role') != 'receptionist':
         return redirect(url_for('index'))
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Get today's check-ins and check-outs
-    today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('SELECT COUNT(*) FROM bookings WHERE check_in_date = ?', (today,))
-    today_checkins = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM bookings WHERE check_out_date = ?', (today,))
-    today_checkouts = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM rooms WHERE is_available = 1')
-    available_rooms = cursor.fetchone()[0]
-    
+    today = today_number()
+    conn = get_db_connection()
+    stats = receptionist_stats(conn, today)
     conn.close()
     
-    stats = {
-        'today_checkins': today_checkins,
-        'today_checkouts': today_checkouts,
-        'available_rooms': available_rooms
-    }
-    
     return render_template('receptionist_dashboard.html', stats=stats)
 
 @app.route('/guest_dashboard')
 @login_required
+@read_route
 def guest_dashboard():
     if session.get('role') != 'guest':
         return redirect(url_for('index'))
     
+    # Loyalty points come from the cached Guest, active bookings from one counter lookup
+    guest = get_user_by_id(session['user_id'])
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get user's loyalty points
-    cursor.execute('SELECT loyalty_points FROM users WHERE user_id = ?', (session['user_id'],))
-    loyalty_points = cursor.fetchone()[0]
-    
-    # Get user's active bookings
-    cursor.execute('''
-        SELECT COUNT(*) FROM bookings 
-        WHERE guest_id = ? AND status = "confirmed"
-    ''', (session['user_id'],))
-    active_bookings = cursor.fetchone()[0]
-    
+    stats = guest_stats(conn, session['user_id'], guest.get_loyalty_points() if guest else None)
     conn.close()
     
-    stats = {
-        'loyalty_points': loyalty_points,
-        'active_bookings': active_bookings
-    }
-    
     return render_template('guest_dashboard.html', stats=stats)
 
 @app.route('/staff_dashboard')
 @login_required
+@read_route
 def staff_dashboard():
     if session.get('role') != 'staff':
         return redirect(url_for('index'))
     
     user = get_user_by_id(session['user_id'])
+    permissions = user_cache.permissions(session['user_id'])
     
-    return render_template('staff_dashboard.html', user=user)
+    return render_template('staff_dashboard.html', user=user, permissions=permissions)
+
+BOOKINGS_PAGE_SIZE = 50
+BOOKINGS_FETCH_BATCH = 500
+BOOKING_FILTERS = ['q', 'status', 'payment_status', 'check_in_from', 'check_in_to']
+BOOKING_DATE_FILTERS = ['check_in_from', 'check_in_to']
+
+# The filters given in args, without the date filters that are not YYYY-MM-DD; the
+# second value names those
+def booking_filters(args):
+    filters = {name: args[name] for name in BOOKING_FILTERS if args.get(name)}
+    invalid = []
+    for name in BOOKING_DATE_FILTERS:
+        if name in filters:
+            try:
+                day_number(filters[name])
+            except ValueError:
+                invalid.append(name)
+                del filters[name]
+    return filters, invalid
+
+def query_all_bookings(cursor, filters: dict, before: int = None, limit: int = None, guest_ids: list = None):
+    query = '''
+        SELECT b.*, u.username, r.room_number, r.room_type 
+        FROM bookings b
+        JOIN users u ON b.guest_id = u.user_id
+        JOIN rooms r ON b.room_id = r.room_id
+    '''
+    conditions, params = [], []
+    # Guest name, email or phone, or room number: every match, or only those of guest_ids
+    search = booking_condition(filters.get('q'), guest_ids)
+    if search:
+        conditions.append(search[0])
+        params.extend(search[1])
+    if filters.get('status'):
+        conditions.append('b.status = ?')
+        params.append(filters['status'])
+    if filters.get('payment_status'):
+        conditions.append('b.payment_status = ?')
+        params.append(filters['payment_status'])
+    if filters.get('check_in_from'):
+        conditions.append('b.check_in_date >= ?')
+        params.append(day_number(filters['check_in_from']))
+    if filters.get('check_in_to'):
+        conditions.append('b.check_in_date <= ?')
+        params.append(day_number(filters['check_in_to']))
+    # Keyset cursor: resume below the last booking id already shown
+    if before:
+        conditions.append('b.booking_id < ?')
+        params.append(before)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY b.booking_id DESC'
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+    cursor.execute(query, params)
+    return cursor
 
 @app.route('/all_bookings')
 @login_required
+@read_route
 def all_bookings():
     if session.get('role') not in ['admin', 'receptionist']:
         return redirect(url_for('index'))
     
+    filters, invalid = booking_filters(request.args)
+    for name in invalid:
+        flash(f'Ignored {name.replace("_", " ")}: dates must be YYYY-MM-DD')
+    before = request.args.get('before', type=int)
+    
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT b.*, u.username, r.room_number, r.room_type 
-        FROM bookings b
-        JOIN users u ON b.guest_id = u.user_id
-        JOIN rooms r ON b.room_id = r.room_id
-        ORDER BY b.booking_id DESC
-    ''')
-    bookings_data = cursor.fetchall()
+    
+    # Stream every matching booking straight from the cursor
+    if request.args.get('stream'):
+        query_all_bookings(cursor, filters, before)
+        
+        def generate_rows():
+            try:
+                while True:
+                    rows = cursor.fetchmany(BOOKINGS_FETCH_BATCH)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                conn.close()
+        
+        # stream_template keeps the request context (and its connection) alive while rendering
+        return app.response_class(stream_template(
+            'all_bookings.html', bookings=generate_rows(), filters=filters, next_before=None, streaming=True,
+            booking_statuses=BOOKING_STATUSES, payment_statuses=PAYMENT_STATUSES))
+    
+    limit = max(1, min(request.args.get('limit', BOOKINGS_PAGE_SIZE, type=int), BOOKINGS_PAGE_SIZE * 4))
+    # The full-text match runs once and feeds the page, the guest list and the facets
+    guest_ids = match_guests(cursor, filters['q']) if filters.get('q') else []
+    bookings_data = query_all_bookings(cursor, filters, before, limit + 1, guest_ids).fetchall()
+    
+    # The extra row only tells us whether another page exists
+    next_before = None
+    if len(bookings_data) > limit:
+        bookings_data = bookings_data[:limit]
+        next_before = bookings_data[-1][0]
+    
+    # Matching guests and status / payment counts over every match, before the other filters
+    guests, facets, truncated = [], None, False
+    if filters.get('q'):
+        guests = search_guests(cursor, guest_ids)
+        facets = booking_facets(cursor, filters['q'])
+        truncated = search_truncated(cursor, filters['q'], guest_ids, facets)
     conn.close()
     
-    return render_template('all_bookings.html', bookings=bookings_data)
+    return render_template('all_bookings.html', bookings=bookings_data, filters=filters,
+                           next_before=next_before, streaming=False, guests=guests, facets=facets,
+                           truncated=truncated, booking_statuses=BOOKING_STATUSES, payment_statuses=PAYMENT_STATUSES)
+
+@app.route('/export/bookings.<export_format>')
+@login_required
+@read_route
+def export_bookings(export_format):
+    if session.get('role') not in ['admin', 'receptionist']:
+        return redirect(url_for('index'))
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'unknown export format'}), 404
+    
+    serialize, mimetype = EXPORT_FORMATS[export_format]
+    filters, invalid = booking_filters(request.args)
+    if invalid:
+        return jsonify({'error': f'invalid {", ".join(invalid)}: dates must be YYYY-MM-DD'}), 400
+    compress = bool(request.args.get('gzip'))
+    
+    conn = get_db_connection()
+    cursor = query_all_bookings(conn.cursor(), filters)
+    
+    def generate():
+        try:
+            chunks = serialize(booking_records(cursor))
+            yield from gzip_chunks(chunks) if compress else chunks
+        finally:
+            conn.close()
+    
+    filename = f'bookings.{export_format}'
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    response = app.response_class(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
 
 @app.route('/process_payment/<int:booking_id>')
 @login_required
+@write_route(on_get=True)
 def process_payment(booking_id):
     if session.get('role') not in ['admin', 'receptionist']:
         return redirect(url_for('index'))
     
-    conn = get_db_connection()
+    # Settlement and loyalty accrual run on the job workers
+    job_id = job_queue.enqueue('settle_payment', {'booking_id': booking_id})
+    
+    flash(f'Payment submitted for settlement (job #{job_id})')
+    return redirect(url_for('all_bookings'))
+
+@app.route('/api/jobs')
+@login_required
+def jobs_metrics():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    
+    return jsonify(job_queue.metrics())
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    # Guests may only follow jobs queued on their behalf
+    if job is None or (session.get('role') not in ['admin', 'receptionist']
+                       and job['payload'].get('guest_id') != session['user_id']):
+        return jsonify({'error': 'not found'}), 404
+    
+    return jsonify(job)
+
+# Background jobs
+@job_queue.handler('settle_payment')
+def settle_payment_job(payload):
+    booking_id = payload['booking_id']
+    time.sleep(PAYMENT_SETTLEMENT_SECONDS)
+    
+    # Loyalty accrual is queued in the same transaction that marks the booking paid
+    conn = db_manager.get_connection()
     cursor = conn.cursor()
-    cursor.execute('UPDATE bookings SET payment_status = ? WHERE booking_id = ?', 
-                  ('paid', booking_id))
+    cursor.execute("UPDATE bookings SET payment_status = 'paid' WHERE booking_id = ? AND payment_status != 'paid'",
+                   (booking_id,))
+    settled = cursor.rowcount == 1
+    if settled:
+        job_queue.enqueue('accrue_loyalty', {'booking_id': booking_id}, conn=conn)
     conn.commit()
     conn.close()
     
-    flash('Payment processed successfully')
-    return redirect(url_for('all_bookings'))
+    return {'booking_id': booking_id, 'settled': settled}
+
+@job_queue.handler('accrue_loyalty')
+def accrue_loyalty_job(payload):
+    booking_id = payload['booking_id']
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT guest_id, total_amount FROM bookings WHERE booking_id = ? AND payment_status = 'paid'",
+                   (booking_id,))
+    booking_data = cursor.fetchone()
+    if booking_data is None:
+        conn.close()
+        return {'booking_id': booking_id, 'points': 0}
+    
+    # loyalty_awards has one row per booking, so a rerun never credits twice
+    guest_id, total_amount = booking_data
+    points = int(total_amount // LOYALTY_RWF_PER_POINT)
+    cursor.execute('''
+        INSERT OR IGNORE INTO loyalty_awards (booking_id, guest_id, points, awarded_at)
+        VALUES (?, ?, ?, ?)
+    ''', (booking_id, guest_id, points, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    awarded = cursor.rowcount == 1
+    if awarded:
+        cursor.execute('UPDATE users SET loyalty_points = loyalty_points + ? WHERE user_id = ?', (points, guest_id))
+    conn.commit()
+    conn.close()
+    user_cache.invalidate(guest_id)
+    
+    return {'booking_id': booking_id, 'guest_id': guest_id, 'points': points if awarded else 0}
+
+@job_queue.handler('booking_confirmation')
+def booking_confirmation_job(payload):
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT b.*, u.username, u.email, r.room_number, r.room_type
+        FROM bookings b
+        JOIN users u ON b.guest_id = u.user_id
+        JOIN rooms r ON b.room_id = r.room_id
+        WHERE b.booking_id = ?
+    ''', (payload['booking_id'],))
+    columns = column_positions(cursor)
+    booking_data = cursor.fetchone()
+    conn.close()
+    if booking_data is None:
+        return None
+    
+    # There is no mail transport yet, so the rendered message is kept as the job result
+    with app.app_context():
+        body = render_template('booking_confirmation.txt', booking=row_builder(Booking, columns)(booking_data),
+                               username=booking_data[columns['username']],
+                               room_number=booking_data[columns['room_number']],
+                               room_type=booking_data[columns['room_type']])
+    return {
+        'to': booking_data[columns['email']],
+        'subject': f"SmartStay booking #{payload['booking_id']} confirmed",
+        'body': body
+    }
+
+@job_queue.handler('group_booking_confirmation')
+def group_booking_confirmation_job(payload):
+    booking_ids = payload['booking_ids']
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT b.booking_id, b.check_in_date, b.check_out_date, b.total_amount, r.room_number, r.room_type,
+               u.username, u.email
+        FROM bookings b
+        JOIN users u ON b.guest_id = u.user_id
+        JOIN rooms r ON b.room_id = r.room_id
+        WHERE b.booking_id IN ({', '.join('?' for _ in booking_ids)})
+        ORDER BY r.room_number
+    ''', booking_ids)
+    rows = cursor.fetchall()
+    conn.close()
+    if not rows:
+        return None
+    
+    with app.app_context():
+        body = render_template('group_booking_confirmation.txt', rows=rows, username=rows[0][6],
+                               total_amount=sum(row[3] for row in rows))
+    return {
+        'to': rows[0][7],
+        'subject': f'SmartStay group booking of {len(rows)} rooms confirmed',
+        'body': body
+    }
+
+@app.route('/api/stats/<role>')
+@login_required
+@read_route
+def api_stats(role):
+    if role not in ['admin', 'receptionist', 'guest'] or session.get('role') != role:
+        return jsonify({'error': 'forbidden'}), 403
+    
+    # The ETag is the counters version, plus whatever else scopes the numbers
+    today = today_number()
+    conn = get_db_connection()
+    etag = f'{role}-{stats_version(conn)}'
+    if role == 'receptionist':
+        etag += f'-{today}'
+    elif role == 'guest':
+        etag += f'-{session["user_id"]}'
+    
+    if etag in request.if_none_match:
+        conn.close()
+        response = app.response_class(status=304)
+    else:
+        if role == 'admin':
+            stats = admin_stats(conn)
+        elif role == 'receptionist':
+            stats = receptionist_stats(conn, today)
+        else:
+            guest = get_user_by_id(session['user_id'])
+            stats = guest_stats(conn, session['user_id'], guest.get_loyalty_points() if guest else None)
+        conn.close()
+        response = jsonify(stats)
+    
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/db_pool')
+@login_required
+def db_pool_metrics():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    
+    return jsonify(db_manager.pool_metrics())
+
+@app.route('/api/user_cache')
+@login_required
+def user_cache_metrics():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    
+    return jsonify(user_cache.metrics())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    scraper = (METRICS_TOKEN is not None and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())) \
+        or (METRICS_TRUST_LOOPBACK and request.remote_addr in METRICS_ALLOWED_ADDRESSES)
+    if not scraper and session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    
+    pool = db_manager.pool_metrics()
+    body = request_metrics.prometheus({
+        'smartstay_db_pool_open_connections': ('gauge', 'Pooled primary connections open.',
+                                               pool['open_connections']),
+        'smartstay_db_pool_in_use_connections': ('gauge', 'Pooled primary connections checked out.',
+                                                 pool['in_use_connections']),
+        'smartstay_db_pool_checkout_wait_seconds_total': ('counter', 'Time spent waiting for a pooled connection.',
+                                                          pool['checkout_wait_total_ms'] / 1000)
+    })
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiles')
+@login_required
+def request_profiles():
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'forbidden'}), 403
+    
+    return jsonify(request_metrics.profiles())
 
 @app.route('/demo_oop')
 def demo_oop():
@@ -426,5 +955,240 @@ def demo_oop():
     
     return render_template('demo_oop.html', results=polymorphism_results)
 
+@app.cli.command('init-db')
+@click.option('--sample-data/--no-sample-data', default=True, show_default=True,
+              help='Add the sample rooms and default logins.')
+def init_db_command(sample_data):
+    """Create or migrate the database schema, then add the sample data."""
+    started = time.perf_counter()
+    db_manager.init_database()
+    if sample_data:
+        db_manager.add_sample_data()
+    conn = db_manager.get_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    conn.close()
+    click.echo(f'{db_manager.db_path} at schema version {version} in {time.perf_counter() - started:.2f}s')
+
+@app.cli.command('export-bookings')
+@click.option('--format', 'export_format', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv')
+@click.option('--output', type=click.Path(dir_okay=False), default='-', help='File to write, or - for stdout.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--status', default='')
+@click.option('--payment-status', default='')
+def export_bookings_command(export_format, output, compress, status, payment_status):
+    """Stream every booking to CSV or NDJSON."""
+    serialize = EXPORT_FORMATS[export_format][0]
+    filters = {'status': status, 'payment_status': payment_status}
+    
+    conn = db_manager.get_connection()
+    cursor = query_all_bookings(conn.cursor(), filters)
+    chunks = serialize(booking_records(cursor))
+    with click.open_file(output, 'wb') as stream:
+        if compress:
+            for data in gzip_chunks(chunks):
+                stream.write(data)
+        else:
+            for chunk in chunks:
+                stream.write(chunk.encode('utf-8'))
+    conn.close()
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_TABLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'import_format', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Defaults to the file extension.')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+@click.option('--maintenance', is_flag=True,
+              help='Drop the table\'s indexes and triggers for the load; only while the application is stopped.')
+def import_command(kind, path, import_format, batch_size, maintenance):
+    """Bulk-load rooms or bookings from a CSV or NDJSON file (optionally .gz)."""
+    def progress(imported, rejected, elapsed):
+        click.echo(f'  {imported:,} rows imported, {rejected:,} rejected, {imported / elapsed:,.0f} rows/s')
+    
+    report = bulk_import(db_manager, kind, open_records(path, import_format), batch_size, progress, maintenance)
+    for line, error in report['errors']:
+        click.echo(f'  record {line}: {error}', err=True)
+    click.echo(f"Imported {report['imported']:,} {kind} ({report['rejected']:,} rejected) "
+               f"in {report['load_seconds']}s, {report['rows_per_second']:,} rows/s; "
+               f"{report['total_seconds']}s including index rebuild")
+
+@app.cli.command('night-audit')
+@click.option('--date', 'audit_date', default=None, help='Business date to close (YYYY-MM-DD); defaults to today.')
+@click.option('--chunk-size', default=AUDIT_CHUNK_SIZE, show_default=True)
+@click.option('--maintenance', is_flag=True,
+              help='Drop status indexes and triggers for a large backlog; only while the application is stopped.')
+def night_audit_command(audit_date, chunk_size, maintenance):
+    """Check out every stay whose check-out date has passed and recompute room availability."""
+    audit_day = day_number(audit_date) if audit_date else today_number()
+    
+    def progress(checked_out, elapsed):
+        click.echo(f'  {checked_out:,} stays checked out, {elapsed:.2f}s')
+    
+    report = run_night_audit(db_manager, audit_day, chunk_size, maintenance, on_chunk=progress)
+    catalog.invalidate()
+    availability.invalidate()
+    click.echo(f"Night audit {report['audit_date']} ({report['mode']}{', resumed' if report['resumed'] else ''}): "
+               f"{report['checked_out']:,} stays checked out in {report['chunks']} chunks, "
+               f"{report['rooms_updated']} rooms updated")
+    click.echo(f"  check-out {report['check_out_seconds']}s, index and counter rebuild {report['restore_seconds']}s, "
+               f"availability {report['availability_seconds']}s, total {report['total_seconds']}s")
+
+@app.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Recompute the daily room-nights and revenue rollup from bookings."""
+    started = time.perf_counter()
+    conn = db_manager.get_connection()
+    rebuild_rollup(conn)
+    rows = conn.execute('SELECT COUNT(*) FROM daily_room_stats').fetchone()[0]
+    conn.close()
+    click.echo(f'daily_room_stats rebuilt: {rows:,} rows in {time.perf_counter() - started:.2f}s')
+
+@app.cli.command('rebuild-rates')
+def rebuild_rates_command():
+    """Recompile the rate calendar from the rate rules, room types and occupancy."""
+    started = time.perf_counter()
+    conn = db_manager.get_connection()
+    rebuild_rates(conn)
+    rows = conn.execute('SELECT COUNT(*) FROM rate_calendar').fetchone()[0]
+    conn.close()
+    click.echo(f'rate_calendar rebuilt: {rows:,} adjusted room-type nights in {time.perf_counter() - started:.2f}s')
+
+@app.cli.command('run-jobs')
+@click.option('--workers', default=JOB_WORKERS, show_default=True)
+def run_jobs_command(workers):
+    """Run background job workers in the foreground until interrupted."""
+    job_queue.start(workers)
+    click.echo(f'{workers} job workers running; Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(60)
+            click.echo(f'  jobs: {job_queue.metrics()}')
+    except KeyboardInterrupt:
+        job_queue.stop()
+
+# Routes exercised by check-query-plans, per role
+QUERY_PLAN_ROUTES = {
+    'admin': ['/rooms', '/admin_dashboard', '/manage_staff', '/all_bookings'],
+    'receptionist': ['/receptionist_dashboard', '/all_bookings?status=confirmed&payment_status=pending',
+                     '/all_bookings?q=john', '/all_bookings?q=guest+email&status=confirmed',
+                     '/all_bookings?q=john&stream=1'],
+    'guest': ['/rooms', '/rooms?check_in_date=2030-01-01&check_out_date=2030-01-03&room_type=Suite&capacity=2',
+              '/book_room/1', '/my_bookings', '/guest_dashboard'],
+    'staff': ['/staff_dashboard']
+}
+
+# Route statements that are meant to scan, verbatim after whitespace is collapsed
+QUERY_PLAN_ALLOWED_SCANS = set()
+
+# SQLite reports every virtual table access as a SCAN; an FTS5 plan whose index string
+# holds a MATCH (M) or rowid (=) constraint is a lookup in the full-text index. Scans of
+# a subquery's own rows (materialized or a co-routine) read no table
+def plan_scans(plan: list) -> bool:
+    subqueries = {step.split(' ', 1)[1] for step in plan if step.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+    for step in plan:
+        if not step.startswith('SCAN '):
+            continue
+        target = step[len('SCAN '):]
+        if target.startswith('(subquery-') or target in subqueries:
+            continue
+        virtual = re.search(r'VIRTUAL TABLE INDEX \d+:(\S*)', step)
+        if virtual is None or not re.match(r'[M=]', virtual.group(1)):
+            return True
+    return False
+
+# Rooms, guests and bookings seeded into the scratch database the plans are checked on
+QUERY_PLAN_ROOMS = 200
+QUERY_PLAN_GUESTS = 5000
+QUERY_PLAN_BOOKINGS = 50000
+
+# A fixed, hotel-shaped data set with its statistics gathered, so the plans checked are
+# those of a deployment in use and the same on every run
+def seed_query_plan_database():
+    db_manager.init_database()
+    db_manager.add_sample_data()
+    rng = random.Random(7)
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany('INSERT INTO rooms (room_number, room_type, price_per_night, capacity) VALUES (?, ?, ?, ?)', [
+        (f'Q{number:03d}', ['Single', 'Double', 'Suite'][number % 3], 50000 + 10000 * (number % 3), 1 + number % 3)
+        for number in range(QUERY_PLAN_ROOMS)])
+    cursor.executemany('''
+        INSERT INTO users (username, email, password, role, phone, loyalty_points)
+        VALUES (?, ?, 'guest123', 'guest', ?, 0)
+    ''', [(f'plan_guest{number}', f'plan.guest{number}@example.com', f'+25078{number:07d}')
+          for number in range(QUERY_PLAN_GUESTS)])
+    room_ids = [row[0] for row in cursor.execute('SELECT room_id FROM rooms')]
+    guest_ids = [row[0] for row in cursor.execute("SELECT user_id FROM users WHERE role = 'guest'")]
+    today = today_number()
+    bookings = []
+    for _ in range(QUERY_PLAN_BOOKINGS):
+        check_in = today + rng.randrange(-1000, 200)
+        status = 'confirmed' if check_in >= today else rng.choice(['checked_out', 'checked_out', 'cancelled'])
+        bookings.append((rng.choice(room_ids), rng.choice(guest_ids), check_in, check_in + rng.randint(1, 5),
+                         80000, status, rng.choice(['pending', 'paid'])))
+    cursor.executemany('''
+        INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount, status, payment_status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', bookings)
+    conn.commit()
+    rebuild_rollup(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    """Fail if any filtered query issued by a read route scans a table instead of searching an index."""
+    # Checked on a seeded scratch database, never on whatever db_path holds
+    live_path = db_manager.db_path
+    scratch = tempfile.mkdtemp()
+    db_manager.use_database(os.path.join(scratch, 'database.db'))
+    try:
+        seed_query_plan_database()
+        explain_route_queries()
+    finally:
+        db_manager.use_database(live_path)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def explain_route_queries():
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT role, MIN(user_id), username FROM users GROUP BY role')
+    accounts = cursor.fetchall()
+    conn.close()
+    
+    statements = {}
+    for role, user_id, username in accounts:
+        client = app.test_client()
+        with client.session_transaction() as client_session:
+            client_session.update({'user_id': user_id, 'username': username, 'role': role})
+        for route in QUERY_PLAN_ROUTES.get(role, []):
+            traced = []
+            db_manager.set_trace_callback(traced.append)
+            # A fresh app context per route so its pooled connection is released afterwards
+            with app.app_context():
+                client.get(route)
+            db_manager.set_trace_callback(None)
+            for sql in traced:
+                if sql.lstrip().upper().startswith('SELECT'):
+                    statements.setdefault(' '.join(sql.split()), route)
+    
+    failures = 0
+    for sql, route in statements.items():
+        plan = db_manager.explain_query_plan(sql)
+        # Unfiltered listings and counts may scan; anything with a WHERE clause must search
+        filtered = ' WHERE ' in sql.upper() and sql not in QUERY_PLAN_ALLOWED_SCANS
+        if filtered and plan_scans(plan):
+            failures += 1
+            click.echo(f'FAIL {route}: {sql}')
+            for step in plan:
+                click.echo(f'    {step}')
+        else:
+            click.echo(f'ok   {route}: {sql[:90]}')
+    
+    if failures:
+        raise SystemExit(f'{failures} route queries scan without an index')
+    click.echo(f'{len(statements)} route queries use an index')
+
 if __name__ == '__main__':
     app.run(debug=True)
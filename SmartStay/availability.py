@@ -0,0 +1,149 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+import json
+import threading
+import time
+
+from models import Room
+
+# Date-range availability engine
+# Keeps every confirmed stay in a per-room list sorted by check-in day number. Stays in one
+# room never overlap, so the only stay that can clash with a request is the last one
+# starting before the requested check-out, which bisect finds in O(log n).
+#
+# The index is a search hint, not the booking guard: BookingService's guarded insert
+# decides whether a stay can be booked. Like the room catalog it is refreshed when this
+# process bumps its version and at least every max_age seconds, so bookings, cancellations,
+# imports and night audits in other processes show up within that time. A refresh reads
+# the highest change_id in room_changes, which triggers stamp on a room whenever one of its
+# confirmed stays changes, and reloads only the rooms stamped since the last one; the
+# whole index is read only on first use, on reload() or when the stamps go backwards.
+
+ALL_STAYS = '''
+    SELECT booking_id, room_id, check_in_date, check_out_date
+    FROM bookings
+    WHERE status = 'confirmed'
+    ORDER BY room_id, check_in_date
+'''
+
+ROOM_STAYS = '''
+    SELECT booking_id, room_id, check_in_date, check_out_date
+    FROM bookings
+    WHERE status = 'confirmed' AND room_id IN (SELECT value FROM json_each(?))
+    ORDER BY room_id, check_in_date
+'''
+
+class AvailabilityIndex:
+    def __init__(self, db_manager, catalog, max_age: float = 5.0):
+        self._db_manager = db_manager
+        self._catalog = catalog
+        self._max_age = max_age
+        self.lock = threading.RLock()
+        self._version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._change_id: Optional[int] = None
+        self._starts: Dict[int, List[int]] = {}
+        self._stays: Dict[int, List[Tuple[int, int, int]]] = {}
+
+    def invalidate(self):
+        with self.lock:
+            self._version += 1
+
+    def _ensure_loaded(self):
+        if self._loaded_version == self._version and time.monotonic() - self._loaded_at < self._max_age:
+            return
+        with self.lock:
+            if self._loaded_version == self._version and time.monotonic() - self._loaded_at < self._max_age:
+                return
+            version = self._version
+            with self._db_manager.primary():
+                conn = self._db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                # One snapshot for the stamp and the stays it covers
+                cursor.execute('BEGIN')
+                cursor.execute('SELECT COALESCE(MAX(change_id), 0) FROM room_changes')
+                change_id = cursor.fetchone()[0]
+                if self._change_id is None or change_id < self._change_id:
+                    cursor.execute(ALL_STAYS)
+                    self._starts, self._stays = self._read_stays(cursor)
+                elif change_id > self._change_id:
+                    cursor.execute('SELECT room_id FROM room_changes WHERE change_id > ?', (self._change_id,))
+                    rooms = [row[0] for row in cursor.fetchall()]
+                    cursor.execute(ROOM_STAYS, (json.dumps(rooms),))
+                    starts, stays = self._read_stays(cursor)
+                    for room_id in rooms:
+                        self._starts[room_id] = starts.get(room_id, [])
+                        self._stays[room_id] = stays.get(room_id, [])
+                conn.commit()
+            finally:
+                conn.close()
+            self._change_id = change_id
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _read_stays(cursor) -> Tuple[Dict[int, List[int]], Dict[int, List[Tuple[int, int, int]]]]:
+        starts: Dict[int, List[int]] = {}
+        stays: Dict[int, List[Tuple[int, int, int]]] = {}
+        for booking_id, room_id, check_in, check_out in cursor:
+            starts.setdefault(room_id, []).append(check_in)
+            stays.setdefault(room_id, []).append((check_in, check_out, booking_id))
+        return starts, stays
+
+    def reload(self):
+        with self.lock:
+            self._change_id = None
+        self.invalidate()
+        self._ensure_loaded()
+
+    def is_available(self, room_id: int, check_in: int, check_out: int) -> bool:
+        self._ensure_loaded()
+        with self.lock:
+            starts = self._starts.get(room_id)
+            if not starts:
+                return True
+            i = bisect_left(starts, check_out)
+            return i == 0 or self._stays[room_id][i - 1][1] <= check_in
+
+    def is_occupied_on(self, room_id: int, day: int) -> bool:
+        return not self.is_available(room_id, day, day + 1)
+
+    def add(self, booking_id: int, room_id: int, check_in: int, check_out: int) -> bool:
+        self._ensure_loaded()
+        with self.lock:
+            if not self.is_available(room_id, check_in, check_out):
+                # The database took the booking, so the clashing stay here is stale
+                self._version += 1
+                return False
+            starts = self._starts.setdefault(room_id, [])
+            i = bisect_right(starts, check_in)
+            starts.insert(i, check_in)
+            self._stays.setdefault(room_id, []).insert(i, (check_in, check_out, booking_id))
+            return True
+
+    def remove(self, booking_id: int, room_id: int, check_in: int):
+        self._ensure_loaded()
+        with self.lock:
+            starts = self._starts.get(room_id, [])
+            stays = self._stays.get(room_id, [])
+            i = bisect_left(starts, check_in)
+            while i < len(starts) and starts[i] == check_in:
+                if stays[i][2] == booking_id:
+                    del starts[i]
+                    del stays[i]
+                    return
+                i += 1
+
+    def find_available_rooms(self, check_in: int, check_out: int,
+                             room_type: Optional[str] = None, capacity: Optional[int] = None) -> List[Room]:
+        rooms = []
+        for room in self._catalog.all():
+            if room_type and room.get_room_type() != room_type:
+                continue
+            if capacity and room.get_capacity() < capacity:
+                continue
+            if self.is_available(room.get_room_id(), check_in, check_out):
+                rooms.append(room)
+        return rooms
@@ -0,0 +1,78 @@
+"""Time the daily rollup rebuild and the revenue and occupancy report over a year of
+stays in a 500-room property.
+
+    python benchmarks/bench_analytics.py [rooms]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from analytics import ANALYTICS_GRAINS, RevenueAnalytics, revenue_report
+from models import DatabaseManager, day_number
+from rollup import rebuild_rollup
+
+ROOM_TYPES = [('Single', 50000, 1), ('Double', 80000, 2), ('Suite', 150000, 4)]
+
+def seed(db_manager, rooms: int, start: date, days: int) -> int:
+    rng = random.Random(7)
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany('INSERT INTO rooms (room_number, room_type, price_per_night, capacity) VALUES (?, ?, ?, ?)', [
+        (f'B{number:04d}',) + ROOM_TYPES[number % len(ROOM_TYPES)] for number in range(rooms)])
+    cursor.execute("SELECT room_id, price_per_night FROM rooms WHERE room_number LIKE 'B%'")
+    bookings = []
+    for room_id, price in cursor.fetchall():
+        # Back-to-back stays with short gaps, roughly 70% occupancy
+        first = day_number(start.isoformat())
+        day = first + rng.randint(0, 3)
+        while day < first + days:
+            nights = rng.randint(1, 5)
+            status = 'cancelled' if rng.random() < 0.05 else 'checked_out'
+            bookings.append((room_id, 4, day, day + nights, nights * price, status))
+            day += nights + rng.randint(0, 3)
+    cursor.executemany('''
+        INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', bookings)
+    conn.commit()
+    conn.close()
+    return len(bookings)
+
+def best_of(runs: int, func) -> float:
+    timings = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - began)
+    return min(timings)
+
+if __name__ == '__main__':
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    start = date(2024, 1, 1)
+    end = start + timedelta(days=366)
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'database.db'))
+    db_manager.init_database()
+    stays = seed(db_manager, rooms, start, 366)
+    print(f'{rooms} rooms, {stays:,} stays from {start} to {end}')
+
+    conn = db_manager.get_connection()
+    began = time.perf_counter()
+    rebuild_rollup(conn)
+    print(f'{"rollup rebuild":22} {(time.perf_counter() - began) * 1000:7.1f} ms')
+    for grain in ANALYTICS_GRAINS:
+        for by_room_type in (False, True):
+            seconds = best_of(5, lambda: revenue_report(conn, start.isoformat(), end.isoformat(), grain, by_room_type))
+            report = revenue_report(conn, start.isoformat(), end.isoformat(), grain, by_room_type)
+            label = f'{grain}{" x room_type" if by_room_type else ""}'
+            print(f'{label:22} {seconds * 1000:7.1f} ms  {len(report):4} rows')
+    conn.close()
+
+    analytics = RevenueAnalytics(db_manager)
+    analytics.report(start.isoformat(), end.isoformat(), 'month', True)
+    seconds = best_of(5, lambda: analytics.report(start.isoformat(), end.isoformat(), 'month', True))
+    print(f'{"cached month x type":22} {seconds * 1000:7.3f} ms')
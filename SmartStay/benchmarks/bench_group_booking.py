@@ -0,0 +1,99 @@
+"""Time booking a block of rooms one room per transaction, as a tour operator must with
+book_room, against one book_block transaction, then race blocks from several threads
+for the same dates and check that each either got every room or none.
+
+    python benchmarks/bench_group_booking.py [--rooms 400] [--threads 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from booking_service import FIND_FREE_ROOMS, BookingService
+from models import DatabaseManager, today_number
+
+BLOCK_SIZES = [30, 100]
+
+def seed(db_manager, rooms: int):
+    conn = db_manager.get_connection()
+    conn.executemany('INSERT INTO rooms (room_number, room_type, price_per_night, capacity) VALUES (?, ?, ?, ?)',
+                     [(f'G{number:04d}', 'Double', 80000, 2) for number in range(rooms)])
+    conn.commit()
+    conn.close()
+
+def price(room_type: str, price_per_night: int) -> int:
+    return 3 * price_per_night
+
+# A room search and a booking transaction per room
+def book_one_by_one(db_manager, service, guest_id: int, check_in: int, count: int, today: int) -> int:
+    booked = 0
+    for _ in range(count):
+        conn = db_manager.get_connection()
+        room = conn.execute(FIND_FREE_ROOMS, ('Double', 'Double', 2, check_in + 3, check_in, 1)).fetchone()
+        conn.close()
+        if room and service.book(room[0], guest_id, check_in, check_in + 3, price(room[1], room[2]), today):
+            booked += 1
+    return booked
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'database.db'))
+    db_manager.init_database()
+    db_manager.add_sample_data()
+    seed(db_manager, args.rooms)
+    service = BookingService(db_manager)
+    today = today_number()
+    print(f'{args.rooms} Double rooms')
+
+    check_in = today + 10
+    for size in BLOCK_SIZES:
+        began = time.perf_counter()
+        booked = book_one_by_one(db_manager, service, 4, check_in, size, today)
+        single = time.perf_counter() - began
+        check_in += 5
+        began = time.perf_counter()
+        block = service.book_block(4, check_in, check_in + 3, size, 'Double', 2, price, today)
+        grouped = time.perf_counter() - began
+        check_in += 5
+        print(f'{size:4} rooms: one by one {single * 1000:7.1f} ms ({booked} booked), '
+              f'book_block {grouped * 1000:6.1f} ms ({len(block or [])} booked), {single / grouped:.0f}x')
+
+    # Every thread asks for the same dates; the rooms only cover some of the blocks
+    size = args.rooms // args.threads * 2
+    results = []
+    start = threading.Event()
+
+    def race():
+        start.wait()
+        results.append(service.book_block(4, check_in, check_in + 3, size, 'Double', 2, price, today))
+
+    workers = [threading.Thread(target=race) for _ in range(args.threads)]
+    for worker in workers:
+        worker.start()
+    began = time.perf_counter()
+    start.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+
+    conn = db_manager.get_connection()
+    booked = conn.execute("SELECT COUNT(*) FROM bookings WHERE check_in_date = ? AND status = 'confirmed'",
+                          (check_in,)).fetchone()[0]
+    conn.close()
+    won = [block for block in results if block is not None]
+    partial = [block for block in won if len(block) != size]
+    print(f'{args.threads} threads racing for blocks of {size}: {len(won)} got every room, '
+          f'{len(results) - len(won)} got none, {booked} rooms booked in {elapsed * 1000:.1f} ms')
+    if partial or booked != len(won) * size:
+        sys.exit('a block was partly booked')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Memory and time to turn 100k booking rows into Booking objects.
+
+Compares the original path (dict-backed objects built by positional index plus
+setter calls) with the slotted models built through model_cursor().
+
+    python benchmarks/bench_models.py [rows]
+"""
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import Booking, model_cursor
+
+# Dict-backed copy of the original Booking class, for comparison
+class LegacyBooking:
+    def __init__(self, booking_id, room_id, guest_id, check_in_date, check_out_date, total_amount):
+        self._booking_id = booking_id
+        self._room_id = room_id
+        self._guest_id = guest_id
+        self._check_in_date = check_in_date
+        self._check_out_date = check_out_date
+        self._total_amount = total_amount
+        self._status = "confirmed"
+        self._payment_status = "pending"
+
+    def set_status(self, status):
+        self._status = status
+
+    def set_payment_status(self, status):
+        self._payment_status = status
+
+def seed(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE bookings (
+            booking_id INTEGER PRIMARY KEY, room_id INTEGER, guest_id INTEGER,
+            check_in_date TEXT, check_out_date TEXT, total_amount REAL,
+            status TEXT, payment_status TEXT
+        )
+    ''')
+    conn.executemany('INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+        (i, i % 500, i % 9000, '2024-01-01', '2024-01-03', 160000.0, 'confirmed', 'pending')
+        for i in range(1, rows + 1)))
+    return conn
+
+def legacy(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM bookings')
+    bookings = []
+    for booking_data in cursor.fetchall():
+        booking = LegacyBooking(booking_data[0], booking_data[1], booking_data[2],
+                                booking_data[3], booking_data[4], booking_data[5])
+        booking.set_status(booking_data[6])
+        booking.set_payment_status(booking_data[7])
+        bookings.append(booking)
+    return bookings
+
+def slotted(conn):
+    cursor = model_cursor(conn, Booking)
+    cursor.execute('SELECT * FROM bookings')
+    return cursor.fetchall()
+
+def measure(build, conn):
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        build(conn)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    objects = build(conn)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return min(timings), retained
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    conn = seed(rows)
+    results = {name: measure(build, conn) for name, build in [('legacy', legacy), ('slotted', slotted)]}
+    for name, (seconds, retained) in results.items():
+        print(f'{name:8} {seconds * 1000:8.1f} ms  {retained / 1024 / 1024:7.1f} MiB retained for {rows:,} rows')
+    (legacy_s, legacy_mem), (slotted_s, slotted_mem) = results['legacy'], results['slotted']
+    print(f'saved    {(legacy_s - slotted_s) * 1000:8.1f} ms  {(legacy_mem - slotted_mem) / 1024 / 1024:7.1f} MiB '
+          f'({1 - slotted_mem / legacy_mem:.0%} less memory)')
@@ -0,0 +1,116 @@
+"""Time stay quotes from the compiled rate calendar against evaluating the rate rules for
+every night of every quote, and the cost of keeping the calendar current as bookings
+move occupancy.
+
+    python benchmarks/bench_pricing.py [rooms] [quotes]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from booking_service import BookingService
+from catalog import RoomCatalog
+from models import DatabaseManager, today_number
+from pricing import RATE_FACTORS, PricingEngine, add_rate_rule, rebuild_rates
+from rollup import rebuild_rollup
+
+ROOM_TYPES = [('Single', 50000, 1), ('Double', 80000, 2), ('Suite', 150000, 4), ('Family', 120000, 5)]
+
+def seed(db_manager, rooms: int, today: int) -> int:
+    rng = random.Random(5)
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany('INSERT INTO rooms (room_number, room_type, price_per_night, capacity) VALUES (?, ?, ?, ?)', [
+        (f'P{number:04d}',) + ROOM_TYPES[number % len(ROOM_TYPES)] for number in range(rooms)])
+    cursor.execute("SELECT room_id, price_per_night FROM rooms WHERE room_number LIKE 'P%'")
+    bookings = []
+    for room_id, price in cursor.fetchall():
+        # The next 120 days about 60% sold, leaving room to book
+        day = today + rng.randint(0, 3)
+        while day < today + 120:
+            nights = rng.randint(1, 4)
+            bookings.append((room_id, 4, day, day + nights, nights * price))
+            day += nights + rng.randint(0, 4)
+    cursor.executemany('''
+        INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount)
+        VALUES (?, ?, ?, ?, ?)
+    ''', bookings)
+    conn.commit()
+    rebuild_rollup(conn)
+
+    # A year of seasons, a weekend uplift, two occupancy tiers and a suite discount
+    for month in range(12):
+        add_rate_rule(conn, f'season {month}', 'season', rng.choice([-10, 0, 10, 25]),
+                      start_day=today + month * 30, end_day=today + month * 30 + 30)
+    add_rate_rule(conn, 'weekend', 'weekend', 15)
+    add_rate_rule(conn, 'busy', 'occupancy', 10, min_occupancy=50)
+    add_rate_rule(conn, 'nearly full', 'occupancy', 20, min_occupancy=80)
+    add_rate_rule(conn, 'suite promotion', 'season', -5, room_type='Suite', start_day=today, end_day=today + 90)
+    conn.close()
+    return len(bookings)
+
+# The rules evaluated for each night of the stay, as pricing without a calendar would
+def quote_from_rules(cursor, room, check_in: int, check_out: int) -> int:
+    cursor.execute(RATE_FACTORS + ' SELECT SUM(factor) FROM factors', {
+        'first_day': check_in, 'last_day': check_out, 'room_type': room.get_room_type()})
+    return (room.get_price_per_night() * cursor.fetchone()[0] + 5000) // 10000
+
+def timed(func, stays) -> tuple:
+    began = time.perf_counter()
+    totals = [func(*stay) for stay in stays]
+    return (time.perf_counter() - began) / len(stays), totals
+
+if __name__ == '__main__':
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    quotes = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    today = today_number()
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'database.db'))
+    db_manager.init_database()
+    pricing_engine = PricingEngine(db_manager)
+    catalog = RoomCatalog(db_manager)
+    # Opens the compiled range, as the first quote of a deployment does
+    pricing_engine.factor_sum('Single', today, today + 1, today)
+    stays = seed(db_manager, rooms, today)
+    print(f'{rooms} rooms, {stays:,} stays, 16 rate rules')
+
+    conn = db_manager.get_connection()
+    began = time.perf_counter()
+    rebuild_rates(conn)
+    rows = conn.execute('SELECT COUNT(*) FROM rate_calendar').fetchone()[0]
+    print(f'{"full calendar compile":28} {(time.perf_counter() - began) * 1000:8.1f} ms  {rows:,} adjusted nights')
+
+    rng = random.Random(9)
+    requests = []
+    for _ in range(quotes):
+        check_in = today + rng.randrange(300)
+        requests.append((rng.choice(catalog.all()), check_in, check_in + rng.choice([1, 2, 3, 7, 14])))
+    pricing_engine.quote(*requests[0], today)
+    cursor = conn.cursor()
+    per_night, expected = timed(lambda room, check_in, check_out: quote_from_rules(cursor, room, check_in, check_out),
+                                requests)
+    calendar, totals = timed(lambda room, check_in, check_out: pricing_engine.quote(room, check_in, check_out, today),
+                             requests)
+    assert totals == expected, 'calendar and rule quotes differ'
+    print(f'{"quote, rules per night":28} {per_night * 1e6:8.1f} us')
+    print(f'{"quote, rate calendar":28} {calendar * 1e6:8.1f} us  ({per_night / calendar:.0f}x)')
+    conn.close()
+
+    # Bookings recompile their nights inside the booking transaction
+    service = BookingService(db_manager)
+    booked = refreshed = 0
+    began = time.perf_counter()
+    for room, check_in, check_out in requests[:500]:
+        state = db_manager.get_connection()
+        version = state.execute('SELECT version FROM rate_calendar_state').fetchone()[0]
+        state.close()
+        if service.book(room.get_room_id(), 4, check_in, check_out, 0, today) is not None:
+            booked += 1
+            state = db_manager.get_connection()
+            refreshed += state.execute('SELECT version FROM rate_calendar_state').fetchone()[0] != version
+            state.close()
+    print(f'{"booking incl. occupancy refresh":28} {(time.perf_counter() - began) / 500 * 1000:8.2f} ms  '
+          f'{booked} booked, {refreshed} changed the calendar')
@@ -0,0 +1,118 @@
+"""Compare read throughput on the primary and on backup-synced replicas while a writer
+keeps booking, and report how long a replica sync takes.
+
+    python benchmarks/bench_replicas.py [--replicas 2] [--threads 8] [--seconds 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from booking_service import BookingService
+from models import DatabaseManager, today_number
+
+ROOMS = 200
+STAYS_PER_ROOM = 50
+
+# The guest booking list and a dashboard-style aggregate, as the read routes run them
+READS = [
+    ('''
+        SELECT b.booking_id, b.check_in_date, b.check_out_date, b.total_amount, r.room_number
+        FROM bookings b JOIN rooms r ON r.room_id = b.room_id
+        WHERE b.guest_id = ? ORDER BY b.booking_id DESC
+    ''', lambda rng: (rng.randint(1, 500),)),
+    ('''
+        SELECT r.room_type, COUNT(*), SUM(b.total_amount) FROM bookings b
+        JOIN rooms r ON r.room_id = b.room_id
+        WHERE b.check_in_date BETWEEN ? AND ? GROUP BY r.room_type
+    ''', lambda rng: (lambda day: (day, day + 30))(today_number() + rng.randrange(365)))
+]
+
+def seed(db_manager):
+    rng = random.Random(3)
+    today = today_number()
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany('INSERT INTO rooms (room_number, room_type, price_per_night, capacity) VALUES (?, ?, ?, ?)', [
+        (f'R{number:04d}', ['Single', 'Double', 'Suite'][number % 3], 50000, 2) for number in range(ROOMS)])
+    cursor.execute("SELECT room_id FROM rooms WHERE room_number LIKE 'R%'")
+    bookings = []
+    for (room_id,) in cursor.fetchall():
+        day = today
+        for _ in range(STAYS_PER_ROOM):
+            bookings.append((room_id, rng.randint(1, 500), day, day + 2, 100000))
+            day += 3
+    cursor.executemany('''
+        INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount)
+        VALUES (?, ?, ?, ?, ?)
+    ''', bookings)
+    conn.commit()
+    conn.close()
+
+def run(db_manager, use_replicas: bool, threads: int, seconds: float) -> dict:
+    service = BookingService(db_manager)
+    stop = threading.Event()
+    counts = {'reads': 0, 'replica_reads': 0, 'writes': 0}
+    lock = threading.Lock()
+
+    def reader(seed_value):
+        rng = random.Random(seed_value)
+        reads = replica_reads = 0
+        while not stop.is_set():
+            statement, params = READS[reads % len(READS)]
+            with db_manager.reading() if use_replicas else db_manager.primary() as on_replica:
+                conn = db_manager.get_connection()
+                conn.execute(statement, params(rng)).fetchall()
+                conn.close()
+            reads += 1
+            replica_reads += on_replica
+        with lock:
+            counts['reads'] += reads
+            counts['replica_reads'] += replica_reads
+
+    def writer():
+        rng = random.Random(99)
+        today = today_number()
+        while not stop.is_set():
+            check_in = today + 400 + rng.randrange(2000)
+            if service.book(rng.randint(1, ROOMS), 4, check_in, check_in + 1, 50000, today) is not None:
+                counts['writes'] += 1
+
+    workers = [threading.Thread(target=reader, args=(seed_value,)) for seed_value in range(threads)]
+    workers.append(threading.Thread(target=writer))
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return dict(counts, reads_per_second=counts['reads'] / seconds, writes_per_second=counts['writes'] / seconds)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'database.db'), replicas=args.replicas)
+    db_manager.init_database()
+    seed(db_manager)
+    began = time.perf_counter()
+    db_manager.replicas.sync()
+    print(f'{ROOMS * STAYS_PER_ROOM:,} stays, {args.replicas} replicas synced in '
+          f'{(time.perf_counter() - began) * 1000:.1f} ms')
+
+    for label, use_replicas in (('primary', False), ('replicas', True)):
+        if use_replicas:
+            db_manager.replicas.start()
+        report = run(db_manager, use_replicas, args.threads, args.seconds)
+        print(f'{label:9} {report["reads_per_second"]:9,.0f} reads/s ({report["replica_reads"]:,} from replicas), '
+              f'{report["writes_per_second"]:7,.0f} bookings/s')
+    db_manager.replicas.stop()
+    print('replica metrics', db_manager.pool_metrics()['replicas'])
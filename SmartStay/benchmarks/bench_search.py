@@ -0,0 +1,100 @@
+"""Time guest and booking search (matching guests, facet counts over every match and the
+capped first page of bookings) over a large generated hotel.
+
+    python benchmarks/bench_search.py [bookings] [guests]
+
+Defaults to 1,000,000 bookings across 100,000 guests and 500 rooms.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import DatabaseManager, today_number
+from search import booking_condition, booking_facets, match_guests, search_guests, search_truncated
+
+FIRST_NAMES = ['anna', 'john', 'marie', 'eric', 'grace', 'jean', 'alice', 'david', 'claire', 'patrick',
+               'diane', 'joseph', 'aline', 'samuel', 'esther', 'kevin']
+LAST_NAMES = ['uwase', 'mugisha', 'habimana', 'niyonsaba', 'smith', 'kamanzi', 'ingabire', 'nkurunziza',
+              'mukamana', 'bizimana', 'johnson', 'keza']
+DOMAINS = ['gmail.com', 'yahoo.fr', 'outlook.com', 'mtn.co.rw']
+QUERIES = ['smith', 'jo', 'a', 'gmail', 'anna uwase', 'grace keza yahoo', '250788', '12', '1203', 'zzz']
+PAGE_SIZE = 50
+
+def seed(db_manager, bookings: int, guests: int, rooms: int = 500):
+    rng = random.Random(11)
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    users = []
+    for number in range(guests):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        users.append((f'{first}_{last}{number}', f'{first}.{last}{number}@{rng.choice(DOMAINS)}',
+                      f'+25078{rng.randrange(10 ** 7):07d}'))
+    cursor.executemany('''
+        INSERT INTO users (username, email, password, role, phone, loyalty_points)
+        VALUES (?, ?, 'guest123', 'guest', ?, 0)
+    ''', users)
+    cursor.executemany('INSERT INTO rooms (room_number, room_type, price_per_night, capacity) VALUES (?, ?, ?, ?)',
+                       [(f'{number // 100 + 1}{number % 100:02d}', 'Double', 80000, 2) for number in range(rooms)])
+    first_guest = cursor.execute("SELECT MIN(user_id) FROM users WHERE username LIKE '%\\_%' ESCAPE '\\'").fetchone()[0]
+    room_ids = [row[0] for row in cursor.execute('SELECT room_id FROM rooms')]
+    today = today_number()
+
+    def rows():
+        for _ in range(bookings):
+            check_in = today + rng.randrange(-1500, 365)
+            status = rng.choice(['confirmed', 'checked_out', 'checked_out', 'cancelled'])
+            yield (rng.choice(room_ids), first_guest + rng.randrange(guests), check_in, check_in + rng.randint(1, 5),
+                   80000, status, rng.choice(['pending', 'paid']))
+
+    cursor.executemany('''
+        INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount, status, payment_status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows())
+    cursor.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+def search(conn, query: str) -> tuple:
+    cursor = conn.cursor()
+    guest_ids = match_guests(cursor, query)
+    guests = search_guests(cursor, guest_ids)
+    facets = booking_facets(cursor, query)
+    truncated = search_truncated(cursor, query, guest_ids, facets)
+    condition, params = booking_condition(query, guest_ids)
+    cursor.execute(f'''
+        SELECT b.*, u.username, r.room_number, r.room_type
+        FROM bookings b
+        JOIN users u ON b.guest_id = u.user_id
+        JOIN rooms r ON b.room_id = r.room_id
+        WHERE {condition}
+        ORDER BY b.booking_id DESC
+        LIMIT ?
+    ''', params + [PAGE_SIZE])
+    page = cursor.fetchall()
+    return guests, facets, truncated, page
+
+if __name__ == '__main__':
+    bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    guests = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    db_manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), 'database.db'))
+    db_manager.init_database()
+    began = time.perf_counter()
+    seed(db_manager, bookings, guests)
+    print(f'{bookings:,} bookings, {guests:,} guests seeded in {time.perf_counter() - began:.1f}s')
+
+    conn = db_manager.get_connection()
+    for query in QUERIES:
+        search(conn, query)
+        timings = []
+        for _ in range(5):
+            began = time.perf_counter()
+            guests_found, facets, truncated, page = search(conn, query)
+            timings.append(time.perf_counter() - began)
+        matched = sum(facets['status'].values())
+        print(f'{query!r:20} {min(timings) * 1000:7.2f} ms  {len(guests_found):3} guests shown, '
+              f'{matched:7,} bookings matched, {len(page)} on the first page{" (capped)" if truncated else ""}')
+    conn.close()
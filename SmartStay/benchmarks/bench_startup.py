@@ -0,0 +1,74 @@
+"""Start many workers against one database at once and time the database work each does
+on boot: the lazy path the app now takes, and the old one that created the schema and
+inserted the sample data on every import.
+
+    python benchmarks/bench_startup.py [--workers 16]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, APP_DIR)
+
+from models import DatabaseManager
+
+DB_PATH = 'smartstay/database/database.db'
+
+def lazy_worker(start, results):
+    start.wait()
+    began = time.perf_counter()
+    import app as appmod
+    imported = time.perf_counter()
+    # The first request's checkout pays for the connection and the schema version check
+    conn = appmod.db_manager.get_connection()
+    conn.execute('SELECT COUNT(*) FROM rooms').fetchone()
+    conn.close()
+    done = time.perf_counter()
+    results.put((imported - began, done - imported))
+
+def eager_worker(start, results):
+    start.wait()
+    began = time.perf_counter()
+    db_manager = DatabaseManager(DB_PATH)
+    imported = time.perf_counter()
+    db_manager.init_database()
+    db_manager.add_sample_data()
+    results.put((imported - began, time.perf_counter() - imported))
+
+def run(target, workers: int) -> list:
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=target, args=(start, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)
+    start.set()
+    timings = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return timings
+
+def summary(label: str, timings: list):
+    db_work = sorted(timing[1] for timing in timings)
+    print(f'{label:22} db work per worker: median {db_work[len(db_work) // 2] * 1000:7.2f} ms, '
+          f'max {db_work[-1] * 1000:7.2f} ms, total {sum(db_work) * 1000:8.2f} ms')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    db_manager = DatabaseManager(DB_PATH)
+    db_manager.init_database()
+    db_manager.add_sample_data()
+
+    lazy = run(lazy_worker, args.workers)
+    imports = sorted(timing[0] for timing in lazy)
+    print(f'{args.workers} workers, app import median {imports[len(imports) // 2] * 1000:.1f} ms (no database work)')
+    summary('lazy (first checkout)', lazy)
+    summary('init on every import', run(eager_worker, args.workers))
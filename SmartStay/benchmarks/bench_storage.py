@@ -0,0 +1,218 @@
+"""Run the storage conformance checks and a booking benchmark against every backend.
+
+    python benchmarks/bench_storage.py [--dsn postgresql://localhost/smartstay_bench] [--threads 8] [--attempts 500]
+
+Backends:
+  sqlite         SQLiteStorage, as the app runs it
+  server-sqlite  ServerStorage over a SQLite file, standing in for a server database
+  postgresql     ServerStorage over psycopg2, only with --dsn; its tables are dropped
+                 and recreated, so point it at a throwaway database
+
+Every backend must pass the same checks; the benchmark then books random stays in a
+few rooms from several threads and verifies no two confirmed stays overlap.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from booking_service import BookingService
+from models import DatabaseManager, Guest, today_number
+from repositories import (POSTGRESQL_DIALECT, SQLITE_DIALECT, SQLiteStorage, ServerStorage, postgresql_connect,
+                          sqlite_server_connect)
+
+BENCH_ROOMS = 4
+HORIZON_DAYS = 365
+
+def sqlite_backend(workdir):
+    db_manager = DatabaseManager(os.path.join(workdir, 'sqlite.db'))
+    db_manager.init_database()
+    return SQLiteStorage(db_manager, BookingService(db_manager)), db_manager.get_connection, SQLITE_DIALECT
+
+def server_backend(connect, dialect, drop=False):
+    storage = ServerStorage(connect, dialect)
+    if drop:
+        conn = storage.pool.acquire()
+        for table in ['bookings', 'rooms', 'users']:
+            conn.cursor().execute(f'DROP TABLE IF EXISTS {table}')
+        conn.commit()
+        conn.close()
+    storage.create_schema()
+    return storage, storage.pool.acquire, dialect
+
+def execute(acquire, dialect, statement, params=()):
+    conn = acquire()
+    cursor = conn.cursor()
+    cursor.execute(dialect.sql(statement), params)
+    rows = cursor.fetchall() if cursor.description else None
+    conn.commit()
+    conn.close()
+    return rows
+
+def check(results, name, passed):
+    results.append((name, bool(passed)))
+
+def conformance(storage, acquire, dialect) -> list:
+    results = []
+    today = today_number()
+    execute(acquire, dialect, '''
+        INSERT INTO users (username, email, password, role, phone, loyalty_points)
+        VALUES (?, ?, ?, 'guest', '', 0), (?, ?, ?, 'guest', '', 0)
+    ''', ('ada', 'ada@example.com', 'pw', 'bob', 'bob@example.com', 'pw'))
+    ada = storage.users.authenticate('ada', 'pw')
+    bob = storage.users.authenticate('bob', 'pw')
+    check(results, 'authenticate returns the role subclass', isinstance(ada, Guest) and isinstance(bob, Guest))
+    check(results, 'authenticate rejects a wrong password', storage.users.authenticate('ada', 'nope') is None)
+    check(results, 'users.get round-trips', storage.users.get(ada.get_user_id()).get_username() == 'ada')
+    check(results, 'users.get of a missing id is None', storage.users.get(10 ** 9) is None)
+
+    staff_id = storage.users.add_staff('cleo', 'cleo@example.com', 'pw', 'staff', 'Housekeeping', 1800000.0,
+                                       '2024-01-01')
+    check(results, 'list_staff includes new staff', any(row[0] == staff_id for row in storage.users.list_staff()))
+    check(results, 'delete_staff refuses guests', storage.users.delete_staff(ada.get_user_id()) is False)
+    check(results, 'delete_staff removes staff once', storage.users.delete_staff(staff_id) is True
+          and storage.users.delete_staff(staff_id) is False)
+
+    room_b = storage.rooms.add('B1', 'Double', 80000, 2)
+    room_a = storage.rooms.add('A1', 'Single', 50000, 1)
+    room = storage.rooms.get(room_a)
+    check(results, 'rooms.get returns the room', room.get_room_number() == 'A1' and room.get_price_per_night() == 50000
+          and room.is_available())
+    check(results, 'rooms.all is ordered by number', [r.get_room_number() for r in storage.rooms.all()] == ['A1', 'B1'])
+
+    guest = ada.get_user_id()
+    first = storage.bookings.book(room_a, guest, today + 10, today + 12, 100000, today)
+    check(results, 'book returns an id', first is not None)
+    check(results, 'overlapping stay is refused', storage.bookings.book(room_a, guest, today + 11, today + 13, 1, today)
+          is None)
+    check(results, 'back-to-back stay is accepted',
+          storage.bookings.book(room_a, guest, today + 12, today + 13, 50000, today) is not None)
+    check(results, 'other room is independent', storage.bookings.book(room_b, guest, today + 10, today + 12, 1, today)
+          is not None)
+
+    tonight = storage.bookings.book(room_b, guest, today, today + 2, 160000, today)
+    check(results, 'stay covering today marks the room occupied', not storage.rooms.get(room_b).is_available())
+    check(results, 'cancel by another guest is refused',
+          storage.bookings.cancel(tonight, bob.get_user_id(), today) is None)
+    check(results, 'cancel returns room and check-in', storage.bookings.cancel(tonight, guest, today) == (room_b, today))
+    check(results, 'cancel frees the room', storage.rooms.get(room_b).is_available())
+    check(results, 'cancel twice is refused', storage.bookings.cancel(tonight, guest, today) is None)
+    check(results, 'cancelled dates can be rebooked',
+          storage.bookings.book(room_b, guest, today, today + 1, 80000, today) is not None)
+
+    listed = storage.bookings.for_guest(guest)
+    ids = [entry['booking'].get_booking_id() for entry in listed]
+    check(results, 'for_guest lists newest first', ids == sorted(ids, reverse=True) and len(ids) == 5)
+    check(results, 'for_guest carries dates, amount and room', any(
+        entry['booking'].get_booking_id() == first and entry['booking'].get_check_in_date() == today + 10
+        and entry['booking'].get_total_amount() == 100000 and entry['room_number'] == 'A1' for entry in listed))
+    check(results, 'for_guest of another guest is empty', storage.bookings.for_guest(bob.get_user_id()) == [])
+
+    def price(room_type, price_per_night):
+        return 2 * price_per_night
+
+    block = storage.bookings.book_block(guest, today + 20, today + 22, 2, None, 1, price, today)
+    check(results, 'book_block books every room with its price', block is not None
+          and sorted((room_id, total) for _, room_id, total in block) == sorted([(room_a, 100000), (room_b, 160000)]))
+    check(results, 'book_block refuses more rooms than are free, booking none',
+          storage.bookings.book_block(guest, today + 21, today + 23, 2, None, 1, price, today) is None
+          and len(storage.bookings.for_guest(guest)) == 7)
+    check(results, 'book_block filters by type and capacity', [room_id for _, room_id, _ in storage.bookings.book_block(
+        guest, today + 30, today + 31, 1, 'Double', 2, price, today) or []] == [room_b]
+          and storage.bookings.book_block(guest, today + 40, today + 41, 1, 'Single', 2, price, today) is None)
+    tonight_block = storage.bookings.book_block(bob.get_user_id(), today, today + 1, 1, 'Single', 1, price, today)
+    check(results, 'book_block covering today marks rooms occupied', tonight_block is not None
+          and not storage.rooms.get(room_a).is_available())
+    return results
+
+def benchmark(storage, acquire, dialect, threads: int, attempts: int) -> dict:
+    today = today_number()
+    guest = storage.users.authenticate('bob', 'pw').get_user_id()
+    rooms = [storage.rooms.add(f'Z{number}', 'Single', 50000, 1) for number in range(BENCH_ROOMS)]
+    latencies = []
+    counts = {'booked': 0, 'conflicts': 0}
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def work(seed):
+        rng = random.Random(seed)
+        mine = []
+        booked = conflicts = 0
+        start.wait()
+        for _ in range(attempts):
+            check_in = today + rng.randrange(HORIZON_DAYS)
+            began = time.perf_counter()
+            booking_id = storage.bookings.book(rng.choice(rooms), guest, check_in, check_in + rng.randint(1, 3),
+                                               50000, today)
+            mine.append(time.perf_counter() - began)
+            if booking_id is None:
+                conflicts += 1
+            else:
+                booked += 1
+        with lock:
+            latencies.extend(mine)
+            counts['booked'] += booked
+            counts['conflicts'] += conflicts
+
+    workers = [threading.Thread(target=work, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    began = time.perf_counter()
+    start.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+
+    placeholders = ', '.join('?' for _ in rooms)
+    overlaps = execute(acquire, dialect, f'''
+        SELECT COUNT(*) FROM bookings a
+        JOIN bookings b ON b.room_id = a.room_id AND b.booking_id > a.booking_id
+        WHERE a.room_id IN ({placeholders}) AND a.status = 'confirmed' AND b.status = 'confirmed'
+          AND a.check_in_date < b.check_out_date AND b.check_in_date < a.check_out_date
+    ''', rooms)[0][0]
+    latencies.sort()
+    return dict(counts, attempts=len(latencies), per_second=len(latencies) / elapsed, overlaps=overlaps,
+                p50=latencies[len(latencies) // 2], p99=latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dsn', help='PostgreSQL DSN of a throwaway database')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=500, help='booking attempts per thread')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    backends = [
+        ('sqlite', lambda: sqlite_backend(workdir)),
+        ('server-sqlite', lambda: server_backend(sqlite_server_connect(os.path.join(workdir, 'server.db')),
+                                                 SQLITE_DIALECT))
+    ]
+    if args.dsn:
+        backends.append(('postgresql', lambda: server_backend(postgresql_connect(args.dsn), POSTGRESQL_DIALECT,
+                                                              drop=True)))
+
+    failed = False
+    for name, make in backends:
+        storage, acquire, dialect = make()
+        results = conformance(storage, acquire, dialect)
+        passed = sum(1 for _, ok in results if ok)
+        print(f'{name}: {passed}/{len(results)} conformance checks passed')
+        for check_name, ok in results:
+            if not ok:
+                print(f'  FAIL {check_name}')
+                failed = True
+
+        report = benchmark(storage, acquire, dialect, args.threads, args.attempts)
+        failed = failed or report['overlaps'] > 0
+        print(f"  {report['attempts']:,} attempts from {args.threads} threads: {report['per_second']:,.0f}/s, "
+              f"p50 {report['p50'] * 1000:.2f} ms, p99 {report['p99'] * 1000:.2f} ms, "
+              f"{report['booked']:,} booked, {report['conflicts']:,} conflicts, {report['overlaps']} overlaps")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Load-test the booking workflows against a seeded hotel, through Flask's test client and
+through a local pre-fork WSGI server, and report requests per second and p50/p95/p99
+latency per workflow.
+
+    python benchmarks/bench_workflows.py [--rooms 200] [--guests 2000] [--years 2]
+        [--requests 200] [--mode both|test-client|server] [--server-workers 4] [--clients 8]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.25] [--slack-ms 2]
+
+The data is seeded through DatabaseManager and the bulk importer from a fixed seed, so
+every run sees the same hotel: the sample accounts, `rooms` rooms, `guests` guests
+(guest1 ... guestN, password guest123) and `years` years of back-to-back stays up to
+today, plus future bookings. The server mode forks `server-workers` processes sharing
+one listening socket, each running Werkzeug's threaded server, and drives them from
+`clients` threads over keep-alive connections.
+
+Results are written as JSON. With --baseline, the run fails when any request failed or
+when a workflow's p95 latency rose, or its requests per second fell, by more than the
+tolerance (p95 also gets --slack-ms of absolute headroom) against the same workflow and
+mode in the baseline file.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from importer import bulk_import
+from models import DatabaseManager
+
+DB_PATH = 'smartstay/database/database.db'
+ROOM_TYPES = [('Single', 50000, 1), ('Double', 80000, 2), ('Suite', 150000, 4)]
+ACCOUNTS = {
+    'admin': ('admin', 'admin123'),
+    'receptionist': ('reception', 'recep123'),
+    'staff': ('housekeeping', 'staff123')
+}
+
+def seed(db_manager, rooms: int, guests: int, years: int, rng: random.Random) -> dict:
+    db_manager.init_database()
+    db_manager.add_sample_data()
+    conn = db_manager.get_connection()
+    conn.executemany('''
+        INSERT INTO users (username, email, password, role, phone, loyalty_points)
+        VALUES (?, ?, 'guest123', 'guest', '', 0)
+    ''', [(f'guest{number}', f'guest{number}@example.com') for number in range(1, guests + 1)])
+    conn.commit()
+    conn.close()
+
+    bulk_import(db_manager, 'rooms', ({
+        'room_number': f'{number // 50 + 4}{number % 50:02d}',
+        'room_type': ROOM_TYPES[number % len(ROOM_TYPES)][0],
+        'price_per_night': ROOM_TYPES[number % len(ROOM_TYPES)][1],
+        'capacity': ROOM_TYPES[number % len(ROOM_TYPES)][2]
+    } for number in range(rooms)), maintenance=True)
+
+    today = date.today()
+    first = today - timedelta(days=365 * years)
+    prices = {room_type: price for room_type, price, _ in ROOM_TYPES}
+
+    def stays():
+        # Back-to-back stays with short gaps, roughly 70% occupancy, until a few weeks out
+        for number in range(rooms):
+            room_number = f'{number // 50 + 4}{number % 50:02d}'
+            price = prices[ROOM_TYPES[number % len(ROOM_TYPES)][0]]
+            day = first + timedelta(days=rng.randint(0, 3))
+            while day < today + timedelta(days=30):
+                nights = rng.randint(1, 5)
+                check_out = day + timedelta(days=nights)
+                if check_out <= today:
+                    status = 'cancelled' if rng.random() < 0.05 else 'checked_out'
+                else:
+                    status = 'confirmed'
+                yield {
+                    'room_number': room_number,
+                    'guest_username': f'guest{rng.randint(1, guests)}',
+                    'check_in_date': day.isoformat(),
+                    'check_out_date': check_out.isoformat(),
+                    'total_amount': nights * price,
+                    'status': status,
+                    'payment_status': 'paid' if status == 'checked_out' else 'pending'
+                }
+                day = check_out + timedelta(days=rng.randint(0, 3))
+
+    # Nothing else uses the database yet, so the load may drop indexes and triggers
+    report = bulk_import(db_manager, 'bookings', stays(), maintenance=True)
+    conn = db_manager.get_connection()
+    room_ids = [row[0] for row in conn.execute('SELECT room_id FROM rooms ORDER BY room_id')]
+    conn.close()
+    # Forked server workers must not inherit open SQLite connections
+    db_manager.pool.close_all()
+    return {'bookings': report['imported'], 'room_ids': room_ids}
+
+def stay(rng: random.Random, earliest: int, latest: int) -> dict:
+    check_in = date.today() + timedelta(days=rng.randint(earliest, latest))
+    return {'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=rng.randint(1, 4))).isoformat()}
+
+# name -> (role, expected status, request builder returning (method, path, form data))
+WORKFLOWS = {
+    'login': (None, 302, lambda rng, ctx: ('POST', '/login', {
+        'username': f'guest{rng.randint(1, ctx["guests"])}', 'password': 'guest123'})),
+    'rooms': ('guest', 200, lambda rng, ctx: ('GET', '/rooms', None)),
+    'rooms_search': ('guest', 200, lambda rng, ctx: ('GET', '/rooms?' + urlencode(stay(rng, 1, 60)), None)),
+    'book_room': ('guest', 302, lambda rng, ctx: (
+        'POST', f'/book_room/{rng.choice(ctx["room_ids"])}', stay(rng, 60, 3 * 365))),
+    'my_bookings': ('guest', 200, lambda rng, ctx: ('GET', '/my_bookings', None)),
+    'all_bookings': ('admin', 200, lambda rng, ctx: ('GET', '/all_bookings', None)),
+    'admin_dashboard': ('admin', 200, lambda rng, ctx: ('GET', '/admin_dashboard', None)),
+    'receptionist_dashboard': ('receptionist', 200, lambda rng, ctx: ('GET', '/receptionist_dashboard', None)),
+    'guest_dashboard': ('guest', 200, lambda rng, ctx: ('GET', '/guest_dashboard', None)),
+    'staff_dashboard': ('staff', 200, lambda rng, ctx: ('GET', '/staff_dashboard', None))
+}
+
+def credentials(role: str, rng: random.Random, ctx: dict) -> tuple:
+    if role == 'guest':
+        return f'guest{rng.randint(1, ctx["guests"])}', 'guest123'
+    return ACCOUNTS[role]
+
+class TestClientSession:
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def send(self, method: str, path: str, data=None) -> int:
+        response = self._client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+class HTTPSession:
+    def __init__(self, port: int):
+        self._connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self._cookie = None
+
+    def send(self, method: str, path: str, data=None) -> int:
+        headers = {'Cookie': self._cookie} if self._cookie else {}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self._connection.request(method, path, body, headers)
+        response = self._connection.getresponse()
+        response.read()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self._cookie = cookie.split(';', 1)[0]
+        return response.status
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def summarize(latencies: list, failures: int, elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'failures': failures,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3)
+    }
+
+def run_workflow(name: str, make_session, clients: int, requests: int, ctx: dict, seed_value: int) -> dict:
+    role, expected, build = WORKFLOWS[name]
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def client(index: int, count: int):
+        rng = random.Random(seed_value * 1000 + index)
+        session = make_session()
+        if role is not None:
+            username, password = credentials(role, rng, ctx)
+            session.send('POST', '/login', {'username': username, 'password': password})
+        mine = []
+        failed = 0
+        start.wait()
+        for _ in range(count):
+            method, path, data = build(rng, ctx)
+            if role is None:
+                # Each login starts from a fresh, signed-out session
+                session = make_session()
+            began = time.perf_counter()
+            status = session.send(method, path, data)
+            mine.append(time.perf_counter() - began)
+            failed += status != expected
+        with lock:
+            latencies.extend(mine)
+            failures[0] += failed
+
+    threads = [threading.Thread(target=client, args=(index, requests // clients + (index < requests % clients)))
+               for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, failures[0], time.perf_counter() - began)
+
+def serve(listener: socket.socket):
+    # Runs in a forked worker: import the app here so each worker has its own pool
+    import logging
+    from werkzeug.serving import make_server
+    import app as appmod
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    host, port = listener.getsockname()
+    make_server(host, port, appmod.app, threaded=True, fd=listener.fileno()).serve_forever()
+
+def run_server(args, ctx: dict) -> dict:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(128)
+    port = listener.getsockname()[1]
+    workers = [multiprocessing.get_context('fork').Process(target=serve, args=(listener,), daemon=True)
+               for _ in range(args.server_workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        # Warm every worker's imports and caches before timing
+        run_workflow('rooms', lambda: HTTPSession(port), args.clients, args.clients * 4, ctx, 0)
+        return {name: run_workflow(name, lambda: HTTPSession(port), args.clients, args.requests, ctx, index + 1)
+                for index, name in enumerate(WORKFLOWS)}
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        listener.close()
+
+def run_test_client(args, ctx: dict) -> dict:
+    import app as appmod
+    appmod.app.testing = True
+    make_session = lambda: TestClientSession(appmod.app)
+    run_workflow('rooms', make_session, 1, 20, ctx, 0)
+    return {name: run_workflow(name, make_session, 1, args.requests, ctx, index + 1)
+            for index, name in enumerate(WORKFLOWS)}
+
+def regressions(results: dict, baseline: dict, tolerance: float, slack_ms: float) -> list:
+    found = []
+    for mode, workflows in results.items():
+        for name, report in workflows.items():
+            if report['failures']:
+                found.append(f'{mode} {name}: {report["failures"]} failed requests')
+            before = baseline.get(mode, {}).get(name)
+            if before is None:
+                continue
+            # slack_ms keeps jitter on sub-millisecond routes from failing the run
+            if report['p95_ms'] > before['p95_ms'] * (1 + tolerance) + slack_ms:
+                found.append(f'{mode} {name}: p95 {before["p95_ms"]} -> {report["p95_ms"]} ms')
+            if report['rps'] < before['rps'] * (1 - tolerance):
+                found.append(f'{mode} {name}: {before["rps"]} -> {report["rps"]} requests/s')
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--guests', type=int, default=2000)
+    parser.add_argument('--years', type=int, default=2, help='years of past stays')
+    parser.add_argument('--requests', type=int, default=200, help='requests per workflow')
+    parser.add_argument('--mode', choices=['both', 'test-client', 'server'], default='both')
+    parser.add_argument('--server-workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients against the server')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='-', help='JSON results file, or - for stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--slack-ms', type=float, default=2.0, help='p95 growth always allowed, in ms')
+    args = parser.parse_args()
+
+    output = args.output if args.output == '-' else os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    # The app opens its database relative to the working directory
+    os.chdir(tempfile.mkdtemp())
+    began = time.perf_counter()
+    seeded = seed(DatabaseManager(DB_PATH), args.rooms, args.guests, args.years, random.Random(args.seed))
+    ctx = {'guests': args.guests, 'room_ids': seeded['room_ids']}
+    print(f'seeded {args.rooms} rooms, {args.guests:,} guests, {seeded["bookings"]:,} bookings in '
+          f'{time.perf_counter() - began:.1f}s', file=sys.stderr)
+
+    results = {}
+    # The server forks first, before this process imports the app and opens connections
+    if args.mode in ('both', 'server'):
+        results['server'] = run_server(args, ctx)
+    if args.mode in ('both', 'test-client'):
+        results['test_client'] = run_test_client(args, ctx)
+
+    for mode, workflows in results.items():
+        print(f'{mode}:', file=sys.stderr)
+        for name, report in workflows.items():
+            print(f'  {name:24} {report["rps"]:8,.1f}/s  p50 {report["p50_ms"]:8.2f} ms  '
+                  f'p95 {report["p95_ms"]:8.2f} ms  p99 {report["p99_ms"]:8.2f} ms  '
+                  f'{report["failures"]} failed', file=sys.stderr)
+
+    document = dict(results, config={key: value for key, value in vars(args).items()
+                                     if key not in ('output', 'baseline')})
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if output == '-':
+        print(text)
+    else:
+        with open(output, 'w') as results_file:
+            results_file.write(text + '\n')
+
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+    found = regressions(results, baseline, args.tolerance, args.slack_ms)
+    for line in found:
+        print(f'REGRESSION {line}', file=sys.stderr)
+    sys.exit(1 if found else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Concurrent booking load test against a single room.
+
+Starts several worker processes that all try to book overlapping stays in the same
+room at once, then reports throughput, latency percentiles and the number of
+overlapping confirmed stays left in the table (which must be zero).
+
+    python benchmarks/load_bookings.py [--processes 8] [--attempts 500] [--mode service|deferred]
+
+--mode deferred replays the old read-then-insert flow in SQLite's default deferred
+transactions, for comparison.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from booking_service import BookingService, is_busy
+from models import DatabaseManager, today_number
+
+ROOM_ID = 1
+GUEST_ID = 4
+HORIZON_DAYS = 365
+
+def deferred_book(db_manager, room_id, guest_id, check_in_date, check_out_date, total_amount, today):
+    conn = db_manager.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT 1 FROM bookings
+            WHERE status = 'confirmed' AND room_id = ? AND check_in_date < ? AND check_out_date > ?
+        ''', (room_id, check_out_date, check_in_date))
+        if cursor.fetchone():
+            return None
+        cursor.execute('''
+            INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (room_id, guest_id, check_in_date, check_out_date, total_amount))
+        booking_id = cursor.lastrowid
+        conn.commit()
+        return booking_id
+    except sqlite3.OperationalError:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def worker(db_path, mode, attempts, seed, start, results):
+    db_manager = DatabaseManager(db_path, pool_size=1)
+    service = BookingService(db_manager)
+    book = service.book if mode == 'service' else (
+        lambda *args: deferred_book(db_manager, *args))
+    rng = random.Random(seed)
+    today = today_number()
+    latencies = []
+    booked = conflicts = failures = 0
+
+    start.wait()
+    for _ in range(attempts):
+        check_in = today + rng.randrange(HORIZON_DAYS)
+        check_out = check_in + rng.randint(1, 3)
+        began = time.perf_counter()
+        try:
+            booking_id = book(ROOM_ID, GUEST_ID, check_in, check_out, 100, today)
+        except sqlite3.OperationalError as error:
+            if not is_busy(error):
+                raise
+            failures += 1
+        else:
+            if booking_id is None:
+                conflicts += 1
+            else:
+                booked += 1
+        latencies.append(time.perf_counter() - began)
+    results.put((latencies, booked, conflicts, failures, service.busy_retries))
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=500, help='booking attempts per process')
+    parser.add_argument('--mode', choices=['service', 'deferred'], default='service')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'database.db')
+    db_manager = DatabaseManager(db_path)
+    db_manager.init_database()
+    db_manager.add_sample_data()
+
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(db_path, args.mode, args.attempts, seed, start, results))
+                 for seed in range(args.processes)]
+    for process in processes:
+        process.start()
+    time.sleep(1.0)
+
+    began = time.perf_counter()
+    start.set()
+    collected = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for result in collected for latency in result[0])
+    booked, conflicts, failures, retries = (sum(result[i] for result in collected) for i in range(1, 5))
+
+    conn = sqlite3.connect(db_path)
+    overlaps = conn.execute('''
+        SELECT COUNT(*) FROM bookings a
+        JOIN bookings b ON b.room_id = a.room_id AND b.booking_id > a.booking_id
+        WHERE a.room_id = ? AND a.status = 'confirmed' AND b.status = 'confirmed'
+          AND a.check_in_date < b.check_out_date AND b.check_in_date < a.check_out_date
+    ''', (ROOM_ID,)).fetchone()[0]
+    conn.close()
+
+    print(f'mode            {args.mode}')
+    print(f'attempts        {len(latencies):,} from {args.processes} processes')
+    print(f'booked          {booked:,}   conflicts {conflicts:,}   busy failures {failures:,}   busy retries {retries:,}')
+    print(f'throughput      {len(latencies) / elapsed:,.0f} attempts/s')
+    print(f'latency         p50 {percentile(latencies, 0.50) * 1000:.2f} ms   '
+          f'p99 {percentile(latencies, 0.99) * 1000:.2f} ms   max {latencies[-1] * 1000:.2f} ms')
+    print(f'double bookings {overlaps}')
+    sys.exit(1 if overlaps else 0)
+
+if __name__ == '__main__':
+    main()
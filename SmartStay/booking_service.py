@@ -0,0 +1,172 @@
+from typing import Callable, List, Optional, Tuple
+import random
+import sqlite3
+import time
+
+from pricing import refresh_occupancy
+from rollup import apply_booking, apply_bookings
+
+# Booking writes
+# Every booking and cancellation runs in a BEGIN IMMEDIATE transaction, so the write lock
+# is taken before anything is read and two workers can never both pass the overlap check.
+# The check and the insert are one statement, and the room's is_available flag changes
+# in the same transaction, as do the stay's nights in daily_room_stats and, when occupancy
+# rules exist, their rates in rate_calendar. Dates are day
+# numbers and amounts whole RWF (see models.py). SQLITE_BUSY is retried a bounded number
+# of times with jittered exponential backoff; anything else, or running out of attempts,
+# is raised to the caller.
+#
+# A block booking finds its rooms with one query and inserts every stay with one
+# executemany, each row guarded by the same overlap check; if any row is refused the
+# whole block rolls back.
+
+BOOKING_RETRIES = 5
+BOOKING_BACKOFF = 0.01
+
+# Rooms of a type and minimum capacity free for the whole stay, in room number order
+FIND_FREE_ROOMS = '''
+    SELECT r.room_id, r.room_type, r.price_per_night
+    FROM rooms r
+    WHERE (? IS NULL OR r.room_type = ?) AND r.capacity >= ?
+      AND NOT EXISTS (
+          SELECT 1 FROM bookings b
+          WHERE b.status = 'confirmed' AND b.room_id = r.room_id
+            AND b.check_in_date < ? AND b.check_out_date > ?
+      )
+    ORDER BY r.room_number
+    LIMIT ?
+'''
+
+# Params: room_id, guest_id, check_in_date, check_out_date, total_amount, room_id, check_out_date, check_in_date
+BOOK_IF_FREE = '''
+    INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount)
+    SELECT ?, ?, ?, ?, ?
+    WHERE NOT EXISTS (
+        SELECT 1 FROM bookings
+        WHERE status = 'confirmed' AND room_id = ?
+          AND check_in_date < ? AND check_out_date > ?
+    )
+'''
+
+class RoomTaken(Exception):
+    pass
+
+def is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+class BookingService:
+    def __init__(self, db_manager, retries: int = BOOKING_RETRIES, backoff: float = BOOKING_BACKOFF):
+        self._db_manager = db_manager
+        self._retries = retries
+        self._backoff = backoff
+        self.busy_retries = 0
+
+    def _transaction(self, work: Callable[[sqlite3.Cursor], object]):
+        conn = self._db_manager.get_connection()
+        try:
+            for attempt in range(self._retries + 1):
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        result = work(conn.cursor())
+                        conn.commit()
+                    except BaseException:
+                        conn.rollback()
+                        raise
+                    return result
+                except sqlite3.OperationalError as error:
+                    if not is_busy(error) or attempt == self._retries:
+                        raise
+                    self.busy_retries += 1
+                    time.sleep(self._backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+        finally:
+            conn.close()
+
+    def book(self, room_id: int, guest_id: int, check_in_date: int, check_out_date: int,
+             total_amount: int, today: int) -> Optional[int]:
+        # Returns the new booking_id, or None when a confirmed stay overlaps the dates
+        def work(cursor):
+            cursor.execute(BOOK_IF_FREE, (room_id, guest_id, check_in_date, check_out_date, total_amount,
+                                          room_id, check_out_date, check_in_date))
+            if cursor.rowcount == 0:
+                return None
+            booking_id = cursor.lastrowid
+            apply_booking(cursor, booking_id, 1)
+            refresh_occupancy(cursor, room_id, check_in_date, check_out_date)
+
+            # The room is only occupied tonight if the stay has already started
+            if check_in_date <= today < check_out_date:
+                cursor.execute('UPDATE rooms SET is_available = 0 WHERE room_id = ?', (room_id,))
+            return booking_id
+
+        return self._transaction(work)
+
+    def cancel(self, booking_id: int, guest_id: int, today: int) -> Optional[Tuple[int, int]]:
+        # Returns (room_id, check_in_date) of the cancelled stay, or None if the guest
+        # has no confirmed booking with that id
+        def work(cursor):
+            cursor.execute('''
+                SELECT room_id, check_in_date, check_out_date FROM bookings
+                WHERE booking_id = ? AND guest_id = ? AND status = 'confirmed'
+            ''', (booking_id, guest_id))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            room_id = row[0]
+            apply_booking(cursor, booking_id, -1)
+            cursor.execute("UPDATE bookings SET status = 'cancelled' WHERE booking_id = ?", (booking_id,))
+            refresh_occupancy(cursor, room_id, row[1], row[2])
+
+            # Free the room unless another confirmed stay covers tonight
+            cursor.execute('''
+                UPDATE rooms SET is_available = 1
+                WHERE room_id = ? AND is_available = 0 AND NOT EXISTS (
+                    SELECT 1 FROM bookings
+                    WHERE status = 'confirmed' AND room_id = ?
+                      AND check_in_date <= ? AND check_out_date > ?
+                )
+            ''', (room_id, room_id, today, today))
+            return room_id, row[1]
+
+        return self._transaction(work)
+
+    def book_block(self, guest_id: int, check_in_date: int, check_out_date: int, count: int,
+                   room_type: Optional[str], capacity: int, price: Callable[[str, int], int],
+                   today: int) -> Optional[List[Tuple[int, int, int]]]:
+        # Books count rooms for one stay and returns (booking_id, room_id, total_amount) for
+        # each, or None when fewer are free; price(room_type, price_per_night) is the total
+        def work(cursor):
+            cursor.execute(FIND_FREE_ROOMS, (room_type, room_type, capacity, check_out_date, check_in_date, count))
+            rooms = cursor.fetchall()
+            if len(rooms) < count:
+                return None
+            cursor.executemany(BOOK_IF_FREE, [
+                (room_id, guest_id, check_in_date, check_out_date, price(found_type, price_per_night),
+                 room_id, check_out_date, check_in_date)
+                for room_id, found_type, price_per_night in rooms
+            ])
+            if cursor.rowcount != count:
+                raise RoomTaken()
+
+            room_ids = [room[0] for room in rooms]
+            placeholders = ', '.join('?' for _ in room_ids)
+            cursor.execute(f'''
+                SELECT booking_id, room_id, total_amount FROM bookings
+                WHERE guest_id = ? AND status = 'confirmed' AND check_in_date = ? AND check_out_date = ?
+                  AND room_id IN ({placeholders})
+                ORDER BY booking_id
+            ''', [guest_id, check_in_date, check_out_date] + room_ids)
+            bookings = cursor.fetchall()
+            apply_bookings(cursor, [booking[0] for booking in bookings], 1)
+            if check_in_date <= today < check_out_date:
+                cursor.execute(f'UPDATE rooms SET is_available = 0 WHERE room_id IN ({placeholders})', room_ids)
+            # One room of each type is enough to refresh that type's nights
+            for room_id in {room[1]: room[0] for room in rooms}.values():
+                refresh_occupancy(cursor, room_id, check_in_date, check_out_date)
+            return bookings
+
+        try:
+            return self._transaction(work)
+        except RoomTaken:
+            return None
@@ -0,0 +1,66 @@
+from typing import Callable, Dict, Hashable, List, Optional
+import threading
+import time
+
+from models import Room, model_cursor
+
+# In-process room catalog
+# Room objects are loaded once and served from memory until a room write bumps the
+# version counter. max_age bounds how stale the catalog can get when another worker
+# process made the write, since only writes in this process bump the counter.
+class RoomCatalog:
+    def __init__(self, db_manager, max_age: float = 5.0):
+        self._db_manager = db_manager
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._rooms: Dict[int, Room] = {}
+        self._ordered: List[Room] = []
+        self._fragments: Dict[Hashable, str] = {}
+
+    def get_version(self) -> int:
+        return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def _ensure_fresh(self):
+        if self._loaded_version == self._version and time.monotonic() - self._loaded_at < self._max_age:
+            return
+        with self._lock:
+            if self._loaded_version == self._version and time.monotonic() - self._loaded_at < self._max_age:
+                return
+            version = self._version
+            with self._db_manager.primary():
+                conn = self._db_manager.get_connection()
+            cursor = model_cursor(conn, Room)
+            cursor.execute('SELECT * FROM rooms ORDER BY room_number')
+            ordered = cursor.fetchall()
+            conn.close()
+
+            self._ordered = ordered
+            self._rooms = {room.get_room_id(): room for room in ordered}
+            self._fragments = {}
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+
+    def get(self, room_id: int) -> Optional[Room]:
+        self._ensure_fresh()
+        return self._rooms.get(room_id)
+
+    def all(self) -> List[Room]:
+        self._ensure_fresh()
+        return self._ordered
+
+    # Rendered HTML for the current catalog, rebuilt only after the catalog reloads
+    def fragment(self, key: Hashable, render: Callable[[List[Room]], str]) -> str:
+        self._ensure_fresh()
+        fragments = self._fragments
+        html = fragments.get(key)
+        if html is None:
+            html = render(self._ordered)
+            fragments[key] = html
+        return html
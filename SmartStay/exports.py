@@ -0,0 +1,70 @@
+from typing import Iterable, Iterator
+import csv
+import io
+import json
+import zlib
+
+from models import Booking, column_positions, row_builder
+
+# Bulk booking export
+# Rows are read from an executed cursor in fetchmany batches and serialized one at a
+# time through Booking.to_dict, so an export never holds more than one batch in memory.
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ['booking_id', 'room_id', 'guest_id', 'check_in_date', 'check_out_date', 'total_amount',
+                 'status', 'payment_status', 'guest_username', 'room_number', 'room_type']
+
+# Expects the all_bookings columns: b.*, u.username, r.room_number, r.room_type
+def booking_records(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    columns = column_positions(cursor)
+    build_booking = row_builder(Booking, columns)
+    username, room_number, room_type = columns['username'], columns['room_number'], columns['room_type']
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            record = build_booking(row).to_dict()
+            record['guest_username'] = row[username]
+            record['room_number'] = row[room_number]
+            record['room_type'] = row[room_type]
+            yield record
+
+def csv_chunks(records: Iterable[dict], rows_per_chunk: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    pending = 0
+    for record in records:
+        writer.writerow(record)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+def ndjson_chunks(records: Iterable[dict], rows_per_chunk: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, separators=(',', ':')))
+        if len(lines) >= rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    # wbits=31 writes a gzip header so the output is a regular .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+EXPORT_FORMATS = {
+    'csv': (csv_chunks, 'text/csv'),
+    'ndjson': (ndjson_chunks, 'application/x-ndjson')
+}
@@ -0,0 +1,212 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import csv
+import gzip
+import io
+import json
+import time
+
+from models import BOOKING_STATUSES, PAYMENT_STATUSES, day_number, minor_units
+from night_audit import restore_deferred, set_aside
+from pricing import rebuild_rates
+from rollup import rebuild_rollup
+from stats import rebuild_stats
+
+# Bulk room and booking import
+# Records are streamed from CSV or NDJSON, validated a batch at a time and written with
+# executemany, one transaction per batch, alongside live traffic with every index and
+# trigger in place. Only in maintenance mode, with the application stopped, are the
+# target table's indexes and triggers dropped for the load and rebuilt afterwards, as the
+# night audit does. The dropped DDL is kept in night_audit_deferred and restored however
+# the load ends, or by the next import or night audit if the process dies. A failed
+# batch is rolled back and the error raised; once a load completes, the dashboard
+# counters, the daily room rollup and the rate calendar are recomputed.
+#
+# Bookings must name an existing room and guest, and confirmed stays go in one at a time
+# through the same overlap check as a live booking; the index that check uses stays in
+# place during the load.
+
+IMPORT_BATCH_SIZE = 10000
+
+# Indexes left in place during a load
+IMPORT_KEPT_INDEXES = {
+    'rooms': [],
+    'bookings': ['idx_bookings_status']
+}
+
+IMPORT_TABLES = {
+    'rooms': ('rooms', ['room_number', 'room_type', 'price_per_night', 'capacity', 'is_available']),
+    'bookings': ('bookings', ['room_id', 'guest_id', 'check_in_date', 'check_out_date', 'total_amount',
+                              'status', 'payment_status'])
+}
+
+# A confirmed booking row, then its room_id, check_out_date and check_in_date; inserts
+# nothing when the room already has a confirmed stay on any of its nights
+INSERT_CONFIRMED_IF_FREE = '''
+    INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount, status, payment_status)
+    SELECT ?, ?, ?, ?, ?, ?, ?
+    WHERE NOT EXISTS (
+        SELECT 1 FROM bookings
+        WHERE status = 'confirmed' AND room_id = ?
+          AND check_in_date < ? AND check_out_date > ?
+    )
+'''
+
+def open_records(path: str, import_format: Optional[str] = None) -> Iterator[dict]:
+    name = path[:-3] if path.endswith('.gz') else path
+    if import_format is None:
+        import_format = 'csv' if name.endswith('.csv') else 'ndjson'
+    raw = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+    with io.TextIOWrapper(raw, encoding='utf-8', newline='') as stream:
+        if import_format == 'csv':
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+def _validate_room(record: dict, lookups: dict) -> tuple:
+    room_number = str(record['room_number']).strip()
+    room_type = str(record['room_type']).strip()
+    if not room_number or not room_type:
+        raise ValueError('room_number and room_type are required')
+    price = minor_units(record['price_per_night'])
+    capacity = int(record['capacity'])
+    if price < 0 or capacity < 1:
+        raise ValueError('price_per_night must be >= 0 and capacity >= 1')
+    is_available = record.get('is_available', 1)
+    is_available = 0 if str(is_available).strip().lower() in ('0', 'false', 'no') else 1
+    return (room_number, room_type, price, capacity, is_available)
+
+def _validate_booking(record: dict, lookups: dict) -> tuple:
+    # Rooms and guests can be referenced by id or by room_number / guest_username
+    room_id = record.get('room_id') or lookups['rooms'].get(str(record.get('room_number', '')))
+    guest_id = record.get('guest_id') or lookups['guests'].get(str(record.get('guest_username', '')))
+    if not room_id or not guest_id:
+        raise ValueError('unknown room or guest')
+    room_id, guest_id = int(room_id), int(guest_id)
+    if room_id not in lookups['room_ids'] or guest_id not in lookups['guest_ids']:
+        raise ValueError('unknown room or guest')
+    check_in_date = day_number(str(record['check_in_date']))
+    check_out_date = day_number(str(record['check_out_date']))
+    if check_out_date <= check_in_date:
+        raise ValueError('check_out_date must be after check_in_date')
+    status = record.get('status') or 'confirmed'
+    payment_status = record.get('payment_status') or 'pending'
+    if status not in BOOKING_STATUSES or payment_status not in PAYMENT_STATUSES:
+        raise ValueError('unknown status or payment_status')
+    total_amount = minor_units(record['total_amount'])
+    if total_amount < 0:
+        raise ValueError('total_amount must be >= 0')
+    return (room_id, guest_id, check_in_date, check_out_date, total_amount,
+            status, payment_status)
+
+VALIDATORS: Dict[str, Callable[[dict, dict], tuple]] = {
+    'rooms': _validate_room,
+    'bookings': _validate_booking
+}
+
+def _load_lookups(cursor, kind: str) -> dict:
+    if kind != 'bookings':
+        return {}
+    cursor.execute('SELECT room_number, room_id FROM rooms')
+    rooms = dict(cursor.fetchall())
+    cursor.execute("SELECT username, user_id FROM users WHERE role = 'guest'")
+    guests = dict(cursor.fetchall())
+    return {'rooms': rooms, 'guests': guests,
+            'room_ids': set(rooms.values()), 'guest_ids': set(guests.values())}
+
+def _batches(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def bulk_import(db_manager, kind: str, records: Iterable[dict], batch_size: int = IMPORT_BATCH_SIZE,
+                on_batch: Optional[Callable[[int, int, float], None]] = None, maintenance: bool = False) -> dict:
+    table, columns = IMPORT_TABLES[kind]
+    validate = VALIDATORS[kind]
+    insert = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})'
+    if kind == 'rooms':
+        insert = insert.replace('INSERT', 'INSERT OR IGNORE', 1)
+
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    lookups = _load_lookups(cursor, kind)
+
+    # Restore whatever an interrupted import or night audit left behind; in maintenance
+    # mode, then set aside secondary indexes and triggers on the target table for the load
+    restore_deferred(conn)
+    if maintenance:
+        kept = IMPORT_KEPT_INDEXES[kind]
+        set_aside(conn, f'''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+              AND name NOT IN ({", ".join("?" for _ in kept) or "''"})
+        ''', (table, *kept))
+        cursor.execute('PRAGMA synchronous = OFF')
+
+    imported = 0
+    rejected = 0
+    errors: List[Tuple[int, str]] = []
+    line = 0
+    start = time.perf_counter()
+    try:
+        try:
+            for batch in _batches(records, batch_size):
+                rows = []
+                for record in batch:
+                    line += 1
+                    try:
+                        row = validate(record, lookups)
+                        if kind == 'bookings' and row[5] == 'confirmed':
+                            # Guarded like a live booking, so it sees earlier rows of the batch too
+                            cursor.execute(INSERT_CONFIRMED_IF_FREE, row + (row[0], row[3], row[2]))
+                            if cursor.rowcount == 0:
+                                raise ValueError('room is already booked for those dates')
+                            imported += 1
+                        else:
+                            rows.append(row)
+                    except (KeyError, TypeError, ValueError) as error:
+                        rejected += 1
+                        if len(errors) < 20:
+                            errors.append((line, str(error)))
+                # Room numbers already taken are skipped by INSERT OR IGNORE and count as rejected
+                cursor.executemany(insert, rows)
+                inserted = cursor.rowcount if rows else 0
+                conn.commit()
+                imported += inserted
+                rejected += len(rows) - inserted
+                if on_batch:
+                    on_batch(imported, rejected, time.perf_counter() - start)
+        except BaseException:
+            # The batch in progress is dropped; earlier batches are committed
+            conn.rollback()
+            raise
+        finally:
+            # Build indexes and restore triggers once, after the data is in
+            restore_deferred(conn)
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        load_seconds = time.perf_counter() - start
+
+        cursor.execute(f'ANALYZE {table}')
+        conn.commit()
+        rebuild_stats(conn)
+        if kind == 'bookings':
+            rebuild_rollup(conn)
+        rebuild_rates(conn)
+    finally:
+        conn.close()
+
+    total_seconds = time.perf_counter() - start
+    return {
+        'imported': imported,
+        'rejected': rejected,
+        'errors': errors,
+        'load_seconds': round(load_seconds, 3),
+        'total_seconds': round(total_seconds, 3),
+        'rows_per_second': round(imported / load_seconds) if load_seconds else imported
+    }
@@ -0,0 +1,200 @@
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+import cProfile
+import io
+import pstats
+import random
+import sqlite3
+import threading
+import time
+
+# Request and SQL instrumentation
+# Every connection the DatabaseManager opens is a TracingConnection, whose cursors time
+# each execute()/executemany() (up to the first row for SELECTs; fetching is not
+# counted) and report it to the connection's observer. RequestMetrics is that observer:
+# it keeps per-statement totals, counts the statements run by the request on the current
+# thread, and turns Flask request and template hooks into Prometheus histograms.
+# Statements run outside a request (jobs, CLI commands, streamed bodies) still count
+# toward the statement totals.
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 250]
+STATEMENT_LIMIT = 500
+PROFILES_KEPT = 20
+PROFILE_LINES = 25
+
+class TracingCursor(sqlite3.Cursor):
+    def execute(self, sql, *args):
+        observer = getattr(self.connection, 'observer', None)
+        if observer is None:
+            return super().execute(sql, *args)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            observer(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, *args):
+        observer = getattr(self.connection, 'observer', None)
+        if observer is None:
+            return super().executemany(sql, *args)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            observer(sql, time.perf_counter() - started)
+
+# Connection.execute() and executemany() go through cursor(), so they are traced too;
+# cursors on a plain sqlite3 connection run untraced
+class TracingConnection(sqlite3.Connection):
+    observer: Optional[Callable[[str, float], None]] = None
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+class Histogram:
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ['+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.total:.6f}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class RequestMetrics:
+    def __init__(self, profile_rate: float = 0.0, profile_slow: float = 0.5,
+                 statement_limit: int = STATEMENT_LIMIT):
+        self._profile_rate = profile_rate
+        self._profile_slow = profile_slow
+        self._statement_limit = statement_limit
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._queries: Dict[Tuple[str, str], Histogram] = {}
+        self._responses: Dict[Tuple[str, str, int], int] = {}
+        self._renders: Dict[str, Histogram] = {}
+        # Normalized SQL -> [executions, total seconds, slowest]
+        self._statements: Dict[str, List[float]] = {}
+        self._profiles = deque(maxlen=PROFILES_KEPT)
+
+    def begin(self):
+        local = self._local
+        local.started = time.perf_counter()
+        local.queries = 0
+        local.renders = []
+        local.profiler = None
+        if self._profile_rate and random.random() < self._profile_rate:
+            local.profiler = cProfile.Profile()
+            local.profiler.enable()
+
+    def end(self, endpoint: Optional[str], method: str, status: int):
+        local = self._local
+        started = getattr(local, 'started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        profiler = local.profiler
+        if profiler is not None:
+            profiler.disable()
+        local.started = None
+        key = (endpoint or 'unmatched', method)
+        with self._lock:
+            self._latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self._queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(local.queries)
+            self._responses[key + (status,)] = self._responses.get(key + (status,), 0) + 1
+        if profiler is not None and elapsed >= self._profile_slow:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            self._profiles.append({'endpoint': key[0], 'method': method, 'status': status,
+                                   'seconds': round(elapsed, 6), 'queries': local.queries,
+                                   'at': time.time(), 'profile': out.getvalue()})
+
+    def record_statement(self, sql: str, seconds: float):
+        if getattr(self._local, 'started', None) is not None:
+            self._local.queries += 1
+        statement = ' '.join(sql.split())
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                # Statements built with variable IN lists would otherwise grow without bound
+                if len(self._statements) >= self._statement_limit:
+                    statement = 'other'
+                stats = self._statements.setdefault(statement, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def render_started(self, template: str):
+        renders = getattr(self._local, 'renders', None)
+        if renders is None:
+            renders = self._local.renders = []
+        renders.append((template, time.perf_counter()))
+
+    def render_finished(self, template: str):
+        renders = getattr(self._local, 'renders', None)
+        if not renders:
+            return
+        name, started = renders.pop()
+        with self._lock:
+            self._renders.setdefault(name, Histogram(LATENCY_BUCKETS)).observe(time.perf_counter() - started)
+
+    def profiles(self) -> List[dict]:
+        return list(self._profiles)
+
+    # extra maps more metric names to (type, help text, value)
+    def prometheus(self, extra: Dict[str, Tuple[str, str, float]] = None) -> str:
+        lines = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            family('smartstay_request_duration_seconds', 'histogram', 'Time from before_request to after_request.')
+            for (endpoint, method), histogram in sorted(self._latency.items()):
+                lines.extend(histogram.lines('smartstay_request_duration_seconds',
+                                             f'endpoint="{_label(endpoint)}",method="{method}"'))
+            family('smartstay_request_queries', 'histogram', 'SQL statements executed per request.')
+            for (endpoint, method), histogram in sorted(self._queries.items()):
+                lines.extend(histogram.lines('smartstay_request_queries',
+                                             f'endpoint="{_label(endpoint)}",method="{method}"'))
+            family('smartstay_responses_total', 'counter', 'Responses by route and status code.')
+            for (endpoint, method, status), count in sorted(self._responses.items()):
+                lines.append(f'smartstay_responses_total{{endpoint="{_label(endpoint)}",method="{method}",'
+                             f'status="{status}"}} {count}')
+            family('smartstay_template_render_seconds', 'histogram', 'Jinja render time per template.')
+            for template, histogram in sorted(self._renders.items()):
+                lines.extend(histogram.lines('smartstay_template_render_seconds', f'template="{_label(template)}"'))
+            statements = sorted((f'statement="{_label(statement)}"', stats)
+                                for statement, stats in self._statements.items())
+            for index, (name, kind, help_text, value_format) in enumerate([
+                ('smartstay_sql_statements_total', 'counter', 'Executions per SQL statement.', '{:.0f}'),
+                ('smartstay_sql_statement_seconds_total', 'counter',
+                 'Time spent executing each SQL statement, up to its first row.', '{:.6f}'),
+                ('smartstay_sql_statement_max_seconds', 'gauge', 'Slowest execution of each SQL statement.', '{:.6f}')
+            ]):
+                family(name, kind, help_text)
+                lines.extend(f'{name}{{{label}}} {value_format.format(stats[index])}' for label, stats in statements)
+
+        for name, (kind, help_text, value) in (extra or {}).items():
+            family(name, kind, help_text)
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,202 @@
+from typing import Callable, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+import traceback
+
+# Background jobs
+# Jobs are rows in the jobs table, so they survive restarts and any process sharing the
+# database can run them. A worker claims the oldest due job with one UPDATE ... RETURNING,
+# which SQLite serializes, so no two workers can claim the same job. Failed jobs are
+# retried with exponential backoff until max_attempts, then left as 'failed'. Jobs whose
+# worker died mid-run are requeued once their lease runs out, so handlers must be safe
+# to run more than once for the same payload.
+
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 2.0
+JOB_LEASE_SECONDS = 300.0
+JOB_POLL_INTERVAL = 1.0
+
+JOBS_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_after REAL NOT NULL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            last_error TEXT,
+            result TEXT
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, run_after)'
+]
+
+JOB_FIELDS = ['job_id', 'kind', 'payload', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at',
+              'started_at', 'finished_at', 'last_error', 'result']
+
+class JobQueue:
+    def __init__(self, db_manager, max_attempts: int = JOB_MAX_ATTEMPTS, backoff: float = JOB_RETRY_BACKOFF,
+                 lease: float = JOB_LEASE_SECONDS, poll_interval: float = JOB_POLL_INTERVAL):
+        self._db_manager = db_manager
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._lease = lease
+        self._poll_interval = poll_interval
+        self._handlers: Dict[str, Callable[[dict], object]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._workers: List[threading.Thread] = []
+        self._next_requeue = 0.0
+
+    def handler(self, kind: str):
+        def register(func: Callable[[dict], object]):
+            self._handlers[kind] = func
+            return func
+        return register
+
+    def enqueue(self, kind: str, payload: dict, delay: float = 0.0, conn=None) -> int:
+        # Pass conn to queue the job inside the caller's transaction; it is then
+        # committed (or rolled back) together with the caller's own writes
+        own_conn = conn is None
+        if own_conn:
+            conn = self._db_manager.get_connection()
+        now = time.time()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO jobs (kind, payload, max_attempts, run_after, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (kind, json.dumps(payload), self._max_attempts, now + delay, now))
+        job_id = cursor.lastrowid
+        if own_conn:
+            conn.commit()
+            conn.close()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: int) -> Optional[dict]:
+        conn = self._db_manager.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {", ".join(JOB_FIELDS)} FROM jobs WHERE job_id = ?', (job_id,))
+        row = cursor.fetchone()
+        conn.close()
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def _claim(self) -> Optional[tuple]:
+        now = time.time()
+        conn = self._db_manager.get_connection()
+        cursor = conn.cursor()
+        try:
+            # Runs that outlived their lease belong to a worker that died
+            if now >= self._next_requeue:
+                self._next_requeue = now + self._lease / 10
+                cursor.execute('''
+                    UPDATE jobs SET status = 'queued', run_after = ?
+                    WHERE status = 'running' AND started_at < ?
+                ''', (now, now - self._lease))
+            cursor.execute('''
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?
+                WHERE job_id = (
+                    SELECT job_id FROM jobs
+                    WHERE status = 'queued' AND run_after <= ?
+                    ORDER BY run_after, job_id
+                    LIMIT 1
+                )
+                RETURNING job_id, kind, payload, attempts, max_attempts
+            ''', (now, now))
+            job = cursor.fetchone()
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return job
+
+    def _finish(self, job_id: int, attempts: int, max_attempts: int, result=None, error: Optional[str] = None):
+        now = time.time()
+        if error is None:
+            statement = "UPDATE jobs SET status = 'done', finished_at = ?, result = ?, last_error = NULL WHERE job_id = ?"
+            params = (now, json.dumps(result), job_id)
+        elif attempts < max_attempts:
+            statement = "UPDATE jobs SET status = 'queued', run_after = ?, last_error = ? WHERE job_id = ?"
+            params = (now + self._backoff * 2 ** (attempts - 1), error, job_id)
+        else:
+            statement = "UPDATE jobs SET status = 'failed', finished_at = ?, last_error = ? WHERE job_id = ?"
+            params = (now, error, job_id)
+
+        conn = self._db_manager.get_connection()
+        try:
+            conn.execute(statement, params)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def run_once(self) -> bool:
+        # Runs one due job, if any; returns whether there was one
+        job = self._claim()
+        if job is None:
+            return False
+        job_id, kind, payload, attempts, max_attempts = job
+        try:
+            handler = self._handlers[kind]
+            result = handler(json.loads(payload))
+        except Exception:
+            self._finish(job_id, attempts, max_attempts, error=traceback.format_exc(limit=5))
+        else:
+            self._finish(job_id, attempts, max_attempts, result=result)
+        return True
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except sqlite3.OperationalError:
+                # Busy database; back off and poll again
+                pass
+            self._wakeup.wait(self._poll_interval)
+            self._wakeup.clear()
+
+    def start(self, workers: int = 2):
+        if self._workers:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            self._stopping.clear()
+            for index in range(workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._workers.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            self._stopping.set()
+            self._wakeup.set()
+            for thread in self._workers:
+                thread.join(timeout)
+            self._workers = []
+
+    def metrics(self) -> Dict[str, int]:
+        conn = self._db_manager.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status')
+        counts = dict(cursor.fetchall())
+        conn.close()
+        return {status: counts.get(status, 0) for status in ['queued', 'running', 'done', 'failed']}
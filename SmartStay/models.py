@@ -1,10 +1,46 @@
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import List, Optional
+from contextlib import contextmanager
+from datetime import date, datetime
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional
+import os
 import sqlite3
+import threading
+import time
+
+from instrumentation import TracingConnection, TracingCursor
+from jobs import JOBS_SCHEMA
+from pricing import PRICING_SCHEMA
+from replicas import REPLICA_MAX_LAG, REPLICA_SYNC_INTERVAL, ReplicaSet
+from rollup import ROLLUP_SCHEMA, ROLLUP_REBUILD
+from search import SEARCH_INDEXES, SEARCH_REBUILD, SEARCH_SCHEMA
+from stats import STATS_SCHEMA, STATS_VERSION_SCHEMA, STATS_REBUILD
+
+# Stored units
+# Booking dates are day numbers (days since 1970-01-01) and money is whole RWF, which has
+# no minor unit, so comparisons, overlap checks and sums run on integers. ISO dates are
+# only parsed or formatted where they enter or leave the application.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def day_number(value: str) -> int:
+    return date.fromisoformat(value).toordinal() - EPOCH_ORDINAL
+
+def day_date(day: int) -> str:
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+def today_number() -> int:
+    return date.today().toordinal() - EPOCH_ORDINAL
+
+def minor_units(amount) -> int:
+    return int(round(float(amount)))
 
 # ABSTRACTION: Abstract base class User
 class User(ABC):
+    # Slotted attributes keep each object small on large listing pages
+    __slots__ = ('_user_id', '_username', '_email', '_password')
+    # Columns that map onto constructor arguments, in order
+    ROW_FIELDS = ('user_id', 'username', 'email', 'password')
+    
     def __init__(self, user_id: int, username: str, email: str, password: str):
         self._user_id = user_id  # ENCAPSULATION: Private attribute
         self._username = username
@@ -47,6 +83,8 @@ class User(ABC):
 
 # INHERITANCE: Admin class inherits from User
 class Admin(User):
+    __slots__ = ('_admin_level',)
+    
     def __init__(self, user_id: int, username: str, email: str, password: str):
         super().__init__(user_id, username, email, password)
         self._admin_level = "super_admin"
@@ -69,6 +107,8 @@ class Admin(User):
 
 # INHERITANCE: Receptionist class inherits from User
 class Receptionist(User):
+    __slots__ = ('_department',)
+    
     def __init__(self, user_id: int, username: str, email: str, password: str):
         super().__init__(user_id, username, email, password)
         self._department = "front_desk"
@@ -91,10 +131,13 @@ class Receptionist(User):
 
 # INHERITANCE: Guest class inherits from User
 class Guest(User):
-    def __init__(self, user_id: int, username: str, email: str, password: str, phone: str = ""):
+    __slots__ = ('_phone', '_loyalty_points')
+    ROW_FIELDS = User.ROW_FIELDS + ('phone', 'loyalty_points')
+    
+    def __init__(self, user_id: int, username: str, email: str, password: str, phone: str = "", loyalty_points: int = 0):
         super().__init__(user_id, username, email, password)
         self._phone = phone
-        self._loyalty_points = 0
+        self._loyalty_points = loyalty_points
     
     def get_role(self) -> str:
         return "Guest"
@@ -120,11 +163,15 @@ class Guest(User):
 
 # INHERITANCE: Staff class inherits from User
 class Staff(User):
-    def __init__(self, user_id: int, username: str, email: str, password: str, position: str = ""):
+    __slots__ = ('_position', '_salary', '_hire_date')
+    ROW_FIELDS = User.ROW_FIELDS + ('position', 'salary', 'hire_date')
+    
+    def __init__(self, user_id: int, username: str, email: str, password: str, position: str = "",
+                 salary: float = 0.0, hire_date: Optional[str] = None):
         super().__init__(user_id, username, email, password)
         self._position = position
-        self._salary = 0.0
-        self._hire_date = datetime.now().strftime("%Y-%m-%d")
+        self._salary = salary
+        self._hire_date = hire_date or datetime.now().strftime("%Y-%m-%d")
     
     def get_role(self) -> str:
         return "Staff"
@@ -153,13 +200,17 @@ class Staff(User):
 
 # Room class
 class Room:
-    def __init__(self, room_id: int, room_number: str, room_type: str, price_per_night: float, capacity: int):
+    __slots__ = ('_room_id', '_room_number', '_room_type', '_price_per_night', '_capacity', '_is_available')
+    ROW_FIELDS = ('room_id', 'room_number', 'room_type', 'price_per_night', 'capacity', 'is_available')
+    
+    def __init__(self, room_id: int, room_number: str, room_type: str, price_per_night: int, capacity: int,
+                 is_available: bool = True):
         self._room_id = room_id
         self._room_number = room_number
         self._room_type = room_type
         self._price_per_night = price_per_night
         self._capacity = capacity
-        self._is_available = True
+        self._is_available = bool(is_available)
     
     def get_room_id(self) -> int:
         return self._room_id
@@ -170,7 +221,7 @@ class Room:
     def get_room_type(self) -> str:
         return self._room_type
     
-    def get_price_per_night(self) -> float:
+    def get_price_per_night(self) -> int:
         return self._price_per_night
     
     def get_capacity(self) -> int:
@@ -194,15 +245,21 @@ class Room:
 
 # Booking class
 class Booking:
-    def __init__(self, booking_id: int, room_id: int, guest_id: int, check_in_date: str, check_out_date: str, total_amount: float):
+    __slots__ = ('_booking_id', '_room_id', '_guest_id', '_check_in_date', '_check_out_date', '_total_amount',
+                 '_status', '_payment_status')
+    ROW_FIELDS = ('booking_id', 'room_id', 'guest_id', 'check_in_date', 'check_out_date', 'total_amount',
+                  'status', 'payment_status')
+    
+    def __init__(self, booking_id: int, room_id: int, guest_id: int, check_in_date: int, check_out_date: int, total_amount: int,
+                 status: str = "confirmed", payment_status: str = "pending"):
         self._booking_id = booking_id
         self._room_id = room_id
         self._guest_id = guest_id
         self._check_in_date = check_in_date
         self._check_out_date = check_out_date
         self._total_amount = total_amount
-        self._status = "confirmed"
-        self._payment_status = "pending"
+        self._status = status
+        self._payment_status = payment_status
     
     def get_booking_id(self) -> int:
         return self._booking_id
@@ -213,13 +270,13 @@ class Booking:
     def get_guest_id(self) -> int:
         return self._guest_id
     
-    def get_check_in_date(self) -> str:
+    def get_check_in_date(self) -> int:
         return self._check_in_date
     
-    def get_check_out_date(self) -> str:
+    def get_check_out_date(self) -> int:
         return self._check_out_date
     
-    def get_total_amount(self) -> float:
+    def get_total_amount(self) -> int:
         return self._total_amount
     
     def get_status(self) -> str:
@@ -239,26 +296,382 @@ class Booking:
             'booking_id': self._booking_id,
             'room_id': self._room_id,
             'guest_id': self._guest_id,
-            'check_in_date': self._check_in_date,
-            'check_out_date': self._check_out_date,
+            'check_in_date': day_date(self._check_in_date),
+            'check_out_date': day_date(self._check_out_date),
             'total_amount': self._total_amount,
             'status': self._status,
             'payment_status': self._payment_status
         }
 
+USER_ROLES = {'admin': Admin, 'receptionist': Receptionist, 'guest': Guest, 'staff': Staff}
+ROLE_KEYS = {user_cls: role for role, user_cls in USER_ROLES.items()}
+
+# Every value bookings.status and bookings.payment_status take, in the order filters offer them
+BOOKING_STATUSES = ['confirmed', 'checked_out', 'cancelled']
+PAYMENT_STATUSES = ['pending', 'paid']
+
+# Row factories
+# Rows are turned into model objects by handing the matching columns, in constructor
+# order, straight to the constructor. Column positions are resolved by name once per
+# result set, so each row costs one C-level itemgetter call and one constructor call.
+def column_positions(cursor) -> Dict[str, int]:
+    return {column[0]: index for index, column in enumerate(cursor.description)}
+
+def field_getter(model_cls, columns: Dict[str, int]) -> itemgetter:
+    # Trailing optional arguments are left at their defaults when the query lacks them
+    positions = []
+    for field in model_cls.ROW_FIELDS:
+        if field not in columns:
+            break
+        positions.append(columns[field])
+    return itemgetter(*positions)
+
+def row_builder(model_cls, columns: Dict[str, int]) -> Callable[[tuple], object]:
+    # Users are built as the subclass named by their role column
+    if model_cls is User:
+        role = columns['role']
+        builders = {name: row_builder(user_cls, columns) for name, user_cls in USER_ROLES.items()}
+        return lambda row: builders[row[role]](row) if row[role] in builders else None
+    
+    getter = field_getter(model_cls, columns)
+    return lambda row: model_cls(*getter(row))
+
+# Resolves the builder on each execute, then hands every row straight to it
+class ModelCursor(TracingCursor):
+    model_cls = None
+    
+    def execute(self, *args):
+        self.row_factory = self._first_row
+        return super().execute(*args)
+    
+    def _first_row(self, cursor, row):
+        model_cls = self.model_cls
+        columns = column_positions(self)
+        if model_cls is User:
+            build = row_builder(User, columns)
+            self.row_factory = lambda cursor, row: build(row)
+        else:
+            # Plain models skip the builder so each row is a single lambda frame
+            getter = field_getter(model_cls, columns)
+            self.row_factory = lambda cursor, row: model_cls(*getter(row))
+        return self.row_factory(cursor, row)
+
+def model_cursor(conn, model_cls) -> ModelCursor:
+    cursor = conn.cursor(ModelCursor)
+    cursor.model_cls = model_cls
+    return cursor
+
+# Pooled connection handle: close() hands the connection back to the pool
+class PooledConnection:
+    def __init__(self, pool: 'ConnectionPool', raw: sqlite3.Connection):
+        self._pool = pool
+        self._raw = raw
+        self._refs = 1
+    
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+    
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._raw.__exit__(exc_type, exc_value, traceback)
+    
+    def close(self):
+        self._pool.release(self)
+
+# Bounded connection pool with per-thread reuse
+class ConnectionPool:
+    def __init__(self, connect, max_size: int = 8, timeout: float = 30.0):
+        self._connect = connect
+        self._max_size = max_size
+        self._timeout = timeout
+        self._idle: List[sqlite3.Connection] = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        
+        # Metrics
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+    
+    def acquire(self) -> PooledConnection:
+        # A thread that already holds a connection keeps using it
+        held = getattr(self._local, 'held', None)
+        if held is not None:
+            held._refs += 1
+            return held
+        
+        start = time.perf_counter()
+        deadline = start + self._timeout
+        raw = None
+        with self._cond:
+            while not self._idle and self._open >= self._max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise sqlite3.OperationalError('connection pool exhausted')
+                self._cond.wait(remaining)
+            if self._idle:
+                raw = self._idle.pop()
+            else:
+                self._open += 1
+            waited = time.perf_counter() - start
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        
+        if raw is None:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        
+        conn = PooledConnection(self, raw)
+        self._local.held = conn
+        return conn
+    
+    def release(self, conn: PooledConnection):
+        if conn._raw is None:
+            return
+        conn._refs -= 1
+        if conn._refs > 0:
+            return
+        
+        raw = conn._raw
+        conn._raw = None
+        if getattr(self._local, 'held', None) is conn:
+            self._local.held = None
+        # Drivers without in_transaction (psycopg2) are always rolled back
+        if getattr(raw, 'in_transaction', True):
+            raw.rollback()
+        with self._cond:
+            self._idle.append(raw)
+            self._cond.notify()
+    
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                raw = self._idle.pop()
+                # Refreshes planner statistics for tables this connection's queries found stale
+                if isinstance(raw, sqlite3.Connection):
+                    try:
+                        raw.execute('PRAGMA optimize')
+                    except sqlite3.Error:
+                        pass
+                raw.close()
+                self._open -= 1
+    
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                'max_size': self._max_size,
+                'open_connections': self._open,
+                'idle_connections': len(self._idle),
+                'in_use_connections': self._open - len(self._idle),
+                'checkouts': self._checkouts,
+                'checkout_wait_total_ms': round(self._wait_total * 1000, 3),
+                'checkout_wait_max_ms': round(self._wait_max * 1000, 3),
+                'checkout_wait_avg_ms': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'checkout_timeouts': self._timeouts
+            }
+
+BOOKING_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_bookings_guest ON bookings (guest_id, booking_id DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_guest_status ON bookings (guest_id, status)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_check_in ON bookings (check_in_date)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_check_out ON bookings (check_out_date)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings (status, room_id, check_in_date, check_out_date)'
+]
+BOOKING_CHECK_OUT_INDEX = ("CREATE INDEX IF NOT EXISTS idx_bookings_confirmed_check_out ON bookings (check_out_date) "
+                           "WHERE status = 'confirmed'")
+ROOM_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_rooms_available ON rooms (is_available) WHERE is_available = 1',
+    'CREATE INDEX IF NOT EXISTS idx_rooms_type ON rooms (room_type, capacity)'
+]
+
+# Stamps a room with the next change_id whenever one of its confirmed stays is added,
+# moved, cancelled or checked out, so an availability index can reload just those rooms
+def _room_changed(room_expr: str) -> str:
+    return f'''
+        INSERT INTO room_changes (room_id, change_id)
+        VALUES ({room_expr}, (SELECT COALESCE(MAX(change_id), 0) + 1 FROM room_changes))
+        ON CONFLICT (room_id) DO UPDATE SET change_id = excluded.change_id;'''
+
+ROOM_CHANGES_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS room_changes (
+            room_id INTEGER PRIMARY KEY,
+            change_id INTEGER NOT NULL
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_room_changes_change ON room_changes (change_id)',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS room_changes_bookings_insert AFTER INSERT ON bookings
+        WHEN NEW.status = 'confirmed'
+        BEGIN{_room_changed('NEW.room_id')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS room_changes_bookings_delete AFTER DELETE ON bookings
+        WHEN OLD.status = 'confirmed'
+        BEGIN{_room_changed('OLD.room_id')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS room_changes_bookings_update
+        AFTER UPDATE OF status, room_id, check_in_date, check_out_date ON bookings
+        WHEN OLD.status = 'confirmed' OR NEW.status = 'confirmed'
+        BEGIN{_room_changed('OLD.room_id')}{_room_changed('NEW.room_id')}
+        END
+    '''
+]
+
+# Copies a table into a new definition and swaps it in; the caller recreates its indexes
+# and triggers. The AUTOINCREMENT counter is carried over so deleted ids are not reused.
+def _rebuild_table(table: str, definition: str, columns: str, select: str) -> List[str]:
+    return [
+        f'CREATE TABLE {table}_new ({definition})',
+        f'INSERT INTO {table}_new ({columns}) SELECT {select} FROM {table}',
+        f'''
+            UPDATE sqlite_sequence SET seq = (
+                SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('{table}', '{table}_new')
+            ) WHERE name = '{table}_new'
+        ''',
+        f'DROP TABLE {table}',
+        f'ALTER TABLE {table}_new RENAME TO {table}'
+    ]
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    # 1: indexes for the booking lists, dashboard counts, room search and staff list
+    BOOKING_INDEXES + ROOM_INDEXES + [
+        'CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)'
+    ],
+    # 2: trigger-maintained dashboard counters, backfilled from the current tables
+    STATS_SCHEMA + STATS_REBUILD,
+    # 3: stats version counter for conditional GETs
+    STATS_VERSION_SCHEMA,
+    # 4: background job queue, and one loyalty award per paid booking
+    JOBS_SCHEMA + [
+        '''
+            CREATE TABLE IF NOT EXISTS loyalty_awards (
+                booking_id INTEGER PRIMARY KEY,
+                guest_id INTEGER NOT NULL,
+                points INTEGER NOT NULL,
+                awarded_at TEXT NOT NULL,
+                FOREIGN KEY (booking_id) REFERENCES bookings (booking_id)
+            )
+        '''
+    ],
+    # 5: night audit lookup of stays due to check out, and DDL it sets aside during a bulk run
+    [
+        BOOKING_CHECK_OUT_INDEX,
+        'CREATE TABLE IF NOT EXISTS night_audit_deferred (sql TEXT NOT NULL)'
+    ],
+    # 6: per-day room-nights and revenue rollup (backfilled by 7)
+    ROLLUP_SCHEMA,
+    # 7: day-number dates and whole-RWF amounts in typed, CHECKed columns. Rooms and
+    # bookings are rebuilt in one transaction, then their indexes and triggers, the
+    # date-keyed counters and the rollup are recreated from the converted rows.
+    ['BEGIN IMMEDIATE'] + _rebuild_table('rooms', '''
+        room_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_number TEXT UNIQUE NOT NULL,
+        room_type TEXT NOT NULL,
+        price_per_night INTEGER NOT NULL CHECK (typeof(price_per_night) = 'integer' AND price_per_night >= 0),
+        capacity INTEGER NOT NULL,
+        is_available BOOLEAN DEFAULT 1
+    ''', 'room_id, room_number, room_type, price_per_night, capacity, is_available',
+        'room_id, room_number, room_type, CAST(ROUND(price_per_night) AS INTEGER), capacity, is_available'
+    ) + _rebuild_table('bookings', '''
+        booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_id INTEGER NOT NULL,
+        guest_id INTEGER NOT NULL,
+        check_in_date INTEGER NOT NULL CHECK (typeof(check_in_date) = 'integer'),
+        check_out_date INTEGER NOT NULL CHECK (typeof(check_out_date) = 'integer' AND check_out_date > check_in_date),
+        total_amount INTEGER NOT NULL CHECK (typeof(total_amount) = 'integer' AND total_amount >= 0),
+        status TEXT DEFAULT 'confirmed',
+        payment_status TEXT DEFAULT 'pending',
+        FOREIGN KEY (room_id) REFERENCES rooms (room_id),
+        FOREIGN KEY (guest_id) REFERENCES users (user_id)
+    ''', 'booking_id, room_id, guest_id, check_in_date, check_out_date, total_amount, status, payment_status',
+        '''booking_id, room_id, guest_id, CAST(julianday(check_in_date) - 2440587.5 AS INTEGER),
+           CAST(julianday(check_out_date) - 2440587.5 AS INTEGER), CAST(ROUND(total_amount) AS INTEGER),
+           status, payment_status'''
+    ) + BOOKING_INDEXES + [BOOKING_CHECK_OUT_INDEX] + ROOM_INDEXES + STATS_SCHEMA + STATS_VERSION_SCHEMA + [
+        "DELETE FROM stats_counters WHERE stat_key LIKE 'arrivals:%' OR stat_key LIKE 'departures:%'"
+    ] + STATS_REBUILD[-2:] + ['DROP TABLE daily_room_stats'] + ROLLUP_SCHEMA + ROLLUP_REBUILD,
+    # 8: full-text guest search, backfilled from users, and booking indexes for its facets
+    SEARCH_SCHEMA + SEARCH_REBUILD + SEARCH_INDEXES,
+    # 9: rate rules and the compiled rate calendar
+    PRICING_SCHEMA,
+    # 10: planner statistics taken by earlier migrations on whatever rows existed then;
+    # PRAGMA optimize gathers them again from the live tables
+    ['DROP TABLE IF EXISTS sqlite_stat1'],
+    # 11: per-room change stamps for incremental availability reloads
+    ROOM_CHANGES_SCHEMA
+]
+
 # Database Manager class
 class DatabaseManager:
-    def __init__(self, db_path: str = "smartstay/database/database.db"):
-        import os
-        # Ensure database directory exists
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    def __init__(self, db_path: str = "smartstay/database/database.db", pool_size: int = 8, replicas: int = 0,
+                 replica_interval: float = REPLICA_SYNC_INTERVAL, replica_max_lag: float = REPLICA_MAX_LAG):
+        # Nothing touches the file until the first connection; init_database() creates
+        # and migrates the schema, and runs once per deployment rather than per worker
         self.db_path = db_path
-        self.init_database()
+        self._trace_callback = None
+        self._statement_observer = None
+        self._schema_checked = False
+        self.pool = ConnectionPool(self._connect, max_size=pool_size)
+        self.replicas = ReplicaSet(db_path, replicas,
+                                   lambda connect: ConnectionPool(lambda: self._observed(connect()), max_size=pool_size),
+                                   replica_interval, replica_max_lag) if replicas else None
+        self._reads = threading.local()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if not self._schema_checked and not os.path.exists(self.db_path):
+            raise sqlite3.OperationalError(f'no database at {self.db_path}; run `flask init-db`')
+        # Connections move between threads through the pool
+        conn = self._observed(sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False,
+                                              factory=TracingConnection))
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA cache_size = -16000')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        if not self._schema_checked:
+            self._check_schema(conn)
+        if self._trace_callback:
+            conn.set_trace_callback(self._trace_callback)
+        return conn
+    
+    def _observed(self, conn: TracingConnection) -> TracingConnection:
+        conn.observer = self._statement_observer
+        return conn
+    
+    def _check_schema(self, conn: sqlite3.Connection):
+        # One PRAGMA on the first connection instead of DDL and locks on every startup
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != len(SCHEMA_MIGRATIONS):
+            conn.close()
+            raise sqlite3.OperationalError(
+                f'database schema is at version {version}, expected {len(SCHEMA_MIGRATIONS)}; run `flask init-db`')
+        self._schema_checked = True
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
+        # Outside the pool, whose connections refuse an out-of-date schema
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
         cursor = conn.cursor()
         
+        # WAL lets readers proceed while a booking is being written
+        cursor.execute('PRAGMA journal_mode = WAL')
+        
+        # Version 0 tables; SCHEMA_MIGRATIONS brings them up to date
         # Create users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -304,10 +717,79 @@ class DatabaseManager:
         ''')
         
         conn.commit()
+        self.migrate(conn)
         conn.close()
+        self._schema_checked = True
+    
+    def migrate(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        
+        for target, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                cursor.execute(statement)
+            # PRAGMA does not accept bound parameters
+            cursor.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+    
+    def use_database(self, db_path: str):
+        # Points the pool at another file, for tools that work on a scratch copy
+        self.pool.close_all()
+        self.db_path = db_path
+        self._schema_checked = False
     
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
+    def explain_query_plan(self, query: str, params=()) -> List[str]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('EXPLAIN QUERY PLAN ' + query, params)
+        plan = [row[3] for row in cursor.fetchall()]
+        conn.close()
+        return plan
+    
+    def set_trace_callback(self, callback):
+        # Idle connections are dropped so every new checkout picks up the callback
+        self._trace_callback = callback
+        self.pool.close_all()
+    
+    def set_statement_observer(self, observer: Optional[Callable[[str, float], None]]):
+        # Called with each statement's SQL and execution time; set before serving requests,
+        # as connections already checked out keep the previous observer
+        self._statement_observer = observer
+        self.pool.close_all()
+        for replica in self.replicas.replicas if self.replicas else []:
+            replica.pool.close_all()
+    
+    def get_connection(self) -> PooledConnection:
+        # Inside reading(), this thread's connections come from the chosen replica
+        replica = getattr(self._reads, 'replica', None)
+        if replica is not None:
+            return replica.acquire()
+        return self.pool.acquire()
+    
+    @contextmanager
+    def _routed(self, replica):
+        previous = getattr(self._reads, 'replica', None)
+        self._reads.replica = replica
+        try:
+            yield replica is not None
+        finally:
+            self._reads.replica = previous
+    
+    def reading(self, fresh_after: float = 0.0):
+        # Routes this thread's reads to a replica synced after fresh_after and within the
+        # staleness bound, or leaves them on the primary; yields whether a replica was used
+        return self._routed(self.replicas.pick(fresh_after) if self.replicas else None)
+    
+    def primary(self):
+        # For process-wide caches, which must never be filled from a lagging replica
+        return self._routed(None)
+    
+    def pool_metrics(self) -> dict:
+        metrics = self.pool.metrics()
+        if self.replicas:
+            metrics['replicas'] = self.replicas.metrics()
+        return metrics
     
     def add_sample_data(self):
         conn = self.get_connection()
@@ -315,12 +797,12 @@ class DatabaseManager:
         
         # Add sample rooms
         rooms = [
-            ('101', 'Single', 50000.0, 1),
-            ('102', 'Single', 50000.0, 1),
-            ('201', 'Double', 80000.0, 2),
-            ('202', 'Double', 80000.0, 2),
-            ('301', 'Suite', 150000.0, 4),
-            ('302', 'Suite', 150000.0, 4)
+            ('101', 'Single', 50000, 1),
+            ('102', 'Single', 50000, 1),
+            ('201', 'Double', 80000, 2),
+            ('202', 'Double', 80000, 2),
+            ('301', 'Suite', 150000, 4),
+            ('302', 'Suite', 150000, 4)
         ]
         
         cursor.executemany('''
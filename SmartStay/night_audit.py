@@ -0,0 +1,158 @@
+from typing import Callable, List, Optional
+import time
+
+from models import day_date
+from stats import rebuild_stats
+
+# Night audit
+# Confirmed stays whose check-out date has passed are closed out as 'checked_out' with
+# set-based UPDATEs, one chunk per transaction. The predicate only matches rows still to
+# do, so an interrupted audit picks up where it stopped when run again. Room
+# availability is then recomputed for every room in a single statement.
+#
+# A normal night touches a few hundred rows and runs with every index and trigger in
+# place, however large the backlog. Only in maintenance mode, with the application
+# stopped, does a large backlog (the first audit over years of history) set aside the
+# indexes and update triggers that depend on status, walk the table in primary-key
+# ranges and rebuild them once at the end, then recompute the dashboard counters: while
+# they are gone bookings have no overlap guard index and the counters are wrong. The
+# set-aside DDL is kept in night_audit_deferred until it is restored, so a maintenance
+# run that dies part way is finished by the next one, and any other run restores it
+# before it starts. Each run ends with PRAGMA optimize, which re-analyzes any table whose
+# size has moved far from its planner statistics.
+
+AUDIT_CHUNK_SIZE = 50000
+AUDIT_BULK_THRESHOLD = 100000
+
+CHECK_OUT_CHUNK = '''
+    UPDATE bookings SET status = 'checked_out'
+    WHERE booking_id IN (
+        SELECT booking_id FROM bookings
+        WHERE status = 'confirmed' AND check_out_date <= ?
+        LIMIT ?
+    )
+'''
+
+CHECK_OUT_RANGE = '''
+    UPDATE bookings SET status = 'checked_out'
+    WHERE booking_id > ? AND booking_id <= ? AND status = 'confirmed' AND check_out_date <= ?
+'''
+
+# Only rooms whose flag actually changes are written, so unchanged rooms fire no triggers
+RECOMPUTE_AVAILABILITY = '''
+    UPDATE rooms SET is_available = NOT is_available
+    WHERE is_available = EXISTS (
+        SELECT 1 FROM bookings
+        WHERE status = 'confirmed' AND room_id = rooms.room_id
+          AND check_in_date <= ? AND check_out_date > ?
+    )
+'''
+
+# Drops the indexes and triggers a sqlite_master query (type, name, sql) selects, keeping
+# their DDL in night_audit_deferred in the same transaction; the bulk importer shares it
+def set_aside(conn, query: str, params: tuple = ()) -> List[str]:
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute(query, params)
+    objects = cursor.fetchall()
+    for object_type, name, sql in objects:
+        cursor.execute('INSERT INTO night_audit_deferred (sql) VALUES (?)', (sql,))
+        cursor.execute(f'DROP {object_type.upper()} IF EXISTS {name}')
+    conn.commit()
+    return [sql for _, _, sql in objects]
+
+def restore_deferred(conn) -> int:
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute('SELECT sql FROM night_audit_deferred')
+    statements = cursor.fetchall()
+    for (sql,) in statements:
+        cursor.execute(sql)
+    cursor.execute('DELETE FROM night_audit_deferred')
+    conn.commit()
+    return len(statements)
+
+def _set_aside(conn) -> List[str]:
+    return set_aside(conn, '''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = 'bookings' AND sql IS NOT NULL AND sql LIKE '%status%'
+          AND (type = 'index' OR (type = 'trigger' AND sql LIKE '%AFTER UPDATE%'))
+    ''')
+
+def _restore(conn):
+    restore_deferred(conn)
+    conn.execute('ANALYZE bookings')
+    conn.commit()
+    rebuild_stats(conn)
+
+def run_night_audit(db_manager, audit_day: int, chunk_size: int = AUDIT_CHUNK_SIZE,
+                    maintenance: bool = False, bulk_threshold: int = AUDIT_BULK_THRESHOLD,
+                    on_chunk: Optional[Callable[[int, float], None]] = None) -> dict:
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    start = time.perf_counter()
+
+    cursor.execute('SELECT COUNT(*) FROM night_audit_deferred')
+    resuming = cursor.fetchone()[0] > 0
+    if resuming and not maintenance:
+        _restore(conn)
+    cursor.execute("SELECT COUNT(*) FROM bookings WHERE status = 'confirmed' AND check_out_date <= ?", (audit_day,))
+    pending = cursor.fetchone()[0]
+    bulk = maintenance and (resuming or pending >= bulk_threshold)
+
+    checked_out = 0
+    chunks = 0
+    if bulk:
+        if not resuming:
+            _set_aside(conn)
+        cursor.execute('SELECT MIN(booking_id), MAX(booking_id) FROM bookings')
+        low, high = cursor.fetchone()
+        position = (low or 1) - 1
+        while position < (high or 0):
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(CHECK_OUT_RANGE, (position, position + chunk_size, audit_day))
+            checked_out += cursor.rowcount
+            conn.commit()
+            position += chunk_size
+            chunks += 1
+            if on_chunk:
+                on_chunk(checked_out, time.perf_counter() - start)
+    else:
+        while True:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(CHECK_OUT_CHUNK, (audit_day, chunk_size))
+            changed = cursor.rowcount
+            conn.commit()
+            if changed == 0:
+                break
+            checked_out += changed
+            chunks += 1
+            if on_chunk:
+                on_chunk(checked_out, time.perf_counter() - start)
+    check_out_seconds = time.perf_counter() - start
+
+    if bulk:
+        _restore(conn)
+    restore_seconds = time.perf_counter() - start - check_out_seconds
+
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute(RECOMPUTE_AVAILABILITY, (audit_day, audit_day))
+    rooms_updated = cursor.rowcount
+    conn.commit()
+    # The nightly run keeps planner statistics in step with the growing tables
+    cursor.execute('PRAGMA optimize=0x10002')
+    conn.close()
+
+    total_seconds = time.perf_counter() - start
+    return {
+        'audit_date': day_date(audit_day),
+        'mode': 'bulk' if bulk else 'incremental',
+        'resumed': resuming,
+        'checked_out': checked_out,
+        'chunks': chunks,
+        'rooms_updated': rooms_updated,
+        'check_out_seconds': round(check_out_seconds, 3),
+        'restore_seconds': round(restore_seconds, 3),
+        'availability_seconds': round(total_seconds - check_out_seconds - restore_seconds, 3),
+        'total_seconds': round(total_seconds, 3)
+    }
@@ -0,0 +1,260 @@
+from array import array
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+import threading
+
+# Dynamic pricing
+# rate_rules adjust a room's price_per_night by a percentage: 'season' rules on every night
+# of their date range, 'weekend' rules on Friday and Saturday nights, and 'occupancy' rules
+# on nights when at least min_occupancy percent of the room type is already sold (from
+# daily_room_stats). The percentages of every matching rule add up. Rules are compiled
+# into rate_calendar, the price factor in basis points per room type and night, so no
+# rule is evaluated when a stay is priced: PricingEngine keeps running sums of the
+# calendar in memory and a quote is price_per_night times the difference of two of them,
+# whatever the length of the stay. Only factors other than 100% are stored.
+#
+# rate_calendar_state holds the compiled day range and a version. Rule changes recompile
+# their room type and dates, bookings and cancellations recompile the nights of the stay
+# in their own transaction when occupancy rules exist, and the range grows to cover the
+# next PRICING_HORIZON_DAYS; each bumps the version, which tells every worker's engine to
+# reload. Nights outside the compiled range are priced at the base factor.
+
+BASE_FACTOR = 10000
+PRICING_HORIZON_DAYS = 730
+RATE_RULE_KINDS = ['season', 'weekend', 'occupancy']
+# Weekdays (Monday = 0) that are weekend nights; day number 0 was a Thursday
+WEEKEND_NIGHTS = (4, 5)
+
+PRICING_SCHEMA = [
+    f'''
+        CREATE TABLE IF NOT EXISTS rate_rules (
+            rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ({', '.join(f"'{kind}'" for kind in RATE_RULE_KINDS)})),
+            room_type TEXT,
+            start_day INTEGER,
+            end_day INTEGER,
+            percent INTEGER NOT NULL,
+            min_occupancy INTEGER
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS rate_calendar (
+            room_type TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            factor INTEGER NOT NULL,
+            PRIMARY KEY (room_type, day)
+        ) WITHOUT ROWID
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS rate_calendar_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            first_day INTEGER NOT NULL,
+            last_day INTEGER NOT NULL,
+            version INTEGER NOT NULL
+        )
+    '''
+]
+
+# The factor of every night in [:first_day, :last_day) for every room type, or just
+# :room_type, evaluated from the rules
+RATE_FACTORS = f'''
+    WITH RECURSIVE days (day) AS (
+        SELECT :first_day WHERE :first_day < :last_day
+        UNION ALL
+        SELECT day + 1 FROM days WHERE day + 1 < :last_day
+    ),
+    types (room_type, rooms) AS (
+        SELECT room_type, COUNT(*) FROM rooms
+        WHERE :room_type IS NULL OR room_type = :room_type
+        GROUP BY room_type
+    ),
+    factors (room_type, day, factor) AS (
+        SELECT t.room_type, d.day, MAX(0, {BASE_FACTOR} + 100 * (
+            SELECT COALESCE(SUM(r.percent), 0) FROM rate_rules r
+            WHERE (r.room_type IS NULL OR r.room_type = t.room_type)
+              AND (r.start_day IS NULL OR r.start_day <= d.day)
+              AND (r.end_day IS NULL OR d.day < r.end_day)
+              AND (r.kind = 'season'
+                   OR r.kind = 'weekend' AND (d.day + 3) % 7 IN {WEEKEND_NIGHTS}
+                   OR r.kind = 'occupancy' AND 100 * COALESCE((
+                       SELECT s.room_nights FROM daily_room_stats s
+                       WHERE s.day = d.day AND s.room_type = t.room_type
+                   ), 0) >= r.min_occupancy * t.rooms)
+        ))
+        FROM types t CROSS JOIN days d
+    )'''
+
+COMPILE_RATES = RATE_FACTORS + f'''
+    INSERT INTO rate_calendar (room_type, day, factor)
+    SELECT room_type, day, factor FROM factors WHERE factor != {BASE_FACTOR}
+'''
+
+def read_window(cursor) -> Optional[Tuple[int, int, int]]:
+    cursor.execute('SELECT first_day, last_day, version FROM rate_calendar_state WHERE id = 1')
+    return cursor.fetchone()
+
+def _compile(cursor, first_day: int, last_day: int, room_type: Optional[str] = None):
+    if first_day >= last_day:
+        return
+    if room_type is None:
+        cursor.execute('DELETE FROM rate_calendar WHERE day >= ? AND day < ?', (first_day, last_day))
+    else:
+        cursor.execute('DELETE FROM rate_calendar WHERE room_type = ? AND day >= ? AND day < ?',
+                       (room_type, first_day, last_day))
+    cursor.execute(COMPILE_RATES, {'first_day': first_day, 'last_day': last_day, 'room_type': room_type})
+
+# Recompiles the part of [first_day, last_day) inside the compiled range
+def refresh_rates(cursor, first_day: Optional[int] = None, last_day: Optional[int] = None,
+                  room_type: Optional[str] = None):
+    window = read_window(cursor)
+    if window is None:
+        return
+    first_day = window[0] if first_day is None else max(first_day, window[0])
+    last_day = window[1] if last_day is None else min(last_day, window[1])
+    if first_day >= last_day:
+        return
+    if room_type is None:
+        _compile(cursor, first_day, last_day)
+    else:
+        # Most bookings cross no occupancy threshold; leave the version, and every
+        # worker's loaded calendar, alone when the nights come out the same
+        nights = '''
+            SELECT group_concat(day || ':' || factor) FROM rate_calendar
+            WHERE room_type = ? AND day >= ? AND day < ?
+        '''
+        before = cursor.execute(nights, (room_type, first_day, last_day)).fetchone()
+        _compile(cursor, first_day, last_day, room_type)
+        if cursor.execute(nights, (room_type, first_day, last_day)).fetchone() == before:
+            return
+    cursor.execute('UPDATE rate_calendar_state SET version = version + 1 WHERE id = 1')
+
+# Grows the compiled range to take in [first_day, last_day)
+def extend_rates(cursor, first_day: int, last_day: int):
+    window = read_window(cursor)
+    if window is None:
+        _compile(cursor, first_day, last_day)
+    else:
+        _compile(cursor, first_day, window[0])
+        _compile(cursor, max(window[1], first_day), last_day)
+    # MIN/MAX keep the range from shrinking when two workers extend it at once
+    cursor.execute('''
+        INSERT INTO rate_calendar_state (id, first_day, last_day, version) VALUES (1, ?, ?, 1)
+        ON CONFLICT (id) DO UPDATE SET
+            first_day = MIN(first_day, excluded.first_day),
+            last_day = MAX(last_day, excluded.last_day),
+            version = version + 1
+    ''', (first_day, last_day))
+
+# Run inside a booking or cancellation, after its nights reached daily_room_stats
+def refresh_occupancy(cursor, room_id: int, check_in_date: int, check_out_date: int):
+    cursor.execute("SELECT 1 FROM rate_rules WHERE kind = 'occupancy' LIMIT 1")
+    if cursor.fetchone() is None:
+        return
+    cursor.execute('SELECT room_type FROM rooms WHERE room_id = ?', (room_id,))
+    refresh_rates(cursor, check_in_date, check_out_date, cursor.fetchone()[0])
+
+# For bulk loads and room changes, which can move any night of any room type
+def rebuild_rates(conn):
+    refresh_rates(conn.cursor())
+    conn.commit()
+
+RATE_RULE_COLUMNS = ['rule_id', 'name', 'kind', 'room_type', 'start_day', 'end_day', 'percent', 'min_occupancy']
+
+def list_rate_rules(cursor) -> List[dict]:
+    cursor.execute(f'SELECT {", ".join(RATE_RULE_COLUMNS)} FROM rate_rules ORDER BY rule_id')
+    return [dict(zip(RATE_RULE_COLUMNS, row)) for row in cursor.fetchall()]
+
+def add_rate_rule(conn, name: str, kind: str, percent: int, room_type: Optional[str] = None,
+                  start_day: Optional[int] = None, end_day: Optional[int] = None,
+                  min_occupancy: Optional[int] = None) -> int:
+    if kind not in RATE_RULE_KINDS:
+        raise ValueError(f'kind must be one of {", ".join(RATE_RULE_KINDS)}')
+    if kind == 'occupancy' and not (min_occupancy is not None and 0 <= min_occupancy <= 100):
+        raise ValueError('occupancy rules need a min_occupancy between 0 and 100')
+    if start_day is not None and end_day is not None and end_day <= start_day:
+        raise ValueError('end_date must be after start_date')
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO rate_rules (name, kind, room_type, start_day, end_day, percent, min_occupancy)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (name, kind, room_type, start_day, end_day, percent, min_occupancy if kind == 'occupancy' else None))
+    rule_id = cursor.lastrowid
+    refresh_rates(cursor, start_day, end_day, room_type)
+    conn.commit()
+    return rule_id
+
+def delete_rate_rule(conn, rule_id: int) -> bool:
+    cursor = conn.cursor()
+    cursor.execute('SELECT room_type, start_day, end_day FROM rate_rules WHERE rule_id = ?', (rule_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return False
+    cursor.execute('DELETE FROM rate_rules WHERE rule_id = ?', (rule_id,))
+    refresh_rates(cursor, row[1], row[2], row[0])
+    conn.commit()
+    return True
+
+# A stay's total from its room's nightly price and the sum of its nights' factors
+def stay_total(price_per_night: int, factor_sum: int) -> int:
+    return (price_per_night * factor_sum + BASE_FACTOR // 2) // BASE_FACTOR
+
+class PricingEngine:
+    def __init__(self, db_manager, horizon: int = PRICING_HORIZON_DAYS):
+        self._db_manager = db_manager
+        self._horizon = horizon
+        self._lock = threading.Lock()
+        self._version = None
+        self._first_day = 0
+        self._last_day = 0
+        # Room type -> running sums of the factors from _first_day; absent types are all BASE_FACTOR
+        self._sums: Dict[str, array] = {}
+
+    # Makes sure [first_day, last_day) is compiled and loaded; returns the load's range and sums
+    def _ensure_covered(self, first_day: int, last_day: int) -> Tuple[int, int, Dict[str, array]]:
+        with self._lock:
+            with self._db_manager.primary():
+                conn = self._db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                window = read_window(cursor)
+                if window is None or first_day < window[0] or last_day > window[1]:
+                    extend_rates(cursor, first_day, last_day)
+                    conn.commit()
+                    window = read_window(cursor)
+                if window[2] != self._version:
+                    self._load(cursor, window)
+            finally:
+                conn.close()
+            return self._first_day, self._last_day, self._sums
+
+    def _load(self, cursor, window: Tuple[int, int, int]):
+        first_day, last_day, version = window
+        factors: Dict[str, array] = {}
+        # Rows are only ever compiled inside the window, so the whole table is loaded
+        cursor.execute('SELECT room_type, day, factor FROM rate_calendar')
+        for room_type, day, factor in cursor:
+            days = factors.get(room_type)
+            if days is None:
+                days = factors[room_type] = array('q', [BASE_FACTOR]) * (last_day - first_day)
+            days[day - first_day] = factor
+        self._sums = {room_type: array('q', accumulate(days, initial=0)) for room_type, days in factors.items()}
+        self._first_day = first_day
+        self._last_day = last_day
+        self._version = version
+
+    # Only the next horizon days are kept compiled, so no request can grow the calendar
+    # without bound; nights outside the compiled range count at BASE_FACTOR
+    def factor_sum(self, room_type: str, check_in_date: int, check_out_date: int, today: int) -> int:
+        first_day, last_day, sums = self._ensure_covered(today, today + self._horizon)
+        room_sums = sums.get(room_type)
+        start = min(max(check_in_date, first_day), last_day)
+        end = max(min(check_out_date, last_day), start)
+        compiled = BASE_FACTOR * (end - start) if room_sums is None else \
+            room_sums[end - first_day] - room_sums[start - first_day]
+        return compiled + BASE_FACTOR * (check_out_date - check_in_date - (end - start))
+
+    # Whole-RWF total for the nights of [check_in_date, check_out_date) in a Room
+    def quote(self, room, check_in_date: int, check_out_date: int, today: int) -> int:
+        return stay_total(room.get_price_per_night(),
+                          self.factor_sum(room.get_room_type(), check_in_date, check_out_date, today))
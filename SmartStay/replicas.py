@@ -0,0 +1,152 @@
+from typing import Callable, List, Optional
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+from instrumentation import TracingConnection
+
+# Read replicas
+# Each replica is a separate database file refreshed from the primary with SQLite's
+# online backup API every sync interval. Readers open replicas read-only, and a backup
+# into a WAL-mode replica does not block them. A replica's snapshot_at is the time its
+# last backup started, so it holds every write committed before then. Reads only go to
+# a replica whose snapshot is at most max_lag seconds old and no older than the caller's
+# own last write; otherwise they fall back to the primary.
+#
+# Snapshot times live in process memory, so every process syncs its own replica files,
+# named after its pid when its sync thread starts (after any fork), and removes them
+# when it stops or exits. Two workers never write to the same file.
+
+REPLICA_SYNC_INTERVAL = 1.0
+REPLICA_MAX_LAG = 5.0
+
+class Replica:
+    def __init__(self, path: str, make_pool: Callable[[Callable[[], sqlite3.Connection]], object]):
+        self.path = path
+        self.pool = make_pool(self._connect)
+        self.snapshot_at = 0.0
+        self.syncs = 0
+        self.reads = 0
+        self.last_sync_ms = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, timeout=30.0, check_same_thread=False,
+                               factory=TracingConnection)
+        conn.execute('PRAGMA cache_size = -16000')
+        return conn
+
+    def acquire(self):
+        self.reads += 1
+        return self.pool.acquire()
+
+class ReplicaSet:
+    def __init__(self, primary_path: str, count: int, make_pool, interval: float = REPLICA_SYNC_INTERVAL,
+                 max_lag: float = REPLICA_MAX_LAG):
+        base, extension = os.path.splitext(primary_path)
+        self._primary_path = primary_path
+        self._interval = interval
+        self._max_lag = max_lag
+        self._base = base
+        self._extension = extension
+        # Paths are assigned by the first sync in the process that owns them
+        self.replicas: List[Replica] = [Replica('', make_pool) for _ in range(count)]
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._paths_pid: Optional[int] = None
+        atexit.register(self.stop)
+
+    def _claim_paths(self):
+        pid = os.getpid()
+        if self._paths_pid == pid:
+            return
+        with self._lock:
+            if self._paths_pid == pid:
+                return
+            for index, replica in enumerate(self.replicas):
+                # Connections inherited from a parent process point at its files
+                replica.pool.close_all()
+                replica.path = f'{self._base}.replica-{pid}-{index + 1}{self._extension}'
+                replica.snapshot_at = 0.0
+            self._paths_pid = pid
+
+    def sync(self):
+        self._claim_paths()
+        # One backup step copies a consistent snapshot of the primary
+        source = sqlite3.connect(self._primary_path, timeout=30.0)
+        try:
+            for replica in self.replicas:
+                started = time.time()
+                target = sqlite3.connect(replica.path, timeout=30.0)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                replica.snapshot_at = started
+                replica.syncs += 1
+                replica.last_sync_ms = round((time.time() - started) * 1000, 3)
+        finally:
+            source.close()
+
+    def pick(self, fresh_after: float = 0.0) -> Optional[Replica]:
+        # Round-robin over replicas fresh enough for the caller, or None for the primary
+        oldest = max(fresh_after, time.time() - self._max_lag)
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[self._next]
+                self._next = (self._next + 1) % len(self.replicas)
+                if replica.snapshot_at >= oldest:
+                    return replica
+        return None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.sync()
+            except sqlite3.Error:
+                # Readers fall back to the primary until a later sync succeeds
+                pass
+            self._stopping.wait(self._interval)
+
+    # A forked worker inherits the parent's state but not its thread, so it starts its own
+    def start(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        self._claim_paths()
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='replica-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        if self._paths_pid == os.getpid():
+            for replica in self.replicas:
+                replica.snapshot_at = 0.0
+                replica.pool.close_all()
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(replica.path + suffix):
+                        os.remove(replica.path + suffix)
+        self._thread = None
+        self._pid = None
+        self._paths_pid = None
+
+    def metrics(self) -> List[dict]:
+        now = time.time()
+        return [{
+            'path': replica.path,
+            'lag_seconds': round(now - replica.snapshot_at, 3) if replica.snapshot_at else None,
+            'syncs': replica.syncs,
+            'last_sync_ms': replica.last_sync_ms,
+            'reads': replica.reads
+        } for replica in self.replicas]
@@ -0,0 +1,397 @@
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
+import sqlite3
+
+from booking_service import BOOK_IF_FREE, FIND_FREE_ROOMS, RoomTaken
+from models import Booking, ConnectionPool, PooledConnection, Room, User, column_positions, row_builder
+
+# Storage repositories
+# Routes reach rooms, bookings and users through these interfaces rather than writing SQL
+# against a connection. SQLiteStorage is the deployed backend: it shares the app's pool
+# and books through BookingService, so the stats triggers, rollup and busy retries all
+# still apply. ServerStorage runs the same operations over any DB-API driver (PostgreSQL
+# via psycopg2) through its own connection pool, for deployments that need more than one
+# writer. Statements are written once with '?' placeholders and a Dialect adapts them.
+# Dashboards, analytics, jobs and the night audit still read SQLite directly.
+
+class Dialect:
+    def __init__(self, name: str, placeholder: str, begin: Optional[str], lock_room: Optional[str], id_column: str):
+        self.name = name
+        self.placeholder = placeholder
+        # Statement that opens a write transaction, where the driver does not open one itself
+        self.begin = begin
+        # Row lock that serializes bookings of one room, where begin does not already
+        self.lock_room = lock_room
+        self.id_column = id_column
+
+    def sql(self, statement: str) -> str:
+        return statement if self.placeholder == '?' else statement.replace('?', self.placeholder)
+
+SQLITE_DIALECT = Dialect('sqlite', '?', 'BEGIN IMMEDIATE', None, 'INTEGER PRIMARY KEY AUTOINCREMENT')
+POSTGRESQL_DIALECT = Dialect('postgresql', '%s', None, 'SELECT room_id FROM rooms WHERE room_id = ? FOR UPDATE',
+                             'BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY')
+
+# Tables for a fresh server database, in the same column order as the SQLite schema
+def server_schema(dialect: Dialect) -> List[str]:
+    return [
+        f'''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id {dialect.id_column},
+                username TEXT UNIQUE NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL,
+                phone TEXT,
+                position TEXT,
+                salary REAL,
+                hire_date TEXT,
+                loyalty_points INTEGER DEFAULT 0
+            )
+        ''',
+        f'''
+            CREATE TABLE IF NOT EXISTS rooms (
+                room_id {dialect.id_column},
+                room_number TEXT UNIQUE NOT NULL,
+                room_type TEXT NOT NULL,
+                price_per_night INTEGER NOT NULL CHECK (price_per_night >= 0),
+                capacity INTEGER NOT NULL,
+                is_available INTEGER NOT NULL DEFAULT 1
+            )
+        ''',
+        f'''
+            CREATE TABLE IF NOT EXISTS bookings (
+                booking_id {dialect.id_column},
+                room_id INTEGER NOT NULL REFERENCES rooms (room_id),
+                guest_id INTEGER NOT NULL REFERENCES users (user_id),
+                check_in_date INTEGER NOT NULL,
+                check_out_date INTEGER NOT NULL CHECK (check_out_date > check_in_date),
+                total_amount INTEGER NOT NULL CHECK (total_amount >= 0),
+                status TEXT NOT NULL DEFAULT 'confirmed',
+                payment_status TEXT NOT NULL DEFAULT 'pending'
+            )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_guest ON bookings (guest_id, booking_id DESC)',
+        '''
+            CREATE INDEX IF NOT EXISTS idx_bookings_room_confirmed ON bookings (room_id, check_in_date, check_out_date)
+            WHERE status = 'confirmed'
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)'
+    ]
+
+# INTERFACES
+class RoomRepository(ABC):
+    @abstractmethod
+    def all(self) -> List[Room]:
+        pass
+
+    @abstractmethod
+    def get(self, room_id: int) -> Optional[Room]:
+        pass
+
+    @abstractmethod
+    def add(self, room_number: str, room_type: str, price_per_night: int, capacity: int) -> int:
+        pass
+
+class BookingRepository(ABC):
+    @abstractmethod
+    def book(self, room_id: int, guest_id: int, check_in_date: int, check_out_date: int,
+             total_amount: int, today: int) -> Optional[int]:
+        # The new booking_id, or None when a confirmed stay overlaps the dates
+        pass
+
+    @abstractmethod
+    def book_block(self, guest_id: int, check_in_date: int, check_out_date: int, count: int,
+                   room_type: Optional[str], capacity: int, price: Callable[[str, int], int],
+                   today: int) -> Optional[List[Tuple[int, int, int]]]:
+        # (booking_id, room_id, total_amount) for each of count free rooms of the type and
+        # capacity, booked together; None, with nothing booked, when fewer are free
+        pass
+
+    @abstractmethod
+    def cancel(self, booking_id: int, guest_id: int, today: int) -> Optional[Tuple[int, int]]:
+        # (room_id, check_in_date) of the cancelled stay, or None if the guest has no
+        # confirmed booking with that id
+        pass
+
+    @abstractmethod
+    def for_guest(self, guest_id: int) -> List[dict]:
+        # Newest first, each {'booking': Booking, 'room_number': ..., 'room_type': ...}
+        pass
+
+class UserRepository(ABC):
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[User]:
+        pass
+
+    @abstractmethod
+    def authenticate(self, username: str, password: str) -> Optional[User]:
+        pass
+
+    @abstractmethod
+    def list_staff(self) -> List[tuple]:
+        # Full users rows for staff and receptionists
+        pass
+
+    @abstractmethod
+    def add_staff(self, username: str, email: str, password: str, role: str, position: str,
+                  salary: float, hire_date: str) -> int:
+        pass
+
+    @abstractmethod
+    def delete_staff(self, user_id: int) -> bool:
+        pass
+
+class Storage:
+    def __init__(self, rooms: RoomRepository, bookings: BookingRepository, users: UserRepository):
+        self.rooms = rooms
+        self.bookings = bookings
+        self.users = users
+
+# SQL IMPLEMENTATIONS
+# Shared by both backends; acquire returns a pooled connection whose close() releases it
+class SQLRepository:
+    def __init__(self, acquire: Callable[[], PooledConnection], dialect: Dialect):
+        self._acquire = acquire
+        self._dialect = dialect
+
+    def _query(self, statement: str, params=(), model_cls=None) -> list:
+        conn = self._acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self._dialect.sql(statement), params)
+            rows = cursor.fetchall()
+            if model_cls and rows:
+                build = row_builder(model_cls, column_positions(cursor))
+                rows = [build(row) for row in rows]
+            return rows
+        finally:
+            conn.close()
+
+    def _transaction(self, work: Callable[[Callable], object]):
+        # work gets execute(statement, params) -> cursor; everything it runs commits together
+        conn = self._acquire()
+        try:
+            cursor = conn.cursor()
+
+            def execute(statement: str, params=(), many: bool = False):
+                (cursor.executemany if many else cursor.execute)(self._dialect.sql(statement), params)
+                return cursor
+
+            if self._dialect.begin:
+                cursor.execute(self._dialect.begin)
+            try:
+                result = work(execute)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            return result
+        finally:
+            conn.close()
+
+class SQLRoomRepository(SQLRepository, RoomRepository):
+    def all(self) -> List[Room]:
+        return self._query('SELECT * FROM rooms ORDER BY room_number', model_cls=Room)
+
+    def get(self, room_id: int) -> Optional[Room]:
+        rooms = self._query('SELECT * FROM rooms WHERE room_id = ?', (room_id,), Room)
+        return rooms[0] if rooms else None
+
+    def add(self, room_number: str, room_type: str, price_per_night: int, capacity: int) -> int:
+        return self._transaction(lambda execute: execute('''
+            INSERT INTO rooms (room_number, room_type, price_per_night, capacity)
+            VALUES (?, ?, ?, ?) RETURNING room_id
+        ''', (room_number, room_type, price_per_night, capacity)).fetchone()[0])
+
+class SQLUserRepository(SQLRepository, UserRepository):
+    def get(self, user_id: int) -> Optional[User]:
+        users = self._query('SELECT * FROM users WHERE user_id = ?', (user_id,), User)
+        return users[0] if users else None
+
+    def authenticate(self, username: str, password: str) -> Optional[User]:
+        users = self._query('SELECT * FROM users WHERE username = ? AND password = ?', (username, password), User)
+        return users[0] if users else None
+
+    # +user_id: with a handful of staff among many guests, the role index beats walking
+    # users in id order to skip the sort
+    def list_staff(self) -> List[tuple]:
+        return self._query("SELECT * FROM users WHERE role IN ('staff', 'receptionist') ORDER BY +user_id")
+
+    def add_staff(self, username: str, email: str, password: str, role: str, position: str,
+                  salary: float, hire_date: str) -> int:
+        return self._transaction(lambda execute: execute('''
+            INSERT INTO users (username, email, password, role, position, salary, hire_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING user_id
+        ''', (username, email, password, role, position, salary, hire_date)).fetchone()[0])
+
+    def delete_staff(self, user_id: int) -> bool:
+        return self._transaction(lambda execute: execute(
+            "DELETE FROM users WHERE user_id = ? AND role IN ('staff', 'receptionist')", (user_id,)
+        ).rowcount == 1)
+
+class SQLBookingQueries(SQLRepository):
+    def for_guest(self, guest_id: int) -> List[dict]:
+        conn = self._acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self._dialect.sql('''
+                SELECT b.*, r.room_number, r.room_type
+                FROM bookings b
+                JOIN rooms r ON b.room_id = r.room_id
+                WHERE b.guest_id = ?
+                ORDER BY b.booking_id DESC
+            '''), (guest_id,))
+            columns = column_positions(cursor)
+            build_booking = row_builder(Booking, columns)
+            room_number, room_type = columns['room_number'], columns['room_type']
+            return [{
+                'booking': build_booking(row),
+                'room_number': row[room_number],
+                'room_type': row[room_type]
+            } for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+# SQLite: writes go through BookingService (BEGIN IMMEDIATE, busy retry, rollup)
+class SQLiteBookingRepository(SQLBookingQueries, BookingRepository):
+    def __init__(self, db_manager, booking_service):
+        super().__init__(db_manager.get_connection, SQLITE_DIALECT)
+        self._service = booking_service
+
+    def book(self, room_id: int, guest_id: int, check_in_date: int, check_out_date: int,
+             total_amount: int, today: int) -> Optional[int]:
+        return self._service.book(room_id, guest_id, check_in_date, check_out_date, total_amount, today)
+
+    def book_block(self, guest_id: int, check_in_date: int, check_out_date: int, count: int,
+                   room_type: Optional[str], capacity: int, price: Callable[[str, int], int],
+                   today: int) -> Optional[List[Tuple[int, int, int]]]:
+        return self._service.book_block(guest_id, check_in_date, check_out_date, count, room_type, capacity,
+                                        price, today)
+
+    def cancel(self, booking_id: int, guest_id: int, today: int) -> Optional[Tuple[int, int]]:
+        return self._service.cancel(booking_id, guest_id, today)
+
+# Server databases: the room row lock (or the dialect's write transaction) serializes
+# bookings of one room, so the overlap check and insert can't interleave
+class ServerBookingRepository(SQLBookingQueries, BookingRepository):
+    def book(self, room_id: int, guest_id: int, check_in_date: int, check_out_date: int,
+             total_amount: int, today: int) -> Optional[int]:
+        def work(execute):
+            if self._dialect.lock_room:
+                execute(self._dialect.lock_room, (room_id,))
+            row = execute('''
+                INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, total_amount)
+                SELECT ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM bookings
+                    WHERE status = 'confirmed' AND room_id = ?
+                      AND check_in_date < ? AND check_out_date > ?
+                )
+                RETURNING booking_id
+            ''', (room_id, guest_id, check_in_date, check_out_date, total_amount,
+                  room_id, check_out_date, check_in_date)).fetchone()
+            if row is None:
+                return None
+            if check_in_date <= today < check_out_date:
+                execute('UPDATE rooms SET is_available = 0 WHERE room_id = ?', (room_id,))
+            return row[0]
+
+        return self._transaction(work)
+
+    def book_block(self, guest_id: int, check_in_date: int, check_out_date: int, count: int,
+                   room_type: Optional[str], capacity: int, price: Callable[[str, int], int],
+                   today: int) -> Optional[List[Tuple[int, int, int]]]:
+        def work(execute):
+            rooms = execute(FIND_FREE_ROOMS, (room_type, room_type, capacity, check_out_date, check_in_date,
+                                              count)).fetchall()
+            if len(rooms) < count:
+                return None
+            room_ids = sorted(room[0] for room in rooms)
+            # Locked in room_id order so two blocks sharing rooms can't deadlock; a stay
+            # committed since the search is then refused by the guarded insert below
+            if self._dialect.lock_room:
+                execute(self._dialect.lock_room, [(room_id,) for room_id in room_ids], many=True)
+            inserted = execute(BOOK_IF_FREE, [
+                (room_id, guest_id, check_in_date, check_out_date, price(found_type, price_per_night),
+                 room_id, check_out_date, check_in_date)
+                for room_id, found_type, price_per_night in rooms
+            ], many=True).rowcount
+            if inserted != count:
+                raise RoomTaken()
+
+            placeholders = ', '.join('?' for _ in room_ids)
+            bookings = execute(f'''
+                SELECT booking_id, room_id, total_amount FROM bookings
+                WHERE guest_id = ? AND status = 'confirmed' AND check_in_date = ? AND check_out_date = ?
+                  AND room_id IN ({placeholders})
+                ORDER BY booking_id
+            ''', [guest_id, check_in_date, check_out_date] + room_ids).fetchall()
+            if check_in_date <= today < check_out_date:
+                execute(f'UPDATE rooms SET is_available = 0 WHERE room_id IN ({placeholders})', room_ids)
+            return [tuple(booking) for booking in bookings]
+
+        try:
+            return self._transaction(work)
+        except RoomTaken:
+            return None
+
+    def cancel(self, booking_id: int, guest_id: int, today: int) -> Optional[Tuple[int, int]]:
+        def work(execute):
+            row = execute('''
+                UPDATE bookings SET status = 'cancelled'
+                WHERE booking_id = ? AND guest_id = ? AND status = 'confirmed'
+                RETURNING room_id, check_in_date
+            ''', (booking_id, guest_id)).fetchone()
+            if row is None:
+                return None
+            room_id = row[0]
+            execute('''
+                UPDATE rooms SET is_available = 1
+                WHERE room_id = ? AND is_available = 0 AND NOT EXISTS (
+                    SELECT 1 FROM bookings
+                    WHERE status = 'confirmed' AND room_id = ?
+                      AND check_in_date <= ? AND check_out_date > ?
+                )
+            ''', (room_id, room_id, today, today))
+            return room_id, row[1]
+
+        return self._transaction(work)
+
+# BACKENDS
+class SQLiteStorage(Storage):
+    def __init__(self, db_manager, booking_service):
+        super().__init__(SQLRoomRepository(db_manager.get_connection, SQLITE_DIALECT),
+                         SQLiteBookingRepository(db_manager, booking_service),
+                         SQLUserRepository(db_manager.get_connection, SQLITE_DIALECT))
+
+class ServerStorage(Storage):
+    def __init__(self, connect: Callable[[], object], dialect: Dialect = POSTGRESQL_DIALECT, pool_size: int = 8):
+        self.dialect = dialect
+        self.pool = ConnectionPool(connect, max_size=pool_size)
+        super().__init__(SQLRoomRepository(self.pool.acquire, dialect),
+                         ServerBookingRepository(self.pool.acquire, dialect),
+                         SQLUserRepository(self.pool.acquire, dialect))
+
+    def create_schema(self):
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        for statement in server_schema(self.dialect):
+            cursor.execute(statement)
+        conn.commit()
+        conn.close()
+
+    def close(self):
+        self.pool.close_all()
+
+def postgresql_connect(dsn: str) -> Callable[[], object]:
+    # psycopg2 is only needed when a server database is configured
+    import psycopg2
+    return lambda: psycopg2.connect(dsn)
+
+# A server-style backend on a SQLite file, for running ServerStorage without a server
+def sqlite_server_connect(path: str) -> Callable[[], sqlite3.Connection]:
+    def connect() -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode = WAL')
+        return conn
+    return connect
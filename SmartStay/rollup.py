@@ -0,0 +1,76 @@
+from typing import List
+import json
+
+# Daily room rollup
+# daily_room_stats holds one row per day number and room type with the room-nights sold
+# and the revenue earned that night. Each night carries an equal whole-RWF share of the
+# booking's total_amount, with the remainder on the first night, so the nights of a stay
+# always add up to its total. Cancelled stays are not counted. Bookings and cancellations
+# apply their nights inside their own transaction; bulk loads and backfills rebuild the
+# table from bookings. SQLite does not allow a WITH clause inside a trigger, so the
+# nights are expanded here.
+
+ROLLUP_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS daily_room_stats (
+            day INTEGER NOT NULL,
+            room_type TEXT NOT NULL,
+            room_nights INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, room_type)
+        ) WITHOUT ROWID
+    '''
+]
+
+# One row per night of the matching stays
+def _nights(where: str) -> str:
+    return f'''
+        WITH RECURSIVE nights (day, last_day, room_type, rate, remainder) AS (
+            SELECT b.check_in_date, b.check_out_date - 1, r.room_type,
+                   b.total_amount / (b.check_out_date - b.check_in_date),
+                   b.total_amount % (b.check_out_date - b.check_in_date)
+            FROM bookings b
+            JOIN rooms r ON r.room_id = b.room_id
+            WHERE {where}
+            UNION ALL
+            SELECT day + 1, last_day, room_type, rate, 0 FROM nights WHERE day < last_day
+        )'''
+
+APPLY_BOOKING = _nights('b.booking_id = :booking_id') + '''
+    INSERT INTO daily_room_stats (day, room_type, room_nights, revenue)
+    SELECT day, room_type, :sign, :sign * (rate + remainder) FROM nights WHERE 1
+    ON CONFLICT (day, room_type) DO UPDATE SET
+        room_nights = room_nights + excluded.room_nights,
+        revenue = revenue + excluded.revenue
+'''
+
+# The same for a block of bookings at once, booking_ids being a JSON array
+APPLY_BOOKINGS = _nights('b.booking_id IN (SELECT value FROM json_each(:booking_ids))') + '''
+    INSERT INTO daily_room_stats (day, room_type, room_nights, revenue)
+    SELECT day, room_type, :sign * COUNT(*), :sign * SUM(rate + remainder) FROM nights WHERE 1
+    GROUP BY day, room_type
+    ON CONFLICT (day, room_type) DO UPDATE SET
+        room_nights = room_nights + excluded.room_nights,
+        revenue = revenue + excluded.revenue
+'''
+
+ROLLUP_REBUILD = [
+    'DELETE FROM daily_room_stats',
+    _nights("b.status != 'cancelled'") + '''
+        INSERT INTO daily_room_stats (day, room_type, room_nights, revenue)
+        SELECT day, room_type, COUNT(*), SUM(rate + remainder) FROM nights GROUP BY day, room_type
+    '''
+]
+
+# Adds (sign=1) or removes (sign=-1) a stay's nights; run inside the booking's transaction
+def apply_booking(cursor, booking_id: int, sign: int):
+    cursor.execute(APPLY_BOOKING, {'booking_id': booking_id, 'sign': sign})
+
+def apply_bookings(cursor, booking_ids: List[int], sign: int):
+    cursor.execute(APPLY_BOOKINGS, {'booking_ids': json.dumps(booking_ids), 'sign': sign})
+
+def rebuild_rollup(conn):
+    cursor = conn.cursor()
+    for statement in ROLLUP_REBUILD:
+        cursor.execute(statement)
+    conn.commit()
@@ -0,0 +1,196 @@
+from typing import Dict, List, Optional, Tuple
+import re
+
+# Guest and booking search
+# guest_search is an external-content FTS5 index over users (username, email, phone),
+# kept in step with the table by triggers. Every word of a query must prefix-match one
+# of those fields ("jo gmail" finds john@gmail.com); a single-word query also matches
+# room numbers by prefix through the unique room_number index. Bookings match when
+# their guest or room does. Only the first SEARCH_MATCH_LIMIT index matches are ranked,
+# and words shorter than SEARCH_MIN_PREFIX must match a whole token, so a broad word like
+# "gmail" costs no more to rank than a precise one; the match runs once per search. A
+# results page is capped as well: it lists the bookings of the best-ranked
+# SEARCH_GUEST_LIMIT guests and the latest of the first SEARCH_ROOM_LIMIT rooms, and says
+# so when that leaves matches out. Facets, streamed listings and exports read every match.
+# Matching bookings are collected as a booking_id set from the guest and room indexes,
+# which keeps the planner from walking users or bookings in full to serve the join and
+# the ORDER BY of a results page; facet counts read those indexes alone.
+
+SEARCH_GUEST_LIMIT = 50
+SEARCH_MATCH_LIMIT = 1000
+SEARCH_MIN_PREFIX = 2
+SEARCH_ROOM_LIMIT = 5
+# A room collects bookings for as long as the hotel runs, so only its latest count
+SEARCH_ROOM_BOOKING_LIMIT = 500
+SEARCH_FACETS = ['status', 'payment_status']
+
+SEARCH_SCHEMA = [
+    '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS guest_search USING fts5 (
+            username, email, phone,
+            content = 'users', content_rowid = 'user_id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS guest_search_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO guest_search (rowid, username, email, phone)
+            VALUES (new.user_id, new.username, new.email, new.phone);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS guest_search_delete AFTER DELETE ON users
+        BEGIN
+            INSERT INTO guest_search (guest_search, rowid, username, email, phone)
+            VALUES ('delete', old.user_id, old.username, old.email, old.phone);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS guest_search_update AFTER UPDATE OF username, email, phone ON users
+        BEGIN
+            INSERT INTO guest_search (guest_search, rowid, username, email, phone)
+            VALUES ('delete', old.user_id, old.username, old.email, old.phone);
+            INSERT INTO guest_search (rowid, username, email, phone)
+            VALUES (new.user_id, new.username, new.email, new.phone);
+        END
+    '''
+]
+
+# Booking lookups by guest or room that also cover the facet columns
+SEARCH_INDEXES = [
+    'DROP INDEX IF EXISTS idx_bookings_guest_status',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_guest_facets ON bookings (guest_id, status, payment_status)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_room_facets ON bookings (room_id, status, payment_status)'
+]
+
+SEARCH_REBUILD = ["INSERT INTO guest_search (guest_search) VALUES ('rebuild')"]
+
+def _words(query: str) -> List[str]:
+    return re.findall(r'\w+', query or '')
+
+# Each word becomes a quoted term, a prefix term once it is long enough, so FTS5
+# operators in the input are inert
+def match_expression(query: str) -> Optional[str]:
+    words = _words(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' if len(word) >= SEARCH_MIN_PREFIX else f'"{word}"' for word in words)
+
+# Ids of the best-ranked guests among the first SEARCH_MATCH_LIMIT matches, best first.
+# Run once per search; the booking list, facets and guest list all take its result
+def match_guests(cursor, query: str) -> List[int]:
+    match = match_expression(query)
+    if match is None:
+        return []
+    cursor.execute(f'''
+        SELECT rowid FROM (
+            SELECT rowid, rank FROM guest_search WHERE guest_search MATCH ? LIMIT {SEARCH_MATCH_LIMIT}
+        )
+        ORDER BY rank
+        LIMIT ?
+    ''', (match, SEARCH_GUEST_LIMIT))
+    return [row[0] for row in cursor.fetchall()]
+
+# WHERE conditions on bookings for every guest and, for a single word, every room the
+# query matches; empty when the query has no words
+def _match_conditions(query: str) -> List[Tuple[str, list]]:
+    words = _words(query)
+    if not words:
+        return []
+    conditions = [('guest_id IN (SELECT rowid FROM guest_search WHERE guest_search MATCH ?)',
+                   [match_expression(query)])]
+    if len(words) == 1:
+        conditions.append(('room_id IN (SELECT room_id FROM rooms WHERE room_number GLOB ?)', [words[0] + '*']))
+    return conditions
+
+# SELECT of the given booking columns for every booking whose guest or room matches,
+# read from the guest and room facet indexes alone; None when the query has no words.
+# Without guest_ids every match counts; with them only those guests' bookings and the
+# latest of the first rooms do. The unary + keeps the planner from walking every booking
+# in id order to find a room's latest ones
+def _matching_bookings(query: str, guest_ids: Optional[List[int]], columns: str) -> Optional[Tuple[str, list]]:
+    words = _words(query)
+    if not words:
+        return None
+    if guest_ids is None:
+        conditions = _match_conditions(query)
+        select = ' UNION '.join(f'SELECT {columns} FROM bookings WHERE {condition}' for condition, _ in conditions)
+        return select, [param for _, params in conditions for param in params]
+    select = f'SELECT {columns} FROM bookings WHERE guest_id IN ({", ".join("?" for _ in guest_ids)})'
+    params = list(guest_ids)
+    if len(words) == 1:
+        select += f' UNION SELECT * FROM (SELECT {columns} FROM bookings WHERE room_id IN (' \
+                  'SELECT room_id FROM rooms WHERE room_number GLOB ? ORDER BY room_number LIMIT ?) ' \
+                  'ORDER BY +booking_id DESC LIMIT ?)'
+        params += [words[0] + '*', SEARCH_ROOM_LIMIT, SEARCH_ROOM_BOOKING_LIMIT]
+    return select, params
+
+# WHERE fragment on bookings aliased b, or None when the query has no words
+def booking_condition(query: str, guest_ids: Optional[List[int]] = None) -> Optional[Tuple[str, list]]:
+    matching = _matching_bookings(query, guest_ids, 'booking_id')
+    if matching is None:
+        return None
+    return f'b.booking_id IN ({matching[0]})', matching[1]
+
+def search_guests(cursor, guest_ids: List[int], limit: int = 10) -> List[tuple]:
+    shown = guest_ids[:limit]
+    cursor.execute(f'''
+        SELECT user_id, username, email, phone FROM users
+        WHERE user_id IN ({", ".join("?" for _ in shown)}) AND role = 'guest'
+    ''', shown)
+    guests = {row[0]: row for row in cursor.fetchall()}
+    return [guests[user_id] for user_id in shown if user_id in guests]
+
+# (status, payment_status) counts of the bookings meeting a condition, from a covering
+# index; grouping on +status stops the planner from skip-scanning idx_bookings_status for
+# its order, which then reads every matched row from the table
+def _count_facets(cursor, condition: str, params: list) -> Dict[Tuple[str, str], int]:
+    cursor.execute(f'''
+        SELECT status, payment_status, COUNT(*) FROM bookings
+        WHERE {condition}
+        GROUP BY +status, +payment_status
+    ''', params)
+    return {(status, payment_status): count for status, payment_status, count in cursor.fetchall()}
+
+# Status and payment counts over every match, or only over the bookings a page capped to
+# guest_ids looks at
+def booking_facets(cursor, query: str, guest_ids: Optional[List[int]] = None) -> Dict[str, Dict[str, int]]:
+    facets = {name: {} for name in SEARCH_FACETS}
+    if guest_ids is None:
+        # A broad word matches a large share of all bookings, so the guest and room matches
+        # are counted on their own and the bookings matched by both are taken off once,
+        # rather than collecting every match to drop duplicates. The overlap is read from
+        # the smaller side; the unary + keeps the planner off the larger side's index
+        branches = [(condition, params, _count_facets(cursor, condition, params))
+                    for condition, params in _match_conditions(query)]
+        counts = {}
+        for _, _, branch in branches:
+            for key, count in branch.items():
+                counts[key] = counts.get(key, 0) + count
+        if len(branches) == 2 and branches[0][2] and branches[1][2]:
+            small, large = sorted(branches, key=lambda branch: sum(branch[2].values()))
+            for key, count in _count_facets(cursor, f'{small[0]} AND +{large[0]}', small[1] + large[1]).items():
+                counts[key] -= count
+        rows = [(status, payment_status, count) for (status, payment_status), count in counts.items() if count]
+    else:
+        # booking_id keeps a booking matched by both its guest and its room from counting twice
+        matching = _matching_bookings(query, guest_ids, 'booking_id, status, payment_status')
+        if matching is None:
+            return facets
+        sql, params = matching
+        cursor.execute(f'''
+            SELECT status, payment_status, COUNT(*)
+            FROM ({sql})
+            GROUP BY status, payment_status
+        ''', params)
+        rows = cursor.fetchall()
+    for status, payment_status, count in rows:
+        facets['status'][status] = facets['status'].get(status, 0) + count
+        facets['payment_status'][payment_status] = facets['payment_status'].get(payment_status, 0) + count
+    return facets
+
+# Whether a page capped to guest_ids leaves out bookings counted in the full facets
+def search_truncated(cursor, query: str, guest_ids: List[int], facets: Dict[str, Dict[str, int]]) -> bool:
+    shown = booking_facets(cursor, query, guest_ids)
+    return sum(shown['status'].values()) < sum(facets['status'].values())
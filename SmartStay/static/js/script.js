@@ -184,27 +184,46 @@ function initializeAnimations() {
 }
 
 // Auto-refresh for Dashboard Data
+let dashboardStatsEtag = null;
+
 function initializeAutoRefresh() {
-    const dashboardPages = ['admin_dashboard', 'receptionist_dashboard'];
-    const currentPath = window.location.pathname;
+    const statsContainer = document.querySelector('[data-stats-role]');
     
-    if (dashboardPages.some(page => currentPath.includes(page))) {
+    if (statsContainer) {
         // Refresh dashboard data every 30 seconds
         setInterval(() => {
-            refreshDashboardData();
+            refreshDashboardData(statsContainer);
         }, 30000);
     }
 }
 
-function refreshDashboardData() {
-    // Show loading indicator
-    showLoadingIndicator();
+function refreshDashboardData(statsContainer) {
+    const role = statsContainer.dataset.statsRole;
+    const headers = {};
+    if (dashboardStatsEtag) {
+        headers['If-None-Match'] = dashboardStatsEtag;
+    }
     
-    // Simulate data refresh (in a real application, this would be an AJAX call)
-    setTimeout(() => {
-        hideLoadingIndicator();
-        console.log('Dashboard data refreshed');
-    }, 1000);
+    // Unchanged stats come back as 304 Not Modified with no body
+    fetch(`/api/stats/${role}`, { headers: headers, cache: 'no-store', credentials: 'same-origin' })
+        .then(response => {
+            if (response.status === 304 || !response.ok) {
+                return null;
+            }
+            dashboardStatsEtag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(stats => {
+            if (!stats) {
+                return;
+            }
+            Object.entries(stats).forEach(([key, value]) => {
+                statsContainer.querySelectorAll(`[data-stat="${key}"]`).forEach(element => {
+                    element.textContent = value;
+                });
+            });
+        })
+        .catch(error => console.error('Dashboard refresh failed:', error));
 }
 
 // Loading Indicator Functions
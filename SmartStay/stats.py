@@ -0,0 +1,163 @@
+from typing import Dict, List, Optional
+
+# Dashboard statistics
+# Counters live in stats_counters and are kept current by triggers, so they change in
+# the same transaction as the booking, cancellation or staff change that moves them.
+# Per-day and per-guest counters use keys such as 'arrivals:19844' (a day number, see
+# models.py) and 'guest_active:7'.
+
+def _bump(key_expr: str, delta_expr: str) -> str:
+    return f'''
+        INSERT INTO stats_counters (stat_key, value) VALUES ({key_expr}, {delta_expr})
+        ON CONFLICT (stat_key) DO UPDATE SET value = value + excluded.value;'''
+
+STATS_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            stat_key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_users_insert AFTER INSERT ON users
+        BEGIN{_bump("'total_users'", '1')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_users_delete AFTER DELETE ON users
+        BEGIN{_bump("'total_users'", '-1')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_rooms_insert AFTER INSERT ON rooms
+        BEGIN{_bump("'total_rooms'", '1')}{_bump("'available_rooms'", 'NEW.is_available = 1')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_rooms_delete AFTER DELETE ON rooms
+        BEGIN{_bump("'total_rooms'", '-1')}{_bump("'available_rooms'", '-(OLD.is_available = 1)')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_rooms_update AFTER UPDATE OF is_available ON rooms
+        WHEN (NEW.is_available = 1) != (OLD.is_available = 1)
+        BEGIN{_bump("'available_rooms'", '(NEW.is_available = 1) - (OLD.is_available = 1)')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_bookings_insert AFTER INSERT ON bookings
+        BEGIN{_bump("'total_bookings'", '1')}{_bump("'active_bookings'", "NEW.status = 'confirmed'")}{_bump("'guest_active:' || NEW.guest_id", "NEW.status = 'confirmed'")}{_bump("'arrivals:' || NEW.check_in_date", '1')}{_bump("'departures:' || NEW.check_out_date", '1')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_bookings_delete AFTER DELETE ON bookings
+        BEGIN{_bump("'total_bookings'", '-1')}{_bump("'active_bookings'", "-(OLD.status = 'confirmed')")}{_bump("'guest_active:' || OLD.guest_id", "-(OLD.status = 'confirmed')")}{_bump("'arrivals:' || OLD.check_in_date", '-1')}{_bump("'departures:' || OLD.check_out_date", '-1')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_bookings_update
+        AFTER UPDATE OF status, guest_id, check_in_date, check_out_date ON bookings
+        BEGIN{_bump("'active_bookings'", "(NEW.status = 'confirmed') - (OLD.status = 'confirmed')")}{_bump("'guest_active:' || OLD.guest_id", "-(OLD.status = 'confirmed')")}{_bump("'guest_active:' || NEW.guest_id", "NEW.status = 'confirmed'")}{_bump("'arrivals:' || OLD.check_in_date", '-1')}{_bump("'arrivals:' || NEW.check_in_date", '1')}{_bump("'departures:' || OLD.check_out_date", '-1')}{_bump("'departures:' || NEW.check_out_date", '1')}
+        END
+    '''
+]
+
+# Any change that can move a dashboard number bumps 'version', which the stats API
+# uses as its ETag so unchanged polls can be answered without reading the counters
+STATS_VERSION_SCHEMA = [
+    f'''
+        CREATE TRIGGER IF NOT EXISTS stats_version_{table}_{event} AFTER {clause} ON {table}
+        BEGIN{_bump("'version'", '1')}
+        END
+    '''
+    for table, event, clause in [
+        ('users', 'insert', 'INSERT'),
+        ('users', 'delete', 'DELETE'),
+        ('users', 'update', 'UPDATE OF loyalty_points'),
+        ('rooms', 'insert', 'INSERT'),
+        ('rooms', 'delete', 'DELETE'),
+        ('rooms', 'update', 'UPDATE OF is_available'),
+        ('bookings', 'insert', 'INSERT'),
+        ('bookings', 'delete', 'DELETE'),
+        ('bookings', 'update', 'UPDATE OF status, guest_id, check_in_date, check_out_date')
+    ]
+]
+
+# Recomputes every counter from the base tables, for backfills and bulk loads
+STATS_REBUILD = [
+    'DELETE FROM stats_counters',
+    '''
+        INSERT INTO stats_counters (stat_key, value)
+        SELECT 'total_users', COUNT(*) FROM users
+        UNION ALL SELECT 'total_rooms', COUNT(*) FROM rooms
+        UNION ALL SELECT 'available_rooms', COUNT(*) FROM rooms WHERE is_available = 1
+        UNION ALL SELECT 'total_bookings', COUNT(*) FROM bookings
+        UNION ALL SELECT 'active_bookings', COUNT(*) FROM bookings WHERE status = 'confirmed'
+    ''',
+    '''
+        INSERT INTO stats_counters (stat_key, value)
+        SELECT 'guest_active:' || guest_id, COUNT(*) FROM bookings
+        WHERE status = 'confirmed' GROUP BY guest_id
+    ''',
+    '''
+        INSERT INTO stats_counters (stat_key, value)
+        SELECT 'arrivals:' || check_in_date, COUNT(*) FROM bookings GROUP BY check_in_date
+    ''',
+    '''
+        INSERT INTO stats_counters (stat_key, value)
+        SELECT 'departures:' || check_out_date, COUNT(*) FROM bookings GROUP BY check_out_date
+    '''
+]
+
+def rebuild_stats(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM stats_counters WHERE stat_key = 'version'")
+    row = cursor.fetchone()
+    for statement in STATS_REBUILD:
+        cursor.execute(statement)
+    # Keep the version moving forward so cached dashboards see the rebuild
+    cursor.execute("INSERT INTO stats_counters (stat_key, value) VALUES ('version', ?)", ((row[0] if row else 0) + 1,))
+    conn.commit()
+
+def stats_version(conn) -> int:
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM stats_counters WHERE stat_key = 'version'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def read_stats(conn, keys: List[str]) -> Dict[str, int]:
+    cursor = conn.cursor()
+    placeholders = ', '.join('?' for _ in keys)
+    cursor.execute(f'SELECT stat_key, value FROM stats_counters WHERE stat_key IN ({placeholders})', keys)
+    values = dict(cursor.fetchall())
+    return {key: values.get(key, 0) for key in keys}
+
+def admin_stats(conn) -> Dict[str, int]:
+    return read_stats(conn, ['total_users', 'total_rooms', 'available_rooms', 'total_bookings', 'active_bookings'])
+
+def receptionist_stats(conn, today: int) -> Dict[str, int]:
+    values = read_stats(conn, [f'arrivals:{today}', f'departures:{today}', 'available_rooms'])
+    return {
+        'today_checkins': values[f'arrivals:{today}'],
+        'today_checkouts': values[f'departures:{today}'],
+        'available_rooms': values['available_rooms']
+    }
+
+def guest_stats(conn, guest_id: int, loyalty_points: Optional[int] = None) -> Dict[str, int]:
+    # Callers holding a cached Guest pass its points and only the counter is read
+    if loyalty_points is not None:
+        key = f'guest_active:{guest_id}'
+        return {'loyalty_points': loyalty_points, 'active_bookings': read_stats(conn, [key])[key]}
+    
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT u.loyalty_points, COALESCE(s.value, 0)
+        FROM users u
+        LEFT JOIN stats_counters s ON s.stat_key = 'guest_active:' || u.user_id
+        WHERE u.user_id = ?
+    ''', (guest_id,))
+    row = cursor.fetchone()
+    return {
+        'loyalty_points': row[0] if row else 0,
+        'active_bookings': row[1] if row else 0
+    }
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import time
+
+from models import User
+
+# In-process user cache
+# Hydrated Admin / Receptionist / Guest / Staff objects and their permission sets, kept
+# in least-recently-used order. Entries expire after ttl seconds so writes made by other
+# worker processes show up eventually; writes in this process call invalidate().
+class UserCache:
+    def __init__(self, load: Callable[[int], Optional[User]], max_size: int = 1024, ttl: float = 300.0):
+        self._load = load
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[int, Tuple[User, Tuple[str, ...], float]]' = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._generation = 0
+
+    def _lookup(self, user_id: int) -> Optional[Tuple[User, Tuple[str, ...], float]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[2] < self._ttl:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return entry
+            self._misses += 1
+            generation = self._generation
+
+        # Load outside the lock so one slow query doesn't hold up other lookups
+        user = self._load(user_id)
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        return self.put(user, generation)
+
+    def put(self, user: User, generation: Optional[int] = None) -> Tuple[User, Tuple[str, ...], float]:
+        entry = (user, tuple(user.get_permissions()), time.monotonic())
+        with self._lock:
+            # A load that raced with invalidate() is returned but not kept
+            if generation is not None and generation != self._generation:
+                return entry
+            self._entries[user.get_user_id()] = entry
+            self._entries.move_to_end(user.get_user_id())
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return entry
+
+    def get(self, user_id: int) -> Optional[User]:
+        entry = self._lookup(user_id)
+        return entry[0] if entry else None
+
+    def permissions(self, user_id: int) -> Tuple[str, ...]:
+        entry = self._lookup(user_id)
+        return entry[1] if entry else ()
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'max_size': self._max_size,
+                'ttl_seconds': self._ttl,
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0
+            }